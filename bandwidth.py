@@ -0,0 +1,523 @@
+"""
+Bandwidth Module
+Token-bucket scheduler sharing download bandwidth between jobs, under a global and a per-job cap
+
+Every download_* method passes its yt-dlp options through limit(), which
+sets the per-job cap as yt-dlp's ratelimit and adds the scheduler's
+progress hook. yt-dlp calls that hook after each block it reads, in the
+downloading thread, so the hook throttles a transfer by sleeping until the
+job's token bucket covers the bytes just received.
+
+The global cap is split between active jobs by weight (max-min fair: a job
+held back by its cap or by a slow origin leaves its unused share to the
+others). With a state file, the split spans all gunicorn workers and
+runtime changes made through the admin endpoint reach every worker.
+"""
+
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from jobs import current_job
+from metrics import BANDWIDTH_WAIT_SECONDS
+
+
+# Relative share of bandwidth by download option; small downloads weigh
+# more so audio and subtitles are not starved by 4K videos
+DEFAULT_WEIGHTS = {'video': 1, 'playlist': 1, 'post': 1, 'audio': 2, 'subtitles': 4, 'thumbnail': 4}
+
+# Seconds of unused allowance a job may spend at once
+BURST_SECONDS = 0.5
+
+# Seconds between recomputing the shares (joins and leaves recompute at once)
+REBALANCE_INTERVAL = 1.0
+
+# Workers that reported no active jobs for this long drop out of the split
+WORKER_TIMEOUT = 5.0
+
+# Longest single sleep, so a throttled transfer notices a new rate quickly
+MAX_WAIT = 0.25
+
+# Fixed yt-dlp read size while a limit is set; yt-dlp otherwise grows reads
+# up to 4 MiB, which a throttled job would take in one burst
+LIMITED_BLOCK_SIZE = 128 * 1024
+
+# A job using less than this fraction of its share is limited by its origin
+UNDERUSED_FRACTION = 0.8
+
+# Floor of the estimated demand of an origin-limited job, so it can grow back
+MIN_DEMAND = 64 * 1024
+
+RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_rate(value):
+    """
+    Parse a rate in bytes per second
+
+    Args:
+        value: Number, or string with an optional K/M/G suffix (e.g. '512K', '10M');
+            None, '' or 0 mean unlimited
+
+    Returns:
+        int: Bytes per second (0 for unlimited)
+
+    Raises:
+        ValueError: If the value is not a non-negative rate
+    """
+    if value is None or value == '':
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid rate: {value!r}')
+    if isinstance(value, (int, float)):
+        rate = value
+    else:
+        text = str(value).strip().upper()
+        if text.endswith('B'):
+            text = text[:-1]
+        unit = text[-1:] if text[-1:] in RATE_UNITS else ''
+        try:
+            rate = float(text[:len(text) - len(unit)]) * RATE_UNITS[unit]
+        except ValueError:
+            raise ValueError(f'Invalid rate: {value!r}')
+    if not math.isfinite(rate) or rate < 0:
+        raise ValueError(f'Invalid rate: {value!r}')
+    return int(rate)
+
+
+def fair_shares(capacity, weights, caps):
+    """
+    Split a capacity by weight, giving capped flows no more than their cap (water-filling)
+
+    Args:
+        capacity: Bytes per second to share
+        weights: Dict mapping flow key to weight
+        caps: Dict mapping flow key to its cap (missing or 0 for none)
+
+    Returns:
+        dict: Bytes per second for each flow key
+    """
+    shares = {}
+    remaining = dict(weights)
+    while remaining:
+        unit = capacity / sum(remaining.values())
+        capped = [key for key, weight in remaining.items() if caps.get(key) and caps[key] <= weight * unit]
+        if not capped:
+            for key, weight in remaining.items():
+                shares[key] = weight * unit
+            break
+        for key in capped:
+            shares[key] = caps[key]
+            capacity -= caps[key]
+            del remaining[key]
+    return shares
+
+
+class TokenBucket:
+    """Allowance of bytes refilled at a rate, saving at most BURST_SECONDS of it
+
+    Taking more than is available leaves the bucket in debt; the taker
+    waits until the refill has paid it back. A rate of 0 means unlimited.
+    """
+
+    def __init__(self, rate=0):
+        self.rate = rate
+        self.tokens = rate * BURST_SECONDS
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        """Add the allowance earned since the last update"""
+        if self.rate > 0:
+            self.tokens = min(self.tokens + (now - self._updated) * self.rate, self.rate * BURST_SECONDS)
+        self._updated = now
+
+    def set_rate(self, rate, now):
+        """Change the refill rate, keeping the allowance (or debt) earned so far"""
+        self._refill(now)
+        self.rate = rate
+        if rate <= 0:
+            self.tokens = 0
+        else:
+            self.tokens = min(self.tokens, rate * BURST_SECONDS)
+
+    def take(self, amount, now):
+        """
+        Take bytes from the bucket
+
+        Returns:
+            float: Seconds to wait before the debt is paid back (0 if none)
+        """
+        self._refill(now)
+        if self.rate <= 0:
+            return 0.0
+        self.tokens -= amount
+        return self.wait_time(now)
+
+    def wait_time(self, now):
+        """Seconds until the bucket is out of debt at the current rate"""
+        self._refill(now)
+        if self.rate <= 0 or self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class Flow:
+    """Download traffic of one job, possibly from several threads"""
+
+    def __init__(self, key, option, weight):
+        self.key = key
+        self.option = option
+        self.weight = weight
+        self.bucket = TokenBucket()
+        self.threads = set()
+        self.received = 0
+        self.received_since = 0
+        self.measured_at = time.monotonic()
+        self.throttled = False
+        self.waiting = 0
+        self.share = 0
+
+
+class BandwidthScheduler:
+    """Global and per-job bandwidth caps with weighted fair sharing between jobs"""
+
+    def __init__(self):
+        self.global_limit = 0
+        self.job_limit = 0
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.state_path = None
+        self.capacity = 0
+        self._defaults = (0, 0, dict(DEFAULT_WEIGHTS))
+        self._overridden = False
+        self._flows = {}
+        self._rebalanced = 0
+        self._settings_loaded = 0
+        self._lock = threading.Lock()
+        self._rebalance_lock = threading.Lock()
+        self._local = threading.local()
+
+    def configure(self, global_limit=0, job_limit=0, state_path=None):
+        """
+        Set the startup limits; overrides saved through update() take precedence
+
+        Args:
+            global_limit: Bytes per second for all downloads together (0 for unlimited)
+            job_limit: Bytes per second for a single job (0 for unlimited)
+            state_path: SQLite file shared by all workers for overrides and the
+                split of the global limit (None to schedule this process alone)
+        """
+        self._defaults = (global_limit, job_limit, dict(DEFAULT_WEIGHTS))
+        self.global_limit, self.job_limit, self.weights = global_limit, job_limit, dict(DEFAULT_WEIGHTS)
+        self.state_path = state_path
+        if state_path:
+            directory = os.path.dirname(state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._connect()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bandwidth_settings ('
+                'id INTEGER PRIMARY KEY CHECK (id = 1), global_limit INTEGER NOT NULL, '
+                'job_limit INTEGER NOT NULL, weights TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bandwidth_workers ('
+                'owner TEXT PRIMARY KEY, weight REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+            self._load_settings(conn)
+
+    def _connect(self):
+        """Return this thread's SQLite connection (reopened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.state_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Close the calling thread's SQLite connection, e.g. before the process forks"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _load_settings(self, conn):
+        """Apply the overrides saved by any worker, or the startup limits if there are none"""
+        self._settings_loaded = time.monotonic()
+        row = conn.execute(
+            'SELECT global_limit, job_limit, weights FROM bandwidth_settings WHERE id = 1'
+        ).fetchone()
+        if row:
+            self.global_limit, self.job_limit = row[0], row[1]
+            self.weights = dict(DEFAULT_WEIGHTS, **json.loads(row[2]))
+            self._overridden = True
+        else:
+            self.global_limit, self.job_limit, self.weights = self._defaults[0], self._defaults[1], dict(self._defaults[2])
+            self._overridden = False
+
+    def _refresh_settings(self):
+        """Reload the shared settings if they were last read more than REBALANCE_INTERVAL ago"""
+        if not self.state_path or time.monotonic() - self._settings_loaded < REBALANCE_INTERVAL:
+            return
+        try:
+            self._load_settings(self._connect())
+        except sqlite3.Error as e:
+            print(f"Bandwidth state error: {str(e)}")
+
+    def limit(self, ydl_opts):
+        """
+        Put a download under the scheduler (call on every download's yt-dlp options)
+
+        Sets yt-dlp's own ratelimit to the per-job cap, fixes its read size
+        while a limit is set, and adds the hook that applies the shared
+        token buckets.
+
+        Args:
+            ydl_opts: YoutubeDL options dict, updated in place
+
+        Returns:
+            dict: The same options dict
+        """
+        self._refresh_settings()
+        if self.job_limit:
+            ydl_opts['ratelimit'] = self.job_limit
+        if self.global_limit or self.job_limit:
+            ydl_opts['buffersize'] = LIMITED_BLOCK_SIZE
+            ydl_opts['noresizebuffer'] = True
+        hooks = list(ydl_opts.get('progress_hooks') or [])
+        if self.progress_hook not in hooks:
+            hooks.append(self.progress_hook)
+        ydl_opts['progress_hooks'] = hooks
+        return ydl_opts
+
+    def progress_hook(self, d):
+        """Charge the bytes received since the last call to the job's bucket, waiting if it is empty"""
+        if d.get('status') != 'downloading':
+            return
+        self._maybe_rebalance()
+
+        filename = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        seen = getattr(self._local, 'seen', None)
+        if seen is None:
+            seen = self._local.seen = {}
+        # The first report of a file sets the baseline; a resumed .part
+        # reports the bytes it already had, which were not received now
+        previous = seen.get(filename)
+        seen[filename] = downloaded
+        if previous is None or downloaded <= previous:
+            self._join()
+            return
+
+        flow = self._join()
+        amount = downloaded - previous
+        with self._lock:
+            flow.received += amount
+            flow.received_since += amount
+            wait = flow.bucket.take(amount, time.monotonic())
+            if wait <= 0:
+                return
+            flow.throttled = True
+            flow.waiting += 1
+
+        waited = 0.0
+        try:
+            while wait > 0:
+                pause = min(wait, MAX_WAIT)
+                time.sleep(pause)
+                waited += pause
+                with self._lock:
+                    wait = flow.bucket.wait_time(time.monotonic())
+        finally:
+            with self._lock:
+                flow.waiting -= 1
+            BANDWIDTH_WAIT_SECONDS.labels(flow.option).inc(waited)
+
+    def _join(self):
+        """Return the calling thread's flow, adding the thread (and the job) if new"""
+        job = current_job()
+        thread = threading.get_ident()
+        key = job.id if job is not None else f'thread-{thread}'
+        with self._lock:
+            flow = self._flows.get(key)
+            if flow is None:
+                option = job.description.get('option', 'video') if job is not None else 'video'
+                flow = Flow(key, option, self.weights.get(option, 1))
+                self._flows[key] = flow
+                self._rebalanced = 0
+            flow.threads.add(thread)
+        if self._rebalanced == 0:
+            self._maybe_rebalance()
+        return flow
+
+    def release(self):
+        """End the calling thread's yt-dlp run; a job leaves the schedule with its last thread"""
+        self._local.seen = None
+        job = current_job()
+        thread = threading.get_ident()
+        key = job.id if job is not None else f'thread-{thread}'
+        with self._lock:
+            flow = self._flows.get(key)
+            if flow is None:
+                return
+            flow.threads.discard(thread)
+            if flow.threads:
+                return
+            del self._flows[key]
+            self._rebalanced = 0
+        self._maybe_rebalance()
+
+    def _maybe_rebalance(self):
+        """Recompute the shares if REBALANCE_INTERVAL passed or the set of jobs changed"""
+        now = time.monotonic()
+        if now - self._rebalanced < REBALANCE_INTERVAL:
+            return
+        if not self._rebalance_lock.acquire(blocking=False):
+            return
+        try:
+            self._rebalance(now)
+        except sqlite3.Error as e:
+            print(f"Bandwidth state error: {str(e)}")
+        finally:
+            self._rebalance_lock.release()
+
+    def _rebalance(self, now):
+        """Refresh settings, split the global limit between workers and jobs, and set every bucket's rate"""
+        self._rebalanced = now
+
+        with self._lock:
+            flows = list(self._flows.values())
+        own_weight = sum(flow.weight for flow in flows)
+
+        total_weight = own_weight
+        if self.state_path:
+            conn = self._connect()
+            self._load_settings(conn)
+            owner = f'{socket.gethostname()}:{os.getpid()}'
+            wall = time.time()
+            if flows:
+                conn.execute(
+                    'INSERT OR REPLACE INTO bandwidth_workers (owner, weight, updated_at) VALUES (?, ?, ?)',
+                    (owner, own_weight, wall)
+                )
+            else:
+                conn.execute('DELETE FROM bandwidth_workers WHERE owner = ?', (owner,))
+            total_weight = conn.execute(
+                'SELECT COALESCE(SUM(weight), 0) FROM bandwidth_workers WHERE updated_at > ?',
+                (wall - WORKER_TIMEOUT,)
+            ).fetchone()[0] or own_weight
+
+        with self._lock:
+            for flow in flows:
+                flow.weight = self.weights.get(flow.option, 1)
+            if not flows:
+                self.capacity = 0
+                return
+            if not self.global_limit:
+                self.capacity = 0
+                for flow in flows:
+                    flow.share = self.job_limit
+                    flow.bucket.set_rate(flow.share, now)
+                return
+
+            # This worker's part of the global limit, by the weight of its jobs
+            self.capacity = self.global_limit * own_weight / max(total_weight, own_weight)
+            caps = {}
+            for flow in flows:
+                cap = self.job_limit
+                # Measure over a full interval; a job that never waited for
+                # its bucket yet used much less than its share is limited by
+                # its origin, and is capped a little above what it used
+                window = now - flow.measured_at
+                if window >= REBALANCE_INTERVAL:
+                    if (flow.share and not flow.throttled and not flow.waiting
+                            and flow.received_since < UNDERUSED_FRACTION * flow.share * window):
+                        demand = max(flow.received_since / window * 1.25, MIN_DEMAND)
+                        cap = min(cap, demand) if cap else demand
+                    flow.received_since = 0
+                    flow.throttled = False
+                    flow.measured_at = now
+                caps[flow.key] = cap
+            shares = fair_shares(self.capacity, {flow.key: flow.weight for flow in flows}, caps)
+            for flow in flows:
+                flow.share = shares[flow.key]
+                flow.bucket.set_rate(flow.share, now)
+
+    def update(self, global_limit=None, job_limit=None, weights=None):
+        """
+        Change the limits at runtime, for every worker sharing the state file
+
+        Args:
+            global_limit: New global limit (rate accepted by parse_rate), None to keep
+            job_limit: New per-job limit, None to keep
+            weights: Dict of download option to positive weight, merged into the current weights
+
+        Raises:
+            ValueError: If a rate, option or weight is invalid
+        """
+        self._refresh_settings()
+        new_global = self.global_limit if global_limit is None else parse_rate(global_limit)
+        new_job = self.job_limit if job_limit is None else parse_rate(job_limit)
+        new_weights = dict(self.weights)
+        for option, weight in (weights or {}).items():
+            if option not in DEFAULT_WEIGHTS:
+                raise ValueError(f'Unknown download option: {option}')
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+                raise ValueError(f'Weight for {option} must be a positive number')
+            new_weights[option] = weight
+
+        if self.state_path:
+            self._connect().execute(
+                'INSERT OR REPLACE INTO bandwidth_settings (id, global_limit, job_limit, weights, updated_at) '
+                'VALUES (1, ?, ?, ?, ?)',
+                (new_global, new_job, json.dumps(new_weights), time.time())
+            )
+        self.global_limit, self.job_limit, self.weights = new_global, new_job, new_weights
+        self._overridden = True
+        self._rebalanced = 0
+
+    def reset(self):
+        """Drop runtime changes and return every worker to the startup limits"""
+        if self.state_path:
+            self._connect().execute('DELETE FROM bandwidth_settings')
+        self.global_limit, self.job_limit, self.weights = self._defaults[0], self._defaults[1], dict(self._defaults[2])
+        self._overridden = False
+        self._rebalanced = 0
+
+    def status(self):
+        """
+        Return the limits in force and this worker's view of the schedule
+
+        Returns:
+            dict: Limits, weights, whether they were changed at runtime, and
+                this worker's capacity and per-job rates
+        """
+        self._refresh_settings()
+        with self._lock:
+            jobs = [{
+                'job_id': flow.key,
+                'option': flow.option,
+                'weight': flow.weight,
+                'rate': round(flow.share),
+                'received_bytes': flow.received,
+            } for flow in self._flows.values()]
+        return {
+            'global_limit': self.global_limit,
+            'job_limit': self.job_limit,
+            'weights': dict(self.weights),
+            'overridden': self._overridden,
+            'worker': {
+                'pid': os.getpid(),
+                'capacity': round(self.capacity),
+                'jobs': jobs,
+            },
+        }
+
+
+bandwidth_scheduler = BandwidthScheduler()
@@ -0,0 +1,159 @@
+"""
+Batch Download Module
+Runs many downloads in parallel with a global concurrency limit and per-host limits
+"""
+
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from jobs import current_job, job_context, join_job, off_worker
+
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PER_HOST = 3
+
+
+def host_of(url):
+    """
+    Get the host a URL is fetched from, used for per-host limits
+
+    Args:
+        url: Media URL
+
+    Returns:
+        str: Lower-cased host name without a leading www.
+    """
+    host = urlsplit(url.strip()).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def ask_parallel_downloads():
+    """
+    Ask the user how many batch downloads to run at once
+
+    Returns:
+        int: Number of parallel downloads
+    """
+    choice = input(f"Parallel downloads (press Enter for {DEFAULT_MAX_WORKERS}): ").strip()
+    try:
+        return max(1, int(choice)) if choice else DEFAULT_MAX_WORKERS
+    except ValueError:
+        print(f"Invalid number, using {DEFAULT_MAX_WORKERS}.")
+        return DEFAULT_MAX_WORKERS
+
+
+def print_progress(index, total, item):
+    """
+    Default progress reporter, called once per item in input order
+
+    Args:
+        index: 1-based position of the item in the batch
+        total: Number of items in the batch
+        item: Per-item result dict
+    """
+    if item['success']:
+        print(f"\n[{index}/{total}] ✓ {item['url']}")
+    else:
+        print(f"\n[{index}/{total}] ✗ {item['url']}: {item['error']}")
+
+
+def print_summary(results, label='Batch download'):
+    """
+    Print a summary of a finished batch
+
+    Args:
+        results: List of per-item result dicts from run_batch
+        label: What the batch was, used in the summary line
+    """
+    failed = [item for item in results if not item['success']]
+    print(f"\n✓ {label} completed! {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    for item in failed:
+        print(f"  ✗ {item['url']}: {item['error']}")
+
+
+def run_batch(items, func, max_workers=DEFAULT_MAX_WORKERS, per_host=DEFAULT_PER_HOST, on_progress=print_progress, url_of=None):
+    """
+    Download a list of items in parallel
+
+    Items are started in input order whenever both a worker and a slot for
+    the item's host are free, so one slow site cannot take every worker.
+    Results are reported through on_progress in input order, as soon as
+    every earlier item has finished.
+
+    Args:
+        items: List of URLs (or any items when url_of is given)
+        func: Callable taking an item and returning a download result dict
+        max_workers: Maximum downloads running at once
+        per_host: Maximum downloads running at once against the same host
+        on_progress: Callable(index, total, item) for ordered progress reporting
+        url_of: Callable mapping an item to its URL (defaults to the item itself)
+
+    Returns:
+        list: One dict per item in input order with url, success, files and error
+    """
+    max_workers = max(1, max_workers)
+    per_host = max(1, per_host)
+    total = len(items)
+    urls = [url_of(item) if url_of else item for item in items]
+    hosts = [host_of(url or '') for url in urls]
+    results = [None] * total
+    pending = list(range(total))
+    host_active = Counter()
+    cond = threading.Condition()
+    state = {'running': 0, 'reported': 0, 'lent': False}
+
+    def report():
+        # Caller holds cond; emit the contiguous prefix of finished items
+        while state['reported'] < total and results[state['reported']] is not None:
+            if on_progress:
+                on_progress(state['reported'] + 1, total, results[state['reported']])
+            state['reported'] += 1
+
+    # Progress of the items still belongs to the job that started the batch.
+    # Each item takes its hold on the job's worker slot before its thread
+    # starts, and the calling thread lends its own hold while it only waits,
+    # so the slot goes to the next queued job once every item is post-processing
+    job = current_job()
+
+    def task(index):
+        url = urls[index]
+        try:
+            with job_context(job, joined=True):
+                result = func(items[index]) or {}
+            error = result.get('error')
+            item = {'url': url, 'success': not error, 'files': result.get('files', []), 'error': error}
+        except Exception as e:
+            item = {'url': url, 'success': False, 'files': [], 'error': str(e)}
+
+        with cond:
+            results[index] = item
+            host_active[hosts[index]] -= 1
+            state['running'] -= 1
+            report()
+            cond.notify_all()
+
+    with ExitStack() as waiting, ThreadPoolExecutor(max_workers=max_workers,
+                                                    thread_name_prefix='unidownload-batch') as executor:
+        with cond:
+            while pending:
+                started = False
+                if state['running'] < max_workers:
+                    for position, index in enumerate(pending):
+                        if host_active[hosts[index]] < per_host:
+                            pending.pop(position)
+                            host_active[hosts[index]] += 1
+                            state['running'] += 1
+                            join_job(job)
+                            executor.submit(task, index)
+                            started = True
+                            break
+                if started and not state['lent']:
+                    waiting.enter_context(off_worker())
+                    state['lent'] = True
+                if not started:
+                    cond.wait()
+
+    return results
@@ -0,0 +1,159 @@
+"""
+Audio Remux Benchmark
+Compares the two audio outputs of the download_audio methods on long tracks
+
+Run from the project root:
+    python benchmarks/bench_audio_remux.py [--duration 3600] [--repeat 3] [--json results.json]
+
+Generates one track per source codec YouTube serves for audio (AAC in .m4a,
+Opus in .webm) with ffmpeg, then runs yt-dlp's FFmpegExtractAudio on a
+fresh copy of each, configured as extraction.audio_postprocessor builds it:
+  original  keeps the source codec: .m4a is left alone, Opus in WebM is
+            remuxed into .opus with a stream copy
+  mp3       re-encodes the whole track at 192 kbit/s
+Wall time and CPU time (this process plus its ffmpeg children) are reported
+per run. Without ffmpeg on PATH the benchmark is skipped.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+from yt_dlp.postprocessor import FFmpegExtractAudioPP  # noqa: E402
+
+from extraction import AUDIO_FORMATS, audio_postprocessor  # noqa: E402
+
+
+# Source tracks: name -> (extension, codec as ffprobe reports it, ffmpeg encoder)
+SOURCES = {
+    'aac-m4a': ('m4a', 'aac', 'aac'),
+    'opus-webm': ('webm', 'opus', 'libopus'),
+}
+
+
+def make_source(directory, name, duration):
+    """
+    Encode a stereo test track of the given length
+
+    Args:
+        directory: Output directory
+        name: Key of SOURCES
+        duration: Track length in seconds
+
+    Returns:
+        str: Path of the track
+    """
+    ext, _, encoder = SOURCES[name]
+    path = os.path.join(directory, f'{name}.{ext}')
+    subprocess.run([
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+        '-f', 'lavfi', '-i', f'anoisesrc=color=pink:amplitude=0.05:sample_rate=48000:duration={duration}',
+        '-filter_complex', 'amix=inputs=2,aformat=channel_layouts=stereo',
+        '-c:a', encoder, '-b:a', '128k', path,
+    ], check=True)
+    return path
+
+
+def cpu_seconds():
+    """CPU time used so far by this process and its waited-for children"""
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def run_once(ydl, source, name, audio_format, directory):
+    """
+    Post-process a fresh copy of a source track
+
+    Returns:
+        dict: Wall and CPU seconds, and the output file's extension and size
+    """
+    ext, codec, _ = SOURCES[name]
+    work = os.path.join(directory, f'run.{ext}')
+    shutil.copyfile(source, work)
+
+    options = dict(audio_postprocessor(audio_format))
+    del options['key']
+    pp = FFmpegExtractAudioPP(ydl, **options)
+    info = {'filepath': work, 'ext': ext, 'vcodec': 'none', 'acodec': codec}
+
+    cpu_start = cpu_seconds()
+    start = time.perf_counter()
+    files_to_delete, info = pp.run(info)
+    wall = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu_start
+
+    output = info['filepath']
+    result = {'wall': wall, 'cpu': cpu, 'ext': info['ext'], 'bytes': os.path.getsize(output)}
+    for path in {output, work, *files_to_delete}:
+        if os.path.exists(path):
+            os.remove(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark original-codec audio against MP3 re-encoding')
+    parser.add_argument('--duration', type=int, default=3600, help='Track length in seconds')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per source and mode')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        print('ffmpeg not found on PATH; skipping the audio remux benchmark')
+        return
+
+    directory = tempfile.mkdtemp(prefix='unidownload-bench-audio-')
+    results = []
+    try:
+        print(f"Encoding {args.duration}s test tracks...")
+        sources = {name: make_source(directory, name, args.duration) for name in SOURCES}
+
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+            print(f"\n{'source':10} {'mode':9} {'output':>6} {'wall p50':>10} {'cpu p50':>10} {'size':>10}")
+            for name, source in sources.items():
+                for audio_format in AUDIO_FORMATS:
+                    runs = [run_once(ydl, source, name, audio_format, directory) for _ in range(args.repeat)]
+                    row = {
+                        'source': name,
+                        'mode': audio_format,
+                        'output': runs[0]['ext'],
+                        'source_bytes': os.path.getsize(source),
+                        'output_bytes': runs[0]['bytes'],
+                        'wall_seconds': [round(run['wall'], 4) for run in runs],
+                        'cpu_seconds': [round(run['cpu'], 4) for run in runs],
+                    }
+                    results.append(row)
+                    print(f"{name:10} {audio_format:9} {row['output']:>6} "
+                          f"{statistics.median(row['wall_seconds']):9.3f}s "
+                          f"{statistics.median(row['cpu_seconds']):9.3f}s "
+                          f"{row['output_bytes'] / 1024 ** 2:8.1f}MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'environment': {
+                    'python': platform.python_version(),
+                    'yt_dlp': yt_dlp.version.__version__,
+                    'machine': platform.machine(),
+                    'cpus': os.cpu_count(),
+                },
+                'duration': args.duration,
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
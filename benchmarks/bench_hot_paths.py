@@ -0,0 +1,378 @@
+"""
+Hot Path Benchmark Suite
+Times the pure-Python paths every request goes through, with no network access
+
+Run from the project root:
+    python benchmarks/bench_hot_paths.py [--json results.json] [--compare baseline.json]
+
+Cases:
+  display_formats/N   YouTubeDownloader.display_formats on an info dict with N formats
+  route/*             URL classification and the per-platform media-type detectors
+                      on a mixed URL corpus (per URL)
+  discovery/*/N       finding the files a download wrote in a downloads/ tree of N
+                      files: the os.walk before/after diff /api/download used to do
+                      (legacy_walk) against the yt-dlp hook collector it uses now
+  detect_json/N       serialising a /api/detect response with N formats, as jsonify does
+  job_store/*         status reads from the shared SQLite job store holding --jobs
+                      finished jobs: by job ID (any worker's /api/jobs/<id>) and a
+                      client's history (/api/jobs)
+
+--json writes every result with its environment, so runs from different
+releases can be diffed. --compare reads such a file and exits with status 1
+when any case is slower than the baseline by more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_url_router import make_corpus  # noqa: E402
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMAT_COUNTS = (50, 100, 250, 500)
+
+HEIGHTS = (144, 240, 360, 480, 720, 1080, 1440, 2160)
+
+
+def measure(func, number, repeat):
+    """
+    Time func over several rounds
+
+    Args:
+        func: Callable taking no arguments
+        number: Calls per round
+        repeat: Rounds
+
+    Returns:
+        dict: Best and median microseconds per call, and the call counts
+    """
+    func()  # warm caches and lazy imports
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        'us_per_op': min(rounds),
+        'us_per_op_median': statistics.median(rounds),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def synthetic_info(format_count, seed=1):
+    """Build a YouTube-like info dict with format_count formats"""
+    rng = random.Random(seed)
+    formats = []
+    for index in range(format_count):
+        kind = rng.random()
+        height = rng.choice(HEIGHTS) + rng.choice((0, 0, 0, -4, 12))
+        if kind < 0.15:
+            # audio only
+            formats.append({'format_id': str(index), 'ext': 'm4a', 'vcodec': 'none',
+                            'acodec': 'mp4a.40.2', 'abr': rng.choice((48, 128, 160))})
+        elif kind < 0.25:
+            # storyboards and other formats without a height
+            formats.append({'format_id': f'sb{index}', 'ext': 'mhtml', 'vcodec': 'none', 'acodec': 'none'})
+        else:
+            formats.append({'format_id': str(index), 'ext': rng.choice(('mp4', 'webm')),
+                            'height': height, 'width': height * 16 // 9,
+                            'vcodec': rng.choice(('avc1.640028', 'vp09.00.40.08', 'av01.0.08M.08')),
+                            'acodec': rng.choice(('none', 'none', 'mp4a.40.2')),
+                            'tbr': rng.uniform(100, 20000),
+                            'filesize_approx': rng.randint(10 ** 6, 10 ** 9)})
+    return {
+        'id': 'dQw4w9WgXcQ',
+        'title': 'Synthetic video ' * 4,
+        'uploader': 'Benchmark Channel',
+        'duration': 3600,
+        'thumbnail': 'https://i.ytimg.com/vi/dQw4w9WgXcQ/maxresdefault.jpg',
+        'subtitles': {'en': [{'ext': 'vtt', 'url': 'https://example.invalid/en.vtt'}]},
+        'formats': formats,
+    }
+
+
+def bench_display_formats(server, number, repeat):
+    """display_formats over growing format lists"""
+    results = {}
+    for count in FORMAT_COUNTS:
+        info = synthetic_info(count)
+        results[f'display_formats/{count}'] = measure(
+            lambda: server.youtube_dl.display_formats(info, return_formats=True), number, repeat)
+    return results
+
+
+def bench_routing(server, corpus_size, repeat):
+    """URL classification and media-type detection, per URL"""
+    from url_router import platform_of, route
+    from info_cache import media_id
+
+    corpus = make_corpus(corpus_size)
+    routed = [(url, route(url)) for url in corpus]
+    instagram = [url for url, result in routed if result and result.platform == 'instagram']
+    # Facebook posts and share links need a network lookup, so only URL-decidable kinds are timed
+    facebook = [url for url, result in routed if result and result.platform == 'facebook'
+                and result.kind in ('video', 'reel', 'photo')]
+    keyed = [(result.platform, url) for url, result in routed if result]
+
+    def per_url(func, urls):
+        def run():
+            for url in urls:
+                func(url)
+        stats = measure(run, 1, repeat)
+        for key in ('us_per_op', 'us_per_op_median'):
+            stats[key] /= len(urls)
+        stats['number'] = len(urls)
+        return stats
+
+    def media_ids():
+        for platform_name, url in keyed:
+            media_id(platform_name, url)
+
+    results = {
+        'route/route': per_url(route, corpus),
+        'route/platform_of': per_url(platform_of, corpus),
+        'route/instagram_media_type': per_url(server.instagram_dl.detect_media_type, instagram),
+        'route/facebook_content_type': per_url(server.facebook_dl.detect_content_type, facebook),
+    }
+    stats = measure(media_ids, 1, repeat)
+    for key in ('us_per_op', 'us_per_op_median'):
+        stats[key] /= len(keyed)
+    stats['number'] = len(keyed)
+    results['route/media_id'] = stats
+    return results
+
+
+def bench_discovery(server, tree_sizes, repeat):
+    """Legacy os.walk diff against the hook collector, on growing download trees"""
+    import extraction
+
+    target = os.path.join(server.DOWNLOAD_ROOT, 'Benchmark Video.mp4')
+    part = target + '.part'
+
+    def fake_download():
+        with open(target, 'wb') as f:
+            f.write(b'\0' * 1024)
+
+    def legacy_walk():
+        # /api/download before the hook collector: walk, download, walk, diff
+        before_files = set()
+        for root, dirs, files in os.walk(server.DOWNLOAD_ROOT):
+            for file in files:
+                before_files.add(os.path.join(root, file))
+        fake_download()
+        after_files = set()
+        for root, dirs, files in os.walk(server.DOWNLOAD_ROOT):
+            for file in files:
+                after_files.add(os.path.join(root, file))
+        entries = [server.file_entry(path) for path in after_files - before_files]
+        os.remove(target)
+        return entries
+
+    def hook_collector():
+        # The hook calls yt-dlp makes for a single-file download
+        collector = extraction.OutputCollector()
+        fake_download()
+        collector.progress_hook({'status': 'finished', 'filename': part})
+        collector.postprocessor_hook({'status': 'finished', 'postprocessor': 'MoveFiles',
+                                      'info_dict': {'__finaldir': server.DOWNLOAD_ROOT,
+                                                    '__files_to_move': {}, 'filepath': target}})
+        collector.post_hook(target)
+        entries = [server.file_entry(path) for path in collector.files]
+        os.remove(target)
+        return entries
+
+    results = {}
+    built = 0
+    for size in sorted(tree_sizes):
+        print(f"  building a {size}-file download tree...", flush=True)
+        grow_tree(server.DOWNLOAD_ROOT, built, size)
+        built = size
+        number = max(1, 100000 // size)
+        results[f'discovery/legacy_walk/{size}'] = measure(legacy_walk, number, repeat)
+        results[f'discovery/hook_collector/{size}'] = measure(hook_collector, 1000, repeat)
+    return results
+
+
+def grow_tree(root, start, stop, per_directory=1000):
+    """Add empty files start..stop-1 to a download tree, spread over platform subfolders"""
+    platforms = ('', 'instagram', 'facebook')
+    for index in range(start, stop):
+        directory = os.path.join(root, platforms[index % 3], f'batch{index // per_directory:04d}')
+        if index % per_directory < 3:
+            os.makedirs(directory, exist_ok=True)
+        open(os.path.join(directory, f'media_{index}.mp4'), 'wb').close()
+
+
+def detect_response(server, info):
+    """Return the body /api/detect sends for a YouTube info dict, built by server.detect itself"""
+    get_media_info = server.get_media_info
+    server.get_media_info = lambda platform, url: info
+    try:
+        with server.app.test_request_context('/api/detect', method='POST',
+                                             json={'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'}):
+            return server.detect().get_json()
+    finally:
+        server.get_media_info = get_media_info
+
+
+def bench_detect_json(server, number, repeat):
+    """Serialise /api/detect responses the way jsonify does"""
+    results = {}
+    for count in FORMAT_COUNTS:
+        response = detect_response(server, synthetic_info(count))
+
+        def serialise():
+            with server.app.app_context():
+                server.jsonify(response).get_data()
+
+        results[f'detect_json/{count}'] = measure(serialise, number, repeat)
+    return results
+
+
+def bench_job_store(server, job_count, number, repeat):
+    """Status and history reads from a populated job store"""
+    from job_store import JobStore
+    from jobs import Job
+
+    store = JobStore(os.path.join('cache', 'bench-jobs.sqlite3'))
+    rng = random.Random(1)
+    job_ids = []
+    for index in range(job_count):
+        job = Job(None, ('https://www.youtube.com/watch?v=x', 'youtube', 'video'),
+                  description={'url': 'https://www.youtube.com/watch?v=x', 'platform': 'youtube',
+                               'option': 'video'},
+                  key=f'youtube:{index:011d}:video', client=f'client-{index % 100}')
+        store.record(job, 'run_download')
+        store.finished(job.id, 'finished', result={
+            'success': True,
+            'message': 'Video downloaded successfully',
+            'files': [{'filename': 'Video.mp4', 'url': '/api/files/Video.mp4'}]
+        }, accounting=job.accounting.to_dict(1.0), progress={'status': 'finished', 'percent': 100.0})
+        job_ids.append(job.id)
+
+    lookups = [rng.choice(job_ids) for _ in range(number)]
+    cursor = iter(lookups * (repeat + 1))
+    results = {
+        'job_store/get': measure(lambda: store.get(next(cursor)), number, repeat),
+        'job_store/history': measure(lambda: store.history(f'client-{rng.randrange(100)}', 20), number, repeat),
+    }
+    store.close()
+    return results
+
+
+def environment():
+    """Describe the machine and revision the results came from"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Print the change against a baseline results file
+
+    Returns:
+        list: Names of cases slower than the baseline by more than threshold
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    print(f"\nChange against {baseline_path} (best us/op):")
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['us_per_op']
+        change = stats['us_per_op'] / before - 1 if before else 0.0
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"  {name:38} {before:12.3f} -> {stats['us_per_op']:12.3f}  {change:+7.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pure-Python hot paths offline')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed rounds per case (best is reported)')
+    parser.add_argument('--number', type=int, default=200, help='Calls per round for per-call cases')
+    parser.add_argument('--urls', type=int, default=100000, help='URL corpus size for route cases')
+    parser.add_argument('--tree-sizes', default='10000,100000',
+                        help='Comma-separated download tree sizes (e.g. 10000,100000,1000000)')
+    parser.add_argument('--jobs', type=int, default=10000, help='Finished jobs in the store for job_store cases')
+    parser.add_argument('--only', help='Run only cases whose name starts with this prefix')
+    parser.add_argument('--json', help='Write machine-readable results to this file')
+    parser.add_argument('--compare', help='Baseline results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help='Allowed slowdown against the baseline before failing (0.20 = 20%%)')
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    # The server module creates downloads/ and its caches relative to the
+    # working directory, so keep them in a scratch directory
+    scratch = tempfile.mkdtemp(prefix='unidownload-hotpaths-')
+    os.chdir(scratch)
+    import server
+
+    groups = {
+        'display_formats': lambda: bench_display_formats(server, args.number, args.repeat),
+        'route': lambda: bench_routing(server, args.urls, args.repeat),
+        'discovery': lambda: bench_discovery(server, [int(size) for size in args.tree_sizes.split(',')],
+                                             args.repeat),
+        'detect_json': lambda: bench_detect_json(server, args.number, args.repeat),
+        'job_store': lambda: bench_job_store(server, args.jobs, args.number, args.repeat),
+    }
+
+    results = {}
+    for group, run in groups.items():
+        if args.only and not (group.startswith(args.only) or args.only.startswith(group)):
+            continue
+        print(f"{group}...", flush=True)
+        for name, stats in run().items():
+            if args.only and not name.startswith(args.only):
+                continue
+            results[name] = stats
+            print(f"  {name:38} {stats['us_per_op']:12.3f} us/op  (median {stats['us_per_op_median']:.3f})")
+
+    os.chdir(ROOT)
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+        print(f"\nResults written to {json_path}")
+
+    if baseline_path:
+        regressions = compare(results, baseline_path, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Startup Benchmark
+Measures gunicorn time-to-first-request and per-worker memory with and without app preloading
+
+Run from the project root (Linux, gunicorn installed):
+    python benchmarks/bench_startup.py [--workers 2] [--runs 3]
+
+For each mode the script starts `gunicorn server:app` with the project's
+gunicorn.conf.py in a scratch directory and reports:
+  ttfr          seconds from launch until /api/health answers
+  first media   seconds for the first /api/stream request (the first one to need yt-dlp)
+  rss/pss/uss   per-worker memory from /proc/<pid>/smaps_rollup; PSS and USS drop
+                when workers share the preloaded pages
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'lazy': {'PRELOAD_APP': '0'},
+    'preload': {'PRELOAD_APP': '1'},
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler without request logging"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_origin(directory):
+    """Serve a small media file on an ephemeral local port, returns (server, url)"""
+    with open(os.path.join(directory, 'clip.mp4'), 'wb') as f:
+        f.write(os.urandom(64 * 1024))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/clip.mp4'
+
+
+def free_port():
+    """Pick an unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=60):
+    """Poll a URL until it answers 200, returning the time it took"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.01)
+    raise TimeoutError(f'{url} did not answer within {timeout}s')
+
+
+def memory_kib(pid):
+    """Rss, Pss and USS (private pages) of a process in KiB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def worker_pids(master_pid):
+    """PIDs of a gunicorn master's worker processes"""
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def run_once(mode, workers, media_url, scratch):
+    """Start gunicorn in one mode, take the measurements and stop it"""
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, **MODES[mode])
+    env['INFO_CACHE_PATH'] = os.path.join(scratch, f'info_{port}.sqlite3')
+    env['RESULT_CACHE_PATH'] = os.path.join(scratch, f'results_{port}.sqlite3')
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'server:app',
+         '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--pythonpath', ROOT, '--chdir', scratch,
+         '-b', f'127.0.0.1:{port}', '-w', str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for(f'{base}/api/health')
+        ttfr = time.perf_counter() - start
+
+        query = urllib.parse.urlencode({'url': media_url, 'platform': 'youtube'})
+        media_start = time.perf_counter()
+        with urllib.request.urlopen(f'{base}/api/stream?{query}', timeout=60) as response:
+            response.read()
+        first_media = time.perf_counter() - media_start
+
+        # Let every worker finish booting before sampling memory
+        time.sleep(0.5)
+        memory = [memory_kib(pid) for pid in worker_pids(process.pid)]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    return {'ttfr': ttfr, 'first_media': first_media, 'workers': memory}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gunicorn startup with and without preload')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers')
+    parser.add_argument('--runs', type=int, default=3, help='Launches per mode')
+    parser.add_argument('--json', help='Write the raw results to this file')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='unidownload-startup-')
+    origin, media_url = start_origin(scratch)
+
+    results = {}
+    for mode in MODES:
+        runs = [run_once(mode, args.workers, media_url, scratch) for _ in range(args.runs)]
+        results[mode] = runs
+
+        workers = [w for run in runs for w in run['workers']]
+        print(f"\n{mode} ({args.workers} workers, {args.runs} runs)")
+        print(f"  ttfr         p50 {statistics.median(r['ttfr'] for r in runs):7.3f} s")
+        print(f"  first media  p50 {statistics.median(r['first_media'] for r in runs):7.3f} s")
+        for key in ('rss', 'pss', 'uss'):
+            print(f"  worker {key}   mean {statistics.mean(w[key] for w in workers) / 1024:7.1f} MiB")
+
+    origin.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'workers': args.workers, 'modes': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
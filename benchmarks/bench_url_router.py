@@ -0,0 +1,104 @@
+"""
+URL Router Benchmark
+Measures how many URLs per second url_router classifies into (platform, kind, media ID)
+
+Run from the project root:
+    python benchmarks/bench_url_router.py [--urls 1000000]
+
+The corpus mixes every supported URL shape with look-alike and unsupported
+URLs (about one in five), generated from a fixed seed. CPU time is reported
+next to wall time, since wall time on a shared machine varies from run to
+run. For scale, the same loop is also timed around one trivial compiled
+regex match per URL, the least any regex-based router can cost.
+"""
+
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from url_router import route  # noqa: E402
+
+
+ID_CHARS = string.ascii_letters + string.digits + '-_'
+
+SUPPORTED = [
+    'https://www.youtube.com/watch?v={yt}',
+    'https://youtube.com/watch?feature=share&v={yt}&t=42',
+    'https://youtu.be/{yt}?si={code}',
+    'https://m.youtube.com/shorts/{yt}',
+    'https://www.youtube.com/embed/{yt}',
+    'https://www.youtube.com/playlist?list=PL{code}',
+    'https://www.instagram.com/p/{code}/',
+    'https://www.instagram.com/reel/{code}/?igsh={code}',
+    'https://www.instagram.com/tv/{code}/',
+    'https://www.instagram.com/stories/someone/{num}/',
+    'https://fb.watch/{code}/',
+    'https://www.facebook.com/page/videos/{num}/',
+    'https://www.facebook.com/watch/?v={num}',
+    'https://www.facebook.com/reel/{num}',
+    'https://www.facebook.com/photo.php?fbid={num}&set=a.1',
+    'https://www.facebook.com/story.php?story_fbid=pfbid{code}&id=4',
+]
+
+REJECTED = [
+    'https://notyoutube.com/watch?v={yt}',
+    'https://youtube.com.evil/watch?v={yt}',
+    'https://evil.example/?u=https://youtu.be/{yt}',
+    'https://www.instagram.com/someone/',
+    'https://example.com/videos/{num}',
+]
+
+
+def make_corpus(size, seed=1234):
+    """Build a reproducible list of URLs"""
+    rng = random.Random(seed)
+
+    def fill(template):
+        return template.format(
+            yt=''.join(rng.choice(ID_CHARS) for _ in range(11)),
+            code=''.join(rng.choice(ID_CHARS) for _ in range(rng.randint(6, 14))),
+            num=rng.randint(10 ** 8, 10 ** 16),
+        )
+
+    return [fill(rng.choice(REJECTED) if rng.random() < 0.2 else rng.choice(SUPPORTED)) for _ in range(size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark URL classification throughput')
+    parser.add_argument('--urls', type=int, default=1000000, help='Corpus size')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed passes (best is reported)')
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.urls)
+    floor = re.compile('h').match
+
+    def timed(func):
+        """Best wall and CPU seconds of running func over the corpus, and the last results"""
+        wall = cpu = None
+        for _ in range(args.repeat):
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            results = [func(url) for url in corpus]
+            wall_elapsed, cpu_elapsed = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            wall = wall_elapsed if wall is None else min(wall, wall_elapsed)
+            cpu = cpu_elapsed if cpu is None else min(cpu, cpu_elapsed)
+        return wall, cpu, results
+
+    wall, cpu, routed = timed(route)
+    _, floor_cpu, _ = timed(floor)
+
+    accepted = sum(1 for result in routed if result is not None)
+    print(f"{args.urls} URLs, {accepted} accepted, {args.urls - accepted} rejected")
+    print(f"best of {args.repeat}: {wall:.3f} s wall, {cpu:.3f} s CPU  ->  {args.urls / cpu / 1e6:.2f} M URLs/s "
+          f"({cpu / args.urls * 1e9:.0f} ns CPU per URL)")
+    print(f"one trivial regex match per URL: {floor_cpu / args.urls * 1e9:.0f} ns CPU per URL "
+          f"({args.urls / floor_cpu / 1e6:.2f} M URLs/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+YoutubeDL Pool Benchmark
+Compares per-call cost of a fresh yt_dlp.YoutubeDL against a pooled instance
+
+Run from the project root:
+    python benchmarks/bench_ydl_pool.py [--iterations 200]
+
+Two cases are timed:
+  setup    - create/check out an instance, open its HTTP handlers, close/return it
+  extract  - the /api/detect path: extract info for a media URL served locally
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+from ydl_pool import YoutubeDLPool  # noqa: E402
+
+
+# Same options as YouTubeDownloader.get_video_info
+DETECT_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+    'no_check_formats': True,
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['android'],
+            'skip': ['hls', 'dash', 'translated_subs']
+        }
+    },
+    'nocheckcertificate': True,
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler without request logging"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_origin():
+    """Serve a small media file on an ephemeral local port, returns (server, url)"""
+    directory = tempfile.mkdtemp(prefix='unidownload-bench-')
+    with open(os.path.join(directory, 'clip.mp4'), 'wb') as f:
+        f.write(os.urandom(64 * 1024))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/clip.mp4'
+
+
+def time_calls(func, iterations):
+    """Run func repeatedly, returning per-call durations in milliseconds"""
+    func()  # warm imports and extractor classes
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def report(name, fresh, pooled):
+    """Print mean and p50 for both variants"""
+    print(f"\n{name}")
+    for label, durations in (('fresh YoutubeDL', fresh), ('pooled', pooled)):
+        print(f"  {label:16} mean {statistics.mean(durations):8.3f} ms   p50 {statistics.median(durations):8.3f} ms")
+    print(f"  speedup (p50)    {statistics.median(fresh) / statistics.median(pooled):.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark YoutubeDL instance pooling')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed calls per variant')
+    args = parser.parse_args()
+
+    server, url = start_origin()
+    pool = YoutubeDLPool()
+
+    def fresh_setup():
+        with yt_dlp.YoutubeDL(DETECT_OPTS) as ydl:
+            ydl._request_director
+
+    def pooled_setup():
+        with pool.checkout(DETECT_OPTS) as ydl:
+            ydl._request_director
+
+    def fresh_extract():
+        with yt_dlp.YoutubeDL(DETECT_OPTS) as ydl:
+            ydl.extract_info(url, download=False)
+
+    def pooled_extract():
+        with pool.checkout(DETECT_OPTS) as ydl:
+            ydl.extract_info(url, download=False)
+
+    print(f"yt-dlp {yt_dlp.version.__version__}, {args.iterations} iterations")
+    report('setup', time_calls(fresh_setup, args.iterations), time_calls(pooled_setup, args.iterations))
+    report('extract (local origin)', time_calls(fresh_extract, args.iterations),
+           time_calls(pooled_extract, args.iterations))
+    print(f"\npool: {pool.stats()}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+"""
+Load Test Harness
+Drives /api/detect and /api/download through gunicorn against a local fake media origin
+
+Run from the project root (gunicorn installed, no network needed):
+    python benchmarks/loadtest.py [--concurrency 1,4,16] [--duration 10] [--size 5]
+
+The harness starts:
+  - a fake origin serving synthetic media of --size MiB, answering after
+    --latency ms and sending at most --throttle KiB/s per connection
+  - gunicorn server:app (gthread workers) with the yt-dlp plugin in
+    benchmarks/loadtest_plugins, which resolves load-test URLs such as
+    https://www.youtube.com/watch?v=LT000000042 to that origin
+
+URLs go through the real router, info cache, job queue and yt-dlp HTTP
+downloader; only the extractor and the media bytes are fake. Every URL is
+new unless --distinct caps the number of media IDs (to measure cache hits).
+
+For each scenario and concurrency level it reports throughput, p50/p95/p99
+latency and error rate; --json writes the raw numbers. A download is timed
+from POST /api/download until its job finishes. Each client polls its jobs on
+its keep-alive connection; --spread-polls opens a new connection per poll so
+any worker answers, through the shared job store.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_PATH = os.path.join(ROOT, 'benchmarks', 'loadtest_plugins')
+
+CHUNK_SIZE = 64 * 1024
+
+# Load-test media IDs per platform (see the plugin's _VALID_URL)
+URL_TEMPLATES = {
+    'youtube': ('https://www.youtube.com/watch?v=LT{:09d}', 'video'),
+    'instagram': ('https://www.instagram.com/p/LT{:d}/', 'post'),
+    'facebook': ('https://www.facebook.com/reel/7357{:06d}', 'post'),
+}
+
+
+class FakeOriginHandler(BaseHTTPRequestHandler):
+    """Synthetic media origin: info JSON, thumbnails and ranged media bodies"""
+
+    protocol_version = 'HTTP/1.1'
+    payload = os.urandom(CHUNK_SIZE)
+
+    # Set by start_origin
+    media_size = 0
+    latency = 0.0
+    throttle = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body_headers(self, status, content_type, length, extra=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def handle_request(self, send_body):
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.path.startswith('/info/'):
+            body = json.dumps({'duration': 600, 'size': self.media_size}).encode()
+            self.send_body_headers(200, 'application/json', len(body))
+            if send_body:
+                self.wfile.write(body)
+        elif self.path.startswith('/thumb/'):
+            self.send_body_headers(200, 'image/jpeg', 1024)
+            if send_body:
+                self.wfile.write(self.payload[:1024])
+        elif self.path.startswith('/media/'):
+            self.send_media(send_body)
+        else:
+            self.send_body_headers(404, 'text/plain', 0)
+
+    def send_media(self, send_body):
+        start, end = 0, self.media_size - 1
+        status, extra = 200, {}
+        range_header = self.headers.get('Range', '')
+        if range_header.startswith('bytes='):
+            first, _, last = range_header[6:].split(',')[0].partition('-')
+            start = int(first) if first else max(0, self.media_size - int(last))
+            end = min(int(last), end) if first and last else end
+            if start > end:
+                self.send_body_headers(416, 'text/plain', 0,
+                                       {'Content-Range': f'bytes */{self.media_size}'})
+                return
+            status = 206
+            extra['Content-Range'] = f'bytes {start}-{end}/{self.media_size}'
+
+        remaining = end - start + 1
+        self.send_body_headers(status, 'video/mp4', remaining, extra)
+        if not send_body:
+            return
+
+        began = time.perf_counter()
+        sent = 0
+        while remaining > 0:
+            chunk = self.payload[:min(CHUNK_SIZE, remaining)]
+            try:
+                self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                return  # the client went away (e.g. a killed worker)
+            sent += len(chunk)
+            remaining -= len(chunk)
+            if self.throttle:
+                # Sleep until the connection is back under its byte budget
+                ahead = sent / self.throttle - (time.perf_counter() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+
+def start_origin(size, latency, throttle):
+    """Start the fake origin on an ephemeral port, returns (server, base URL)"""
+    handler = type('ConfiguredOriginHandler', (FakeOriginHandler,), {
+        'media_size': size,
+        'latency': latency,
+        'throttle': throttle,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def free_port():
+    """Pick an unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(args, origin_url, scratch):
+    """Start gunicorn in scratch and wait for /api/health, returns (process, port)"""
+    port = free_port()
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_PATH, env.get('PYTHONPATH')]))
+    env['LOADTEST_ORIGIN'] = origin_url
+    env['DOWNLOAD_WORKERS'] = str(args.download_workers)
+    env['DOWNLOAD_QUEUE_SIZE'] = str(args.queue_size)
+
+    log = open(os.path.join(scratch, 'gunicorn.log'), 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'server:app',
+         '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--pythonpath', ROOT, '--chdir', scratch,
+         '-b', f'127.0.0.1:{port}', '-w', str(args.workers),
+         '--worker-class', 'gthread', '--threads', str(args.threads),
+         '--keep-alive', '30', '--timeout', '300'],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited, see {log.name}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                connection.close()
+                return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise TimeoutError('gunicorn did not start within 60s')
+
+
+class Client:
+    """One virtual user on its own keep-alive connection"""
+
+    def __init__(self, port, poll_interval, timeout, spread_polls=False):
+        self.port = port
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.spread_polls = spread_polls
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        """Send a request, reconnecting once if the server closed the connection"""
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+            try:
+                headers = {'Content-Type': 'application/json'} if body is not None else {}
+                self.connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                                        headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                return response.status, json.loads(data) if data else {}
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+
+    def detect(self, url, platform, option):
+        """POST /api/detect, returns an error label or None"""
+        status, data = self.request('POST', '/api/detect', {'url': url})
+        return None if status == 200 else f'detect {status}'
+
+    def download(self, url, platform, option):
+        """POST /api/download and follow the job until it ends, returns an error label or None"""
+        status, data = self.request('POST', '/api/download', {'url': url, 'platform': platform, 'option': option})
+        if status == 200:
+            return None  # served from the result store
+        if status != 202:
+            return f'download {status}'
+
+        deadline = time.perf_counter() + self.timeout
+        while time.perf_counter() < deadline:
+            time.sleep(self.poll_interval)
+            if self.spread_polls and self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            status, data = self.request('GET', data.get('status_url') or f"/api/jobs/{data['job_id']}")
+            if status != 200:
+                return f'job status {status}'
+            if data['state'] == 'finished':
+                return None
+            if data['state'] == 'failed':
+                return f"job failed: {str(data.get('error', ''))[:60]}"
+        return 'job timeout'
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_level(scenario, concurrency, args, port, counter):
+    """Run one scenario at one concurrency level for args.duration seconds"""
+    platforms = args.platforms.split(',')
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    def user(seed):
+        rng = random.Random(seed)
+        client = Client(port, args.poll_interval, args.timeout, args.spread_polls)
+        try:
+            while time.perf_counter() < stop_at:
+                platform = rng.choice(platforms)
+                template, option = URL_TEMPLATES[platform]
+                number = next(counter)
+                url = template.format(number % args.distinct if args.distinct else number)
+
+                start = time.perf_counter()
+                try:
+                    error = getattr(client, scenario)(url, platform, option)
+                except (OSError, http.client.HTTPException, ValueError) as e:
+                    error = type(e).__name__
+                    client.close()
+                    client.connection = None
+                elapsed = time.perf_counter() - start
+
+                with lock:
+                    if error:
+                        errors[error] = errors.get(error, 0) + 1
+                    else:
+                        latencies.append(elapsed * 1000)
+        finally:
+            client.close()
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+
+    completed = len(latencies)
+    failed = sum(errors.values())
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'wall_seconds': wall,
+        'completed': completed,
+        'errors': failed,
+        'error_rate': failed / (completed + failed) if completed + failed else 0.0,
+        'error_kinds': errors,
+        'throughput_rps': completed / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'mean_ms': statistics.mean(latencies) if latencies else None,
+    }
+
+
+def format_ms(value):
+    return f'{value:9.1f}' if value is not None else '        -'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test UniDownload against a local fake origin')
+    parser.add_argument('--scenarios', default='detect,download', help='Comma-separated: detect, download')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario and level')
+    parser.add_argument('--platforms', default='youtube,instagram,facebook', help='Platforms to mix')
+    parser.add_argument('--distinct', type=int, default=0,
+                        help='Number of distinct media IDs (0 = every request is new)')
+    parser.add_argument('--size', type=float, default=5, help='Media size in MiB')
+    parser.add_argument('--latency', type=float, default=50, help='Origin time to first byte in ms')
+    parser.add_argument('--throttle', type=float, default=0, help='Origin KiB/s per connection (0 = unlimited)')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers')
+    parser.add_argument('--threads', type=int, default=16, help='Threads per gunicorn worker')
+    parser.add_argument('--download-workers', type=int, default=2, help='DOWNLOAD_WORKERS per gunicorn worker')
+    parser.add_argument('--queue-size', type=int, default=32, help='DOWNLOAD_QUEUE_SIZE per gunicorn worker')
+    parser.add_argument('--poll-interval', type=float, default=0.05, help='Job status poll interval in seconds')
+    parser.add_argument('--spread-polls', action='store_true',
+                        help='Poll job status on a new connection each time, so any worker answers')
+    parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout in seconds')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch directory (logs, downloads)')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='unidownload-loadtest-')
+    origin, origin_url = start_origin(int(args.size * 1024 * 1024), args.latency / 1000, int(args.throttle * 1024))
+    process, port = start_gunicorn(args, origin_url, scratch)
+    print(f"gunicorn on :{port} ({args.workers} workers x {args.threads} threads), origin {origin_url}, "
+          f"{args.size:g} MiB media, {args.latency:g} ms latency, "
+          f"{'unthrottled' if not args.throttle else f'{args.throttle:g} KiB/s'}")
+
+    counter = itertools.count(1)
+    results = []
+    try:
+        print(f"\n{'scenario':10} {'conc':>5} {'done':>7} {'err%':>6} {'req/s':>8} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for scenario in args.scenarios.split(','):
+            for concurrency in [int(level) for level in args.concurrency.split(',')]:
+                result = run_level(scenario, concurrency, args, port, counter)
+                results.append(result)
+                print(f"{scenario:10} {concurrency:5d} {result['completed']:7d} {result['error_rate']:6.1%} "
+                      f"{result['throughput_rps']:8.2f} {format_ms(result['p50_ms'])} "
+                      f"{format_ms(result['p95_ms'])} {format_ms(result['p99_ms'])}"
+                      + (f"  {result['error_kinds']}" if result['errors'] else ''))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        origin.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.keep:
+        print(f"Scratch directory: {scratch}")
+    else:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Load Test Extractor Plugin
+Resolves load-test media URLs to synthetic media on a local fake origin
+
+yt-dlp loads this plugin when benchmarks/loadtest_plugins is on PYTHONPATH
+(benchmarks/loadtest.py sets that for the gunicorn it starts). It only
+claims URLs whose media ID starts with the load-test marker, so real URLs
+still reach the real extractors:
+
+    https://www.youtube.com/watch?v=LT000000042
+    https://www.instagram.com/p/LT42/
+    https://www.facebook.com/reel/7357000042
+
+LOADTEST_ORIGIN names the origin, e.g. http://127.0.0.1:8765.
+"""
+
+import os
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class LoadTestIE(InfoExtractor):
+    IE_NAME = 'loadtest'
+    IE_DESC = False
+    _VALID_URL = (r'https?://(?:www\.)?(?:youtube\.com/watch\?v=(?P<yt>LT\d{9})'
+                  r'|instagram\.com/p/(?P<ig>LT\d+)'
+                  r'|facebook\.com/reel/(?P<fb>7357\d+))')
+
+    # Progressive (audio + video) formats only, so no FFmpeg merge is needed
+    _HEIGHTS = (360, 720)
+
+    def _real_extract(self, url):
+        match = self._match_valid_url(url)
+        video_id = match.group('yt') or match.group('ig') or match.group('fb')
+        origin = os.environ.get('LOADTEST_ORIGIN', 'http://127.0.0.1:8765').rstrip('/')
+
+        # The origin answers /info/<id> after its configured latency, standing
+        # in for the page and API requests a real extractor makes
+        meta = self._download_json(f'{origin}/info/{video_id}', video_id)
+
+        return {
+            'id': video_id,
+            'title': f'Load test {video_id}',
+            'uploader': 'Load Test',
+            'duration': meta['duration'],
+            'thumbnail': f'{origin}/thumb/{video_id}.jpg',
+            'formats': [{
+                'format_id': str(height),
+                'url': f'{origin}/media/{video_id}-{height}.mp4',
+                'ext': 'mp4',
+                'height': height,
+                'width': height * 16 // 9,
+                'vcodec': 'avc1.640028',
+                'acodec': 'mp4a.40.2',
+                'filesize': meta['size'],
+            } for height in self._HEIGHTS],
+        }
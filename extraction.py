@@ -0,0 +1,215 @@
+"""
+Extraction Module
+Single entry point for yt-dlp extraction so every request extracts a URL exactly once
+"""
+
+import os
+import threading
+import time
+
+from bandwidth import bandwidth_scheduler
+from jobs import job_stage, report_postprocessor, run_finished, run_started
+from metrics import EXTRACTION_SECONDS, DownloadMeter
+from url_router import platform_of
+
+
+class ExtractionCounter:
+    """
+    Thread-aware count of yt-dlp extractions, used to verify extract-once behaviour
+
+    Incremented by the pooled YoutubeDL (postprocess.youtube_dl_class) each
+    time yt-dlp runs an extractor on a URL, including the entries it
+    resolves inside process_ie_result.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def increment(self):
+        """Record one extraction in the calling thread"""
+        with self._lock:
+            self.total += 1
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    @property
+    def count(self):
+        """Extractions made by the calling thread since its last reset"""
+        return getattr(self._local, 'count', 0)
+
+    def reset(self):
+        """Reset the calling thread's count"""
+        self._local.count = 0
+
+
+extraction_counter = ExtractionCounter()
+
+# Audio outputs of the download_audio methods: 'original' keeps the source
+# codec (AAC in .m4a, Opus in .opus) and at most remuxes it with a stream
+# copy; 'mp3' re-encodes the whole track
+AUDIO_FORMATS = ('original', 'mp3')
+
+# Bitrate of MP3 re-encodes, in kbit/s
+MP3_QUALITY = '192'
+
+
+def audio_postprocessor(audio_format='original'):
+    """
+    Build the yt-dlp post-processor that turns a download into an audio file
+
+    Args:
+        audio_format: One of AUDIO_FORMATS
+
+    Returns:
+        dict: FFmpegExtractAudio post-processor options
+
+    Raises:
+        ValueError: If audio_format is not one of AUDIO_FORMATS
+    """
+    if audio_format == 'mp3':
+        return {'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': MP3_QUALITY}
+    if audio_format != 'original':
+        raise ValueError(f'Unsupported audio format: {audio_format}')
+    # 'best' leaves .m4a/.opus/.mp3 files alone and stream-copies the audio
+    # track out of anything else (Opus in WebM, AAC in an MP4 video)
+    return {'key': 'FFmpegExtractAudio', 'preferredcodec': 'best'}
+
+
+def output_template(directory, name, *variant):
+    """
+    Build an output template whose file name also names the requested variant
+
+    Different qualities or audio formats of the same media then get
+    different files: one request is never served the other's file, and
+    concurrent jobs never share a .part file.
+
+    Args:
+        directory: Download directory
+        name: yt-dlp template of the base name, e.g. '%(title)s'
+        *variant: Parts naming the variant (media ID, quality, audio format); empty ones are skipped
+
+    Returns:
+        str: Output template
+    """
+    parts = [str(part) for part in variant if part]
+    suffix = f" [{'-'.join(parts)}]" if parts else ''
+    return os.path.join(directory, f'{name}{suffix}.%(ext)s')
+
+
+def extract_info(ydl, url, process=True):
+    """
+    Extract info for a URL without downloading
+
+    Args:
+        ydl: yt_dlp.YoutubeDL instance
+        url: Media URL
+        process: Resolve formats and playlist entries (False returns the raw result)
+
+    Returns:
+        dict: Info dict
+    """
+    start = time.monotonic()
+    try:
+        with job_stage('extract'):
+            return ydl.extract_info(url, download=False, process=process)
+    finally:
+        EXTRACTION_SECONDS.labels(platform_of(url), 'extract').observe(time.monotonic() - start)
+
+
+def download(ydl, url, info=None, extra_info=None):
+    """
+    Download a URL, reusing an already extracted info dict when given
+
+    Args:
+        ydl: yt_dlp.YoutubeDL instance
+        url: Media URL
+        info: Info dict from extract_info (skips re-extraction)
+        extra_info: Fields added to the result, e.g. playlist_index for a playlist entry
+
+    Returns:
+        dict: Result with the processed info dict and the final file paths written
+    """
+    platform = platform_of(url)
+    collector = OutputCollector()
+    collector.attach(ydl)
+    DownloadMeter(platform).attach(ydl)
+    ydl.add_postprocessor_hook(report_postprocessor)
+
+    start = time.monotonic()
+    run_started()
+    try:
+        if info:
+            # Unresolved entries (of a raw playlist, say) are extracted here
+            info = ydl.process_ie_result(info, download=True, extra_info=extra_info)
+        else:
+            info = ydl.extract_info(url, download=True, extra_info=extra_info)
+    finally:
+        run_finished()
+        bandwidth_scheduler.release()
+        EXTRACTION_SECONDS.labels(platform, 'download').observe(time.monotonic() - start)
+
+    return {'info': info, 'files': collector.files, 'error': None}
+
+
+class OutputCollector:
+    """Records the final paths of files a yt-dlp run writes, using its hooks"""
+
+    def __init__(self):
+        self._files = []
+        self._downloaded = []
+
+    def attach(self, ydl):
+        """
+        Register the collector's hooks on a YoutubeDL instance
+
+        Args:
+            ydl: yt_dlp.YoutubeDL instance
+        """
+        ydl.add_progress_hook(self.progress_hook)
+        ydl.add_postprocessor_hook(self.postprocessor_hook)
+        ydl.add_post_hook(self.post_hook)
+
+    def _add(self, path, target):
+        """Append a path to target unless already recorded"""
+        if path and path not in target:
+            target.append(path)
+
+    def progress_hook(self, d):
+        """Remember each stream file once its download finishes"""
+        if d.get('status') == 'finished':
+            self._add(d.get('filename'), self._downloaded)
+
+    def postprocessor_hook(self, d):
+        """Record where MoveFiles put the media, subtitle and thumbnail files"""
+        if d.get('status') != 'finished' or d.get('postprocessor') != 'MoveFiles':
+            return
+        info = d.get('info_dict') or {}
+        final_dir = info.get('__finaldir') or os.path.dirname(info.get('filepath') or '')
+        for old, new in (info.get('__files_to_move') or {}).items():
+            self._add(new or os.path.join(final_dir, os.path.basename(old)), self._files)
+
+    def post_hook(self, filepath):
+        """Record the final media file after all post-processing"""
+        self._add(filepath, self._files)
+
+    @property
+    def files(self):
+        """Final file paths that exist on disk, falling back to raw downloads"""
+        files = [path for path in self._files if os.path.exists(path)]
+        if not files:
+            files = [path for path in self._downloaded if os.path.exists(path)]
+        return files
+
+
+def failed_result(error):
+    """
+    Build the result returned by a download method that failed
+
+    Args:
+        error: Exception or message
+
+    Returns:
+        dict: Result with no files and the error message
+    """
+    return {'info': None, 'files': [], 'error': str(error)}
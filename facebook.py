@@ -4,7 +4,12 @@ Handles downloading videos, images, and posts from Facebook using yt-dlp
 """
 
 import os
-import yt_dlp
+import batch
+import extraction
+from bandwidth import bandwidth_scheduler
+from jobs import report_progress
+from url_router import route as route_url
+from ydl_pool import ydl_pool
 
 
 class FacebookDownloader:
@@ -93,18 +98,28 @@ class FacebookDownloader:
             opts['cookiesfrombrowser'] = (self.cookies_browser,)
         return opts
     
-    def detect_content_type(self, url):
+    def detect_content_type(self, url, info=None):
         """
-        Detect type of Facebook content from URL or by fetching info
+        Detect type of Facebook content from URL, fetching info only when the URL is ambiguous
         
         Args:
             url: Facebook URL
+            info: Info dict from a previous extraction (avoids fetching it again)
             
         Returns:
             str: Content type (video, image, album, unknown)
         """
+        # Video, reel and photo URLs say what they are; posts and share links don't
+        route = route_url(url)
+        if route is not None and route.platform == 'facebook':
+            if route.kind in ('video', 'reel'):
+                return 'video'
+            if route.kind == 'photo':
+                return 'image'
+        
         try:
-            info = self.get_video_info(url)
+            if info is None:
+                info = self.get_video_info(url)
             if not info:
                 return 'unknown'
             
@@ -139,8 +154,8 @@ class FacebookDownloader:
         })
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                info = extraction.extract_info(ydl, url)
                 return info
         except Exception as e:
             error_msg = str(e)
@@ -160,12 +175,16 @@ class FacebookDownloader:
                 print(f"Error fetching video info: {error_msg}")
             return None
     
-    def download_image(self, url):
+    def download_image(self, url, info=None):
         """
         Download image from Facebook post
         
         Args:
             url: Facebook post URL with image
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, 'images', '%(title)s_%(id)s.%(ext)s')
         
@@ -182,19 +201,26 @@ class FacebookDownloader:
         
         try:
             print(f"\nDownloading Facebook image...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Image downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading image: {str(e)}")
             self._show_facebook_help()
+            return extraction.failed_result(e)
     
-    def download_post(self, url):
+    def download_post(self, url, info=None):
         """
         Download Facebook post (handles images, videos, or albums)
         
         Args:
             url: Facebook post URL
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, '%(title)s_%(id)s.%(ext)s')
         
@@ -206,25 +232,33 @@ class FacebookDownloader:
         
         try:
             print(f"\nDownloading Facebook post...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
+                info = result['info']
                 
                 # Check if it's an album with multiple items
                 if info and '_type' in info and info['_type'] == 'playlist':
                     print(f"\n✓ Downloaded {len(info.get('entries', []))} item(s) from album!")
                 else:
                     print("\n✓ Post downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading post: {str(e)}")
             self._show_facebook_help()
+            return extraction.failed_result(e)
     
-    def download_video(self, url, quality='best'):
+    def download_video(self, url, quality='best', info=None):
         """
         Download Facebook video
         
         Args:
             url: Facebook video URL
             quality: Video quality preference
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, '%(title)s_%(id)s.%(ext)s')
         
@@ -237,21 +271,29 @@ class FacebookDownloader:
         
         try:
             print(f"\nDownloading Facebook video...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Video downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading video: {str(e)}")
             self._show_facebook_help()
+            return extraction.failed_result(e)
     
-    def download_audio(self, url):
+    def download_audio(self, url, info=None, audio_format='original'):
         """
         Download audio from Facebook video
         
         Args:
             url: Facebook URL
+            info: Info dict from a previous extraction (skips re-extraction)
+            audio_format: 'original' keeps the source codec (no re-encode), 'mp3' converts to MP3
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
-        output_template = os.path.join(self.download_path, 'audio', '%(title)s_%(id)s.%(ext)s')
+        output_template = extraction.output_template(os.path.join(self.download_path, 'audio'), '%(title)s_%(id)s', audio_format)
         
         # Create audio subdirectory
         audio_dir = os.path.join(self.download_path, 'audio')
@@ -262,47 +304,55 @@ class FacebookDownloader:
         ydl_opts.update({
             'format': 'bestaudio/best',
             'outtmpl': output_template,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
+            'postprocessors': [extraction.audio_postprocessor(audio_format)],
             'progress_hooks': [self._download_progress_hook],
         })
         
         try:
             print(f"\nDownloading audio...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Audio downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading audio: {str(e)}")
+            return extraction.failed_result(e)
     
-    def batch_download(self, urls):
+    def batch_download(self, urls, max_workers=batch.DEFAULT_MAX_WORKERS, per_host=batch.DEFAULT_PER_HOST):
         """
-        Download multiple Facebook posts/videos
+        Download multiple Facebook posts/videos in parallel
         
         Args:
             urls: List of Facebook URLs
+            max_workers: Maximum downloads running at once
+            per_host: Maximum downloads running at once against the same host
+            
+        Returns:
+            list: Per-URL results (url, success, files, error) in input order
         """
-        print(f"\nBatch downloading {len(urls)} item(s)...")
+        print(f"\nBatch downloading {len(urls)} item(s), {max_workers} at a time...")
         
-        for idx, url in enumerate(urls, 1):
-            print(f"\n[{idx}/{len(urls)}] Processing: {url}")
-            try:
-                content_type = self.detect_content_type(url)
-                if content_type == 'image':
-                    self.download_image(url)
-                else:
-                    self.download_post(url)
-            except Exception as e:
-                print(f"Failed to download {url}: {str(e)}")
-                continue
+        results = batch.run_batch(urls, self._download_batch_item, max_workers=max_workers, per_host=per_host)
         
-        print("\n✓ Batch download completed!")
+        batch.print_summary(results)
+        return results
+    
+    def _download_batch_item(self, url):
+        """Download one batch URL as an image or a post depending on its content"""
+        info = self.get_video_info(url)
+        if not info:
+            return extraction.failed_result('Failed to fetch content information')
+        
+        content_type = self.detect_content_type(url, info)
+        if content_type == 'image':
+            return self.download_image(url, info=info)
+        else:
+            return self.download_post(url, info=info)
     
     def _download_progress_hook(self, d):
         """Progress hook for download updates"""
+        report_progress(d)
         if d['status'] == 'downloading':
             percent = d.get('_percent_str', 'N/A')
             speed = d.get('_speed_str', 'N/A')
@@ -340,7 +390,7 @@ class FacebookDownloader:
             return
         
         # Detect content type
-        content_type = self.detect_content_type(url)
+        content_type = self.detect_content_type(url, info)
         
         # Display content info
         title = info.get('title', 'Unknown')
@@ -366,7 +416,7 @@ class FacebookDownloader:
         
         if content_type == 'video' or content_type == 'album':
             print("1. Download Post/Video (Best Quality)")
-            print("2. Download Audio Only (MP3)")
+            print("2. Download Audio Only (original codec or MP3)")
             print("3. Back to main menu")
         else:
             print("1. Download Post/Image")
@@ -378,13 +428,14 @@ class FacebookDownloader:
         
         if choice == "1":
             if content_type == 'image':
-                self.download_image(url)
+                self.download_image(url, info=info)
             else:
-                self.download_post(url)
+                self.download_post(url, info=info)
         
         elif choice == "2":
             if content_type == 'video' or content_type == 'album':
-                self.download_audio(url)
+                to_mp3 = input("Convert to MP3? (y/n, default: n keeps the original codec): ").strip().lower() == 'y'
+                self.download_audio(url, info=info, audio_format='mp3' if to_mp3 else 'original')
             else:
                 return
         
@@ -419,6 +470,6 @@ class FacebookDownloader:
         confirm = input("Continue with batch download? (y/n): ").strip().lower()
         
         if confirm == 'y':
-            self.batch_download(urls)
+            self.batch_download(urls, max_workers=batch.ask_parallel_downloads())
         else:
             print("Batch download cancelled.")
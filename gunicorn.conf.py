@@ -0,0 +1,62 @@
+"""
+Gunicorn configuration for UniDownload
+Loaded automatically by `gunicorn server:app` from the project root
+"""
+
+import gc
+import os
+import tempfile
+
+
+# Import the app once in the master and fork workers from it, so yt-dlp and
+# its extractors are loaded once and shared copy-on-write (PRELOAD_APP=0 to
+# import in each worker instead)
+preload_app = os.environ.get('PRELOAD_APP', '1') != '0'
+
+# Job event streams and /api/stream hold a request open for the whole
+# download. Threaded workers serve them on their own threads while the
+# worker keeps answering the arbiter's heartbeat; a sync worker would be
+# busy for minutes and killed after `timeout` seconds, jobs and all
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '32'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+
+# Workers write Prometheus samples to files here so /api/metrics can sum
+# them; must be set before the app (and prometheus_client) is imported
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='unidownload-metrics-')
+
+
+def on_starting(server):
+    """Start from empty metrics; files left by a previous run would be summed in"""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.db'):
+            os.remove(os.path.join(directory, name))
+
+
+def when_ready(server):
+    """Warm the preloaded app in the master before the first worker forks"""
+    if not server.cfg.preload_app:
+        return
+
+    import server as app_module
+    app_module.warm_up()
+
+    # Move everything loaded so far out of the collector's view, so garbage
+    # collection in workers does not touch (and un-share) those pages
+    gc.freeze()
+    server.log.info("Preloaded app warmed up")
+
+
+def post_worker_init(worker):
+    """Start the worker's job leases and resume jobs orphaned by dead workers"""
+    import server as app_module
+    app_module.start_background(worker.cfg.workers)
+
+
+def child_exit(server, worker):
+    """Stop counting a dead worker's queued and running jobs"""
+    import metrics
+    metrics.worker_exit(worker.pid)
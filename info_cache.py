@@ -0,0 +1,245 @@
+"""
+Info Cache Module
+Two-tier (in-process LRU + shared SQLite) cache of yt-dlp info dicts keyed by platform and media ID
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from job_cost import cost_profile
+from metrics import CACHE_REQUESTS
+from url_router import route as route_url
+
+
+# Keys yt-dlp adds while selecting formats or downloading; dropped so a cached
+# info dict can be re-processed with different options
+_TRANSIENT_KEYS = {
+    'requested_downloads', 'requested_formats', 'requested_subtitles',
+    'filepath', '_filename', 'filename', 'infojson_filename',
+}
+
+def media_id(platform, url):
+    """
+    Derive a canonical media ID from a URL without network access
+
+    Args:
+        platform: Platform name (youtube, instagram, facebook)
+        url: Media URL
+
+    Returns:
+        str: Canonical ID from the URL router, or the normalized URL when the URL is not a known shape
+    """
+    route = route_url(url)
+    if route is not None and route.platform == platform:
+        return route.key
+
+    parts = urlsplit(url.strip())
+    return f"{parts.netloc.lower()}{parts.path.rstrip('/')}?{parts.query}"
+
+
+def _clean_info(obj):
+    """Return a JSON-safe copy of an info dict without download-specific keys"""
+    if isinstance(obj, dict):
+        return {
+            k: _clean_info(v) for k, v in obj.items()
+            if not k.startswith('__') and k not in _TRANSIENT_KEYS
+        }
+    elif isinstance(obj, (list, tuple, set)):
+        return [_clean_info(v) for v in obj]
+    elif obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    else:
+        return repr(obj)
+
+
+class InfoCache:
+    """TTL + LRU cache of extracted info dicts shared by all server workers"""
+
+    def __init__(self, db_path=None, ttl=600, max_entries=256, max_disk_entries=5000):
+        """
+        Initialize info cache
+
+        Args:
+            db_path: SQLite file for the shared tier (None disables it)
+            ttl: Seconds an entry stays valid (stream URLs expire upstream)
+            max_entries: Entries kept in the in-process tier
+            max_disk_entries: Entries kept in the SQLite tier
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._connect()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS info_cache ('
+                'key TEXT PRIMARY KEY, info TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL, profile TEXT)'
+            )
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(info_cache)')}
+            if 'profile' not in columns:
+                conn.execute('ALTER TABLE info_cache ADD COLUMN profile TEXT')
+
+    def _connect(self):
+        """Return this thread's SQLite connection (reopened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Close the calling thread's SQLite connection, e.g. before the process forks"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def get(self, platform, url):
+        """
+        Look up the info dict for a URL
+
+        Args:
+            platform: Platform name
+            url: Media URL
+
+        Returns:
+            dict: A private copy of the cached info dict, or None on a miss
+        """
+        key = f'{platform}:{media_id(platform, url)}'
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.labels('info', 'hit').inc()
+                return json.loads(entry[1])
+            if entry:
+                del self._memory[key]
+
+        if self.db_path:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    'SELECT info, expires_at, profile FROM info_cache WHERE key = ? AND expires_at > ?',
+                    (key, now)
+                ).fetchone()
+                if row:
+                    conn.execute('UPDATE info_cache SET accessed_at = ? WHERE key = ?', (now, key))
+                    self._remember(key, row[0], row[1], json.loads(row[2]) if row[2] else None)
+                    with self._lock:
+                        self.hits += 1
+                    CACHE_REQUESTS.labels('info', 'hit').inc()
+                    return json.loads(row[0])
+            except sqlite3.Error as e:
+                print(f"Info cache read error: {str(e)}")
+
+        with self._lock:
+            self.misses += 1
+        CACHE_REQUESTS.labels('info', 'miss').inc()
+        return None
+
+    def profile(self, platform, url):
+        """
+        Look up the cost profile of a URL's cached info without counting a cache request or refreshing its entry
+
+        The profile is stored with the info dict, so estimating a job's cost
+        never decodes the full info in the request thread.
+
+        Args:
+            platform: Platform name
+            url: Media URL
+
+        Returns:
+            dict: job_cost.cost_profile of the cached info dict (shared, not to
+                be modified), or None when it is not cached
+        """
+        key = f'{platform}:{media_id(platform, url)}'
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                return entry[2]
+
+        if self.db_path:
+            try:
+                row = self._connect().execute(
+                    'SELECT profile FROM info_cache WHERE key = ? AND expires_at > ?',
+                    (key, now)
+                ).fetchone()
+                if row and row[0]:
+                    return json.loads(row[0])
+            except sqlite3.Error as e:
+                print(f"Info cache read error: {str(e)}")
+        return None
+
+    def put(self, platform, url, info):
+        """
+        Store an info dict for a URL in both tiers
+
+        Args:
+            platform: Platform name
+            url: Media URL
+            info: Info dict returned by yt-dlp
+        """
+        if not info:
+            return
+
+        key = f'{platform}:{media_id(platform, url)}'
+        now = time.time()
+        expires_at = now + self.ttl
+        cleaned = _clean_info(info)
+        payload = json.dumps(cleaned)
+        profile = cost_profile(cleaned)
+
+        self._remember(key, payload, expires_at, profile)
+
+        if self.db_path:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    'INSERT OR REPLACE INTO info_cache (key, info, expires_at, accessed_at, profile) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, payload, expires_at, now, json.dumps(profile))
+                )
+                conn.execute('DELETE FROM info_cache WHERE expires_at <= ?', (now,))
+                conn.execute(
+                    'DELETE FROM info_cache WHERE key IN ('
+                    'SELECT key FROM info_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_disk_entries,)
+                )
+            except sqlite3.Error as e:
+                print(f"Info cache write error: {str(e)}")
+
+    def _remember(self, key, payload, expires_at, profile):
+        """Insert into the in-process tier, evicting least recently used entries"""
+        with self._lock:
+            self._memory[key] = (expires_at, payload, profile)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self):
+        """Return hit/miss counters"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._memory)}
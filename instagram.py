@@ -4,12 +4,27 @@ Handles downloading posts, reels, stories, and IGTV from Instagram using yt-dlp
 """
 
 import os
-import yt_dlp
+import batch
+import extraction
+from bandwidth import bandwidth_scheduler
+from jobs import report_progress
+from url_router import route as route_url
+from ydl_pool import ydl_pool
 
 
 class InstagramDownloader:
     """Instagram media downloader for posts, reels, stories, and IGTV"""
     
+    # URL router kinds mapped to the media types reported to users
+    MEDIA_TYPES = {
+        'post': 'post',
+        'reel': 'reel',
+        'tv': 'tv',
+        'story': 'story',
+        'stories': 'story',
+        'highlight': 'story',
+    }
+    
     def __init__(self, download_path="downloads/instagram"):
         """
         Initialize Instagram downloader
@@ -110,8 +125,8 @@ class InstagramDownloader:
         })
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                info = extraction.extract_info(ydl, url)
                 return info
         except Exception as e:
             error_msg = str(e)
@@ -139,26 +154,24 @@ class InstagramDownloader:
             url: Instagram URL
             
         Returns:
-            str: Media type (post, reel, story, tv, profile)
+            str: Media type (post, reel, story, tv, unknown)
         """
-        if '/reel/' in url or '/reels/' in url:
-            return 'reel'
-        elif '/stories/' in url:
-            return 'story'
-        elif '/tv/' in url or 'igtv' in url.lower():
-            return 'tv'
-        elif '/p/' in url:
-            return 'post'
-        else:
+        route = route_url(url)
+        if route is None or route.platform != 'instagram':
             return 'unknown'
+        return self.MEDIA_TYPES.get(route.kind, 'unknown')
     
-    def download_post(self, url, download_thumbnail=False):
+    def download_post(self, url, download_thumbnail=False, info=None):
         """
         Download Instagram post (photo or video)
         
         Args:
             url: Instagram post URL
             download_thumbnail: Download thumbnail for videos
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, '%(uploader)s_%(id)s.%(ext)s')
         
@@ -173,27 +186,35 @@ class InstagramDownloader:
         
         try:
             print(f"\nDownloading Instagram post...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
+                info = result['info']
                 
                 # Check if it's a carousel (multiple images/videos)
                 if info and '_type' in info and info['_type'] == 'playlist':
                     print(f"✓ Downloaded {len(info.get('entries', []))} media items from carousel!")
                 else:
                     print("\n✓ Post downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading post: {str(e)}")
             print("\n⚠ If this is a private post or carousel:")
             print("  Go to Advanced Options → Enable Browser Cookies")
             print("📌 Make sure you're logged into Instagram in that browser.")
+            return extraction.failed_result(e)
     
-    def download_reel(self, url, quality='best'):
+    def download_reel(self, url, quality='best', info=None):
         """
         Download Instagram reel
         
         Args:
             url: Instagram reel URL
             quality: Video quality (best, 720p, 480p, 360p)
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, 'reels', '%(uploader)s_%(id)s.%(ext)s')
         
@@ -211,19 +232,26 @@ class InstagramDownloader:
         
         try:
             print(f"\nDownloading Instagram reel...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Reel downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading reel: {str(e)}")
             self._show_instagram_help()
+            return extraction.failed_result(e)
     
-    def download_story(self, url):
+    def download_story(self, url, info=None):
         """
         Download Instagram story
         
         Args:
             url: Instagram story URL
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, 'stories', '%(uploader)s_%(id)s.%(ext)s')
         
@@ -240,19 +268,26 @@ class InstagramDownloader:
         
         try:
             print(f"\nDownloading Instagram story...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Story downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading story: {str(e)}")
             self._show_instagram_help()
+            return extraction.failed_result(e)
     
-    def download_igtv(self, url):
+    def download_igtv(self, url, info=None):
         """
         Download Instagram TV (IGTV) video
         
         Args:
             url: IGTV URL
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, 'igtv', '%(uploader)s_%(id)s.%(ext)s')
         
@@ -270,21 +305,29 @@ class InstagramDownloader:
         
         try:
             print(f"\nDownloading IGTV video...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ IGTV video downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading IGTV: {str(e)}")
             self._show_instagram_help()
+            return extraction.failed_result(e)
     
-    def download_audio(self, url):
+    def download_audio(self, url, info=None, audio_format='original'):
         """
         Download audio from Instagram video/reel
         
         Args:
             url: Instagram URL
+            info: Info dict from a previous extraction (skips re-extraction)
+            audio_format: 'original' keeps the source codec (no re-encode), 'mp3' converts to MP3
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
-        output_template = os.path.join(self.download_path, 'audio', '%(uploader)s_%(id)s.%(ext)s')
+        output_template = extraction.output_template(os.path.join(self.download_path, 'audio'), '%(uploader)s_%(id)s', audio_format)
         
         # Create audio subdirectory
         audio_dir = os.path.join(self.download_path, 'audio')
@@ -295,52 +338,56 @@ class InstagramDownloader:
         ydl_opts.update({
             'format': 'bestaudio/best',
             'outtmpl': output_template,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
+            'postprocessors': [extraction.audio_postprocessor(audio_format)],
             'progress_hooks': [self._download_progress_hook],
         })
         
         try:
             print(f"\nDownloading audio...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Audio downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading audio: {str(e)}")
+            return extraction.failed_result(e)
     
-    def batch_download(self, urls):
+    def batch_download(self, urls, max_workers=batch.DEFAULT_MAX_WORKERS, per_host=batch.DEFAULT_PER_HOST):
         """
-        Download multiple Instagram URLs
+        Download multiple Instagram URLs in parallel
         
         Args:
             urls: List of Instagram URLs
+            max_workers: Maximum downloads running at once
+            per_host: Maximum downloads running at once against the same host
+            
+        Returns:
+            list: Per-URL results (url, success, files, error) in input order
         """
-        print(f"\nBatch downloading {len(urls)} item(s)...")
+        print(f"\nBatch downloading {len(urls)} item(s), {max_workers} at a time...")
         
-        for idx, url in enumerate(urls, 1):
-            print(f"\n[{idx}/{len(urls)}] Processing: {url}")
-            media_type = self.detect_media_type(url)
-            
-            try:
-                if media_type == 'reel':
-                    self.download_reel(url)
-                elif media_type == 'story':
-                    self.download_story(url)
-                elif media_type == 'tv':
-                    self.download_igtv(url)
-                else:
-                    self.download_post(url)
-            except Exception as e:
-                print(f"Failed to download {url}: {str(e)}")
-                continue
+        results = batch.run_batch(urls, self._download_batch_item, max_workers=max_workers, per_host=per_host)
         
-        print("\n✓ Batch download completed!")
+        batch.print_summary(results)
+        return results
+    
+    def _download_batch_item(self, url):
+        """Download one batch URL with the method matching its media type"""
+        media_type = self.detect_media_type(url)
+        
+        if media_type == 'reel':
+            return self.download_reel(url)
+        elif media_type == 'story':
+            return self.download_story(url)
+        elif media_type == 'tv':
+            return self.download_igtv(url)
+        else:
+            return self.download_post(url)
     
     def _download_progress_hook(self, d):
         """Progress hook for download updates"""
+        report_progress(d)
         if d['status'] == 'downloading':
             percent = d.get('_percent_str', 'N/A')
             speed = d.get('_speed_str', 'N/A')
@@ -394,7 +441,7 @@ class InstagramDownloader:
         print("\nDownload Options:")
         print("=" * 60)
         print("1. Download Media (Best Quality)")
-        print("2. Download Audio Only (MP3)")
+        print("2. Download Audio Only (original codec or MP3)")
         print("3. Download with Thumbnail")
         print("4. Back to main menu")
         print()
@@ -403,19 +450,20 @@ class InstagramDownloader:
         
         if choice == "1":
             if media_type == 'reel':
-                self.download_reel(url)
+                self.download_reel(url, info=info)
             elif media_type == 'story':
-                self.download_story(url)
+                self.download_story(url, info=info)
             elif media_type == 'tv':
-                self.download_igtv(url)
+                self.download_igtv(url, info=info)
             else:
-                self.download_post(url)
+                self.download_post(url, info=info)
         
         elif choice == "2":
-            self.download_audio(url)
+            to_mp3 = input("Convert to MP3? (y/n, default: n keeps the original codec): ").strip().lower() == 'y'
+            self.download_audio(url, info=info, audio_format='mp3' if to_mp3 else 'original')
         
         elif choice == "3":
-            self.download_post(url, download_thumbnail=True)
+            self.download_post(url, download_thumbnail=True, info=info)
         
         elif choice == "4":
             return
@@ -448,6 +496,6 @@ class InstagramDownloader:
         confirm = input("Continue with batch download? (y/n): ").strip().lower()
         
         if confirm == 'y':
-            self.batch_download(urls)
+            self.batch_download(urls, max_workers=batch.ask_parallel_downloads())
         else:
             print("Batch download cancelled.")
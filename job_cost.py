@@ -0,0 +1,164 @@
+"""
+Job Cost Module
+Estimates how long a download job will take from its option and the cached info dict
+
+The job manager runs queued jobs shortest first, so the estimate only has
+to rank jobs sensibly: a thumbnail far below an audio track, an audio
+track below a 4K video, a video below a long playlist. Sizes come from
+the info dict extracted by /api/detect when it is still cached, reduced
+by cost_profile to the few fields read here; without one, each option
+falls back to a typical cost.
+"""
+
+
+# Options that fetch a few kilobytes; they run in the light lane
+LIGHT_OPTIONS = {'thumbnail', 'subtitles'}
+
+# Estimated seconds of a job that moves almost no data
+LIGHT_COST = {'thumbnail': 0.2, 'subtitles': 0.5}
+
+# Estimated seconds when nothing is known about the media
+DEFAULT_COST = {'video': 60.0, 'audio': 20.0, 'post': 30.0, 'playlist': 600.0}
+
+# Seconds spent extracting before the first byte (most of it is skipped
+# when the info dict is cached)
+EXTRACT_COST = 2.0
+CACHED_EXTRACT_COST = 0.5
+
+# Assumed transfer rate for turning sizes into seconds
+THROUGHPUT = 5 * 1024 ** 2
+
+# Assumed bytes per second of media, for formats without a size
+BYTES_PER_MEDIA_SECOND = {'video': 400 * 1024, 'post': 400 * 1024, 'audio': 20 * 1024}
+
+# Seconds of MP3 encoding per second of media (original-codec audio is only
+# remuxed, which is negligible)
+MP3_ENCODE_FACTOR = 0.02
+
+# Fields of a format dict the estimate reads
+FORMAT_FIELDS = ('filesize', 'filesize_approx', 'vcodec', 'acodec', 'height')
+
+
+def cost_profile(info):
+    """
+    Reduce an info dict to the fields estimate_cost reads
+
+    A full info dict runs to hundreds of kilobytes of JSON; the profile is
+    small enough to keep next to it and read on every download request.
+
+    Args:
+        info: Info dict returned by yt-dlp
+
+    Returns:
+        dict: Info dict of the same shape with only the sizes, durations and format fields
+    """
+    def media(item):
+        return {
+            'filesize': item.get('filesize'),
+            'filesize_approx': item.get('filesize_approx'),
+            'duration': item.get('duration'),
+            'formats': [{name: fmt.get(name) for name in FORMAT_FIELDS} for fmt in item.get('formats') or []],
+        }
+
+    profile = media(info)
+    if info.get('entries') is not None:
+        profile['entries'] = [media(entry) if entry else None for entry in info['entries']]
+    return profile
+
+
+def job_lane(option):
+    """
+    Pick the queue lane for a download option
+
+    Args:
+        option: Download option
+
+    Returns:
+        str: 'light' or 'heavy'
+    """
+    return 'light' if option in LIGHT_OPTIONS else 'heavy'
+
+
+def _format_size(fmt):
+    """Size in bytes of a format dict, or 0 when yt-dlp does not know it"""
+    return fmt.get('filesize') or fmt.get('filesize_approx') or 0
+
+
+def _media_bytes(option, info, quality_height=None):
+    """
+    Estimate the bytes a single media download transfers
+
+    Args:
+        option: 'video', 'audio' or 'post'
+        info: Info dict of one media item
+        quality_height: Maximum video height requested
+
+    Returns:
+        int: Estimated bytes (0 when the info says nothing about size or duration)
+    """
+    formats = info.get('formats') or []
+    audio = [_format_size(f) for f in formats
+             if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+    best_audio = max(audio, default=0)
+
+    if option == 'audio':
+        size = best_audio
+    else:
+        video = [_format_size(f) for f in formats
+                 if f.get('vcodec') not in (None, 'none')
+                 and (not quality_height or (f.get('height') or 0) <= quality_height)]
+        best_video = max(video, default=0)
+        size = best_video + best_audio if best_video else 0
+
+    if not size:
+        size = _format_size(info)
+    if not size and info.get('duration'):
+        size = info['duration'] * BYTES_PER_MEDIA_SECOND.get(option, BYTES_PER_MEDIA_SECOND['video'])
+    return int(size)
+
+
+def _media_cost(option, info, quality_height=None, audio_format=None):
+    """Estimated seconds to download one media item, or None when its info says nothing"""
+    size = _media_bytes(option, info, quality_height)
+    if not size:
+        return None
+    cost = size / THROUGHPUT
+    if option == 'audio' and audio_format == 'mp3':
+        cost += (info.get('duration') or 0) * MP3_ENCODE_FACTOR
+    return cost
+
+
+def estimate_cost(option, info=None, quality_height=None, audio_format=None):
+    """
+    Estimate the seconds a download job will run
+
+    Args:
+        option: Download option (video, audio, playlist, subtitles, thumbnail, post)
+        info: Cached info dict (or its cost_profile) of the URL, or None if it is not cached
+        quality_height: Maximum video height requested
+        audio_format: 'original' or 'mp3' for audio downloads
+
+    Returns:
+        float: Estimated seconds (a rough ranking, not a prediction)
+    """
+    if option in LIGHT_COST:
+        return LIGHT_COST[option]
+
+    if not info:
+        return EXTRACT_COST + DEFAULT_COST.get(option, DEFAULT_COST['video'])
+
+    if option == 'playlist':
+        entries = [entry for entry in info.get('entries') or [] if entry]
+        if not entries:
+            return EXTRACT_COST + DEFAULT_COST['playlist']
+        # Flat playlist entries carry a duration at best; unknown ones count as typical videos
+        cost = 0.0
+        for entry in entries:
+            entry_cost = _media_cost('video', entry, quality_height)
+            cost += EXTRACT_COST + (entry_cost if entry_cost is not None else DEFAULT_COST['video'])
+        return cost
+
+    cost = _media_cost(option, info, quality_height, audio_format)
+    if cost is None:
+        cost = DEFAULT_COST.get(option, DEFAULT_COST['video'])
+    return CACHED_EXTRACT_COST + cost
@@ -0,0 +1,255 @@
+"""
+Job Journal Module
+Write-ahead SQLite journal of download jobs so work lost with a worker is resumed, not restarted
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+
+# Attempts before a job that keeps dying with its worker is given up
+MAX_ATTEMPTS = 3
+
+
+def owner_id():
+    """Identity of the calling process, unique across hosts sharing the journal"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class JobJournal:
+    """Durable record of queued and running jobs with leases held by their worker
+
+    A worker renews the lease of every job it holds. When a worker dies (a
+    deploy, an OOM kill, a crash) its leases run out and any other worker,
+    or the replacement, claims the jobs and runs them again. yt-dlp then
+    continues each download from its .part file instead of starting over.
+    """
+
+    # Fields of each job returned by claim_orphans
+    CLAIM_FIELDS = ('key', 'task', 'args', 'kwargs', 'description', 'part_path', 'part_bytes')
+
+    def __init__(self, db_path, lease_seconds=30, progress_interval=1.0, history_seconds=86400):
+        """
+        Initialize job journal
+
+        Args:
+            db_path: SQLite file shared by all workers
+            lease_seconds: Seconds a job stays owned without a renewal
+            progress_interval: Minimum seconds between partial-file writes per job
+            history_seconds: Seconds finished and failed jobs are kept
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.progress_interval = progress_interval
+        self.history_seconds = history_seconds
+        self._last_progress = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._create_schema(self._connect())
+
+    def _create_schema(self, conn):
+        """Create the jobs table and its lease index"""
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'job_id TEXT PRIMARY KEY, key TEXT, task TEXT NOT NULL, '
+            'args TEXT NOT NULL, kwargs TEXT NOT NULL, description TEXT NOT NULL, '
+            'state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'owner TEXT, lease_expires REAL, error TEXT, '
+            'created_at REAL NOT NULL, started_at REAL, finished_at REAL, updated_at REAL NOT NULL, '
+            'part_path TEXT, part_bytes INTEGER NOT NULL DEFAULT 0)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (state, lease_expires)')
+
+    def _connect(self):
+        """Return this thread's SQLite connection (reopened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Close the calling thread's SQLite connection, e.g. before the process forks"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def record(self, job, task):
+        """
+        Journal a newly submitted job before it is queued
+
+        Args:
+            job: Job being submitted
+            task: Name of the task function, resolved again on recovery
+        """
+        now = time.time()
+        self._connect().execute(
+            'INSERT OR REPLACE INTO jobs (job_id, key, task, args, kwargs, description, state, '
+            'owner, lease_expires, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job.id, job.key, task, json.dumps(list(job.args)), json.dumps(job.kwargs),
+             json.dumps(job.description), 'queued', owner_id(), now + self.lease_seconds,
+             job.created_at, now)
+        )
+
+    def started(self, job_id):
+        """Mark a job as running and count the attempt"""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE jobs SET state = 'running', attempts = attempts + 1, started_at = ?, updated_at = ? "
+            'WHERE job_id = ?',
+            (now, now, job_id)
+        )
+
+    def _due(self, job_id, downloading):
+        """Check whether a progress write is due for a job, and note it as written"""
+        now = time.monotonic()
+        with self._lock:
+            if downloading and now - self._last_progress.get(job_id, 0) < self.progress_interval:
+                return False
+            self._last_progress[job_id] = now
+        return True
+
+    def progress(self, job, d):
+        """
+        Remember the partial file of a running download (at most every progress_interval seconds)
+
+        Args:
+            job: Job whose download progressed
+            d: Progress dictionary passed to yt-dlp progress hooks
+        """
+        if d.get('status') != 'downloading' or not self._due(job.id, True):
+            return
+        try:
+            self._connect().execute(
+                'UPDATE jobs SET part_path = ?, part_bytes = ?, updated_at = ? WHERE job_id = ?',
+                (d.get('tmpfilename') or d.get('filename'), d.get('downloaded_bytes') or 0, time.time(), job.id)
+            )
+        except sqlite3.Error as e:
+            print(f"Job journal write error: {str(e)}")
+
+    def finished(self, job_id, state, error=None, remove_part=True):
+        """
+        Close a job's journal entry
+
+        A failed job is not resumed, so its partial file is deleted.
+
+        Args:
+            job_id: Job identifier
+            state: Final state (finished or failed)
+            error: Error message of a failed job
+            remove_part: Delete the partial file of a failed job
+        """
+        conn = self._finishing(job_id, state, remove_part)
+        now = time.time()
+        conn.execute(
+            'UPDATE jobs SET state = ?, error = ?, owner = NULL, lease_expires = NULL, '
+            'finished_at = ?, updated_at = ? WHERE job_id = ?',
+            (state, error, now, now, job_id)
+        )
+
+    def _finishing(self, job_id, state, remove_part):
+        """Forget a job's progress throttle and delete the partial file of a failed one"""
+        with self._lock:
+            self._last_progress.pop(job_id, None)
+        conn = self._connect()
+        if state == 'failed' and remove_part:
+            row = conn.execute('SELECT part_path FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            if row:
+                self._remove_part(row[0])
+        return conn
+
+    def renew(self, job_ids):
+        """
+        Extend the leases of jobs this process still holds
+
+        Args:
+            job_ids: IDs of the process's queued and running jobs
+        """
+        if not job_ids:
+            return
+        conn = self._connect()
+        expires = time.time() + self.lease_seconds
+        owner = owner_id()
+        for job_id in job_ids:
+            conn.execute(
+                'UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND owner = ?',
+                (expires, job_id, owner)
+            )
+
+    def claim_orphans(self):
+        """
+        Take over unfinished jobs whose worker stopped renewing them
+
+        Jobs that already used MAX_ATTEMPTS attempts are marked failed and
+        their partial files deleted instead. Claimed jobs are returned oldest
+        first.
+
+        Returns:
+            list: Dicts with job_id and the CLAIM_FIELDS of each claimed job
+        """
+        conn = self._connect()
+        now = time.time()
+        owner = owner_id()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                f"SELECT job_id, attempts, {', '.join(self.CLAIM_FIELDS)} "
+                "FROM jobs WHERE state IN ('queued', 'running') AND lease_expires < ? ORDER BY created_at",
+                (now,)
+            ).fetchall()
+            claimed = []
+            abandoned = []
+            for job_id, attempts, *fields in rows:
+                entry = dict(zip(self.CLAIM_FIELDS, fields))
+                if attempts >= MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE jobs SET state = 'failed', error = ?, owner = NULL, "
+                        'lease_expires = NULL, finished_at = ?, updated_at = ? WHERE job_id = ?',
+                        (f'Abandoned after {attempts} interrupted attempts', now, now, job_id)
+                    )
+                    abandoned.append(entry['part_path'])
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', owner = ?, lease_expires = ?, updated_at = ? "
+                    'WHERE job_id = ?',
+                    (owner, now + self.lease_seconds, now, job_id)
+                )
+                for name in ('args', 'kwargs', 'description'):
+                    entry[name] = json.loads(entry[name])
+                entry['job_id'] = job_id
+                claimed.append(entry)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        for part_path in abandoned:
+            self._remove_part(part_path)
+        return claimed
+
+    def prune(self):
+        """Forget finished and failed jobs older than history_seconds"""
+        self._connect().execute(
+            "DELETE FROM jobs WHERE state IN ('finished', 'failed') AND updated_at < ?",
+            (time.time() - self.history_seconds,)
+        )
+
+    def _remove_part(self, part_path):
+        """Delete a partial download file if it is still there"""
+        if part_path and part_path.endswith('.part') and os.path.exists(part_path):
+            try:
+                os.remove(part_path)
+            except OSError as e:
+                print(f"Could not remove partial file {part_path}: {str(e)}")
@@ -0,0 +1,204 @@
+"""
+Job Store Module
+Shared SQLite record of download jobs: state, progress, results and timings for every worker,
+kept in the job journal's table so work lost with a worker is still resumed
+"""
+
+import json
+import sqlite3
+import time
+
+from job_journal import JobJournal, owner_id
+
+
+# Columns read for a status snapshot, in the order _snapshot unpacks them
+SNAPSHOT_COLUMNS = ('job_id, state, description, progress, result, error, accounting, requests, '
+                    'created_at, started_at, finished_at')
+
+# Columns the store adds to the journal's jobs table
+STORE_COLUMNS = (
+    ('client', 'TEXT'),
+    ('requests', 'INTEGER NOT NULL DEFAULT 1'),
+    ('progress', 'TEXT'),
+    ('result', 'TEXT'),
+    ('accounting', 'TEXT'),
+)
+
+
+class JobStore(JobJournal):
+    """Durable record of jobs shared by all workers, built on the crash-recovery journal
+
+    Every worker writes its jobs' state, throttled progress, results and
+    accounting here, so a status query is a primary-key read that any worker
+    can answer. Jobs are indexed by ID, key (an in-flight key is unique, so
+    identical requests reaching different workers share one job) and client.
+    Leases and resuming jobs of dead workers come from JobJournal.
+    """
+
+    CLAIM_FIELDS = JobJournal.CLAIM_FIELDS + ('client',)
+
+    def _create_schema(self, conn):
+        """Create the journal's table, add the store's columns and its indexes"""
+        super()._create_schema(conn)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+        for column, kind in STORE_COLUMNS:
+            if column not in columns:
+                conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client, created_at)')
+        conn.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS jobs_inflight ON jobs (key) '
+            "WHERE state IN ('queued', 'running')"
+        )
+
+    def record(self, job, task):
+        """
+        Store a newly submitted job before it is queued
+
+        Args:
+            job: Job being submitted
+            task: Name of the task function, resolved again on recovery
+
+        Returns:
+            str: ID of a queued or running job with the same key (another
+                worker's), whose request count was incremented instead; None
+                once this job is stored
+        """
+        conn = self._connect()
+        for attempt in range(3):
+            now = time.time()
+            try:
+                conn.execute(
+                    'INSERT INTO jobs (job_id, key, client, task, args, kwargs, description, state, '
+                    'owner, lease_expires, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (job.id, job.key, job.client, task, json.dumps(list(job.args)), json.dumps(job.kwargs),
+                     json.dumps(job.description), 'queued', owner_id(), now + self.lease_seconds,
+                     job.created_at, now)
+                )
+                return None
+            except sqlite3.IntegrityError:
+                if job.key is None or attempt == 2:
+                    raise
+                row = conn.execute(
+                    "SELECT job_id FROM jobs WHERE key = ? AND state IN ('queued', 'running')",
+                    (job.key,)
+                ).fetchone()
+                if row is not None:
+                    self.add_request(row[0])
+                    return row[0]
+                # The other job ended between the insert and the lookup; try again
+
+    def add_request(self, job_id):
+        """Count one more request attached to a job"""
+        self._connect().execute('UPDATE jobs SET requests = requests + 1 WHERE job_id = ?', (job_id,))
+
+    def progress(self, job, d):
+        """
+        Store a running job's progress, accounting and partial file
+
+        Byte progress is written at most every progress_interval seconds per
+        job; the end of each file is always written.
+
+        Args:
+            job: Job whose progress changed
+            d: Progress dictionary passed to yt-dlp progress hooks
+        """
+        downloading = d.get('status') == 'downloading'
+        if not self._due(job.id, downloading):
+            return
+
+        accounting = job.accounting.to_dict(time.time() - job.created_at)
+        try:
+            if downloading:
+                self._connect().execute(
+                    'UPDATE jobs SET progress = ?, accounting = ?, part_path = ?, part_bytes = ?, updated_at = ? '
+                    'WHERE job_id = ?',
+                    (json.dumps(job.progress), json.dumps(accounting), d.get('tmpfilename') or d.get('filename'),
+                     d.get('downloaded_bytes') or 0, time.time(), job.id)
+                )
+            else:
+                self._connect().execute(
+                    'UPDATE jobs SET progress = ?, accounting = ?, updated_at = ? WHERE job_id = ?',
+                    (json.dumps(job.progress), json.dumps(accounting), time.time(), job.id)
+                )
+        except sqlite3.Error as e:
+            print(f"Job store write error: {str(e)}")
+
+    def finished(self, job_id, state, error=None, remove_part=True, result=None, accounting=None, progress=None):
+        """
+        Store the outcome of a job and release it
+
+        A failed job is not resumed, so its partial file is deleted.
+
+        Args:
+            job_id: Job identifier
+            state: Final state (finished or failed)
+            error: Error message of a failed job
+            remove_part: Delete the partial file of a failed job
+            result: Result dict of a finished job
+            accounting: Final accounting snapshot of the job
+            progress: Last progress snapshot of the job
+        """
+        conn = self._finishing(job_id, state, remove_part)
+        now = time.time()
+        conn.execute(
+            'UPDATE jobs SET state = ?, error = ?, result = COALESCE(?, result), '
+            'accounting = COALESCE(?, accounting), progress = COALESCE(?, progress), owner = NULL, '
+            'lease_expires = NULL, finished_at = ?, updated_at = ? WHERE job_id = ?',
+            (state, error, json.dumps(result) if result is not None else None,
+             json.dumps(accounting) if accounting is not None else None,
+             json.dumps(progress) if progress is not None else None, now, now, job_id)
+        )
+
+    def get(self, job_id):
+        """
+        Look up a job by ID
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            dict: Status snapshot shaped like Job.to_dict, or None if unknown
+        """
+        row = self._connect().execute(
+            f'SELECT {SNAPSHOT_COLUMNS} FROM jobs WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        return self._snapshot(row) if row else None
+
+    def history(self, client, limit=50):
+        """
+        Get a client's most recent jobs
+
+        Args:
+            client: Client identity the jobs were submitted with
+            limit: Maximum number of jobs
+
+        Returns:
+            list: Status snapshots, newest first
+        """
+        rows = self._connect().execute(
+            f'SELECT {SNAPSHOT_COLUMNS} FROM jobs WHERE client = ? ORDER BY created_at DESC LIMIT ?',
+            (client, limit)
+        ).fetchall()
+        return [self._snapshot(row) for row in rows]
+
+    def _snapshot(self, row):
+        """Build a status snapshot from a row of SNAPSHOT_COLUMNS"""
+        (job_id, state, description, progress, result, error, accounting, requests,
+         created_at, started_at, finished_at) = row
+        data = {
+            'job_id': job_id,
+            'state': state,
+            'progress': json.loads(progress) if progress else {},
+            'requests': requests,
+            'created_at': created_at,
+            'started_at': started_at,
+            'finished_at': finished_at,
+            'accounting': json.loads(accounting) if accounting else None,
+        }
+        data.update(json.loads(description))
+        if result:
+            data.update(json.loads(result))
+        if error:
+            data['error'] = error
+        return data
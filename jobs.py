@@ -0,0 +1,866 @@
+"""
+Job Queue Module
+Runs download jobs in a bounded background worker pool so API requests return immediately
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from metrics import JOB_QUEUE_SECONDS, JOBS, JOBS_COMPLETED, JOBS_REJECTED
+
+
+# Thread-local slot holding the job the current worker thread is running
+_local = threading.local()
+
+# Discrete events (state changes, post-processing steps) kept per job for
+# event-stream clients that connect late or reconnect
+MAX_JOB_EVENTS = 100
+
+# Queue lanes: light jobs (thumbnails, subtitles) have workers of their own
+# and never wait behind heavy ones; heavy workers also take light jobs
+LANES = ('light', 'heavy')
+
+
+def current_job():
+    """Return the job being run by the calling thread, or None"""
+    return getattr(_local, 'job', None)
+
+
+def join_job(job):
+    """
+    Take a hold on a job's worker slot for a helper thread about to start
+
+    Called by the thread starting the helper, so the slot cannot be lent
+    out between the two; the helper then runs in job_context(job, joined=True).
+
+    Args:
+        job: Job the helper thread works for (None for no job)
+    """
+    if job is not None and job.manager is not None:
+        job.manager._rejoin(job)
+
+
+@contextmanager
+def job_context(job, holds_slot=True, joined=False):
+    """
+    Run a block on behalf of a job, e.g. in a helper thread the job started
+
+    Args:
+        job: Job whose progress the block reports (None for no job)
+        holds_slot: The block downloads for the job, so the job keeps its
+            worker slot while it runs (False for post-processing threads)
+        joined: The hold on the slot was already taken with join_job
+    """
+    manager = job.manager if job is not None and holds_slot else None
+    previous = current_job()
+    _local.job = job
+    if manager is not None and not joined:
+        manager._rejoin(job)
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        _local.job = previous
+        if manager is not None:
+            manager._leave(job)
+        if job is not None:
+            job.accounting.add_cpu(time.thread_time() - cpu_start)
+
+
+@contextmanager
+def off_worker():
+    """
+    Run a CPU-bound block of the current job without holding its worker slot
+
+    Once every thread of the job is in such a block, its slot goes to the
+    next queued job. The job takes a slot back when the block ends, waiting
+    for one if all are busy; jobs taking a slot back go before queued jobs.
+    """
+    job = current_job()
+    manager = job.manager if job is not None else None
+    if manager is not None:
+        manager._leave(job)
+    try:
+        yield
+    finally:
+        if manager is not None:
+            manager._rejoin(job)
+
+
+@contextmanager
+def job_stage(name):
+    """
+    Time a block as one stage of the job running in this thread
+
+    Args:
+        name: Stage name from JobAccounting.STAGES
+    """
+    job = current_job()
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        if job is not None:
+            job.accounting.add_stage(name, time.monotonic() - start)
+
+
+def run_started():
+    """Mark the start of a yt-dlp run in this thread; it is extracting until the first transfer"""
+    _local.run_started = time.monotonic()
+
+
+def run_finished():
+    """Mark the end of a yt-dlp run in this thread"""
+    _close_extract(time.monotonic())
+
+
+def _close_extract(now):
+    """Charge the open part of this thread's yt-dlp run to the extract stage"""
+    started = getattr(_local, 'run_started', None)
+    if started is None:
+        return
+    _local.run_started = None
+    job = current_job()
+    if job is not None:
+        job.accounting.add_stage('extract', max(0.0, now - started))
+
+
+def record_written(paths):
+    """
+    Add the sizes of a job's output files to the job running in this thread
+
+    Args:
+        paths: Final file paths
+    """
+    job = current_job()
+    if job is None:
+        return
+    written = 0
+    for path in paths:
+        try:
+            written += os.path.getsize(path)
+        except OSError:
+            pass
+    job.accounting.add_written(written)
+
+
+def report_progress(d):
+    """
+    Forward a yt-dlp progress hook dict to the job running in this thread
+
+    Args:
+        d: Progress dictionary passed to yt-dlp progress hooks
+    """
+    job = current_job()
+    if job is not None:
+        job.update_progress(d)
+
+
+def report_postprocessor(d):
+    """
+    Forward a yt-dlp post-processor hook dict to the job running in this thread
+
+    Args:
+        d: Dictionary passed to yt-dlp post-processor hooks
+    """
+    job = current_job()
+    if job is not None:
+        job.postprocessor_event(d)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no free slots"""
+
+
+class JobAccounting:
+    """Where one job spent its time, what it transferred and the CPU it used
+
+    Stage times are summed over the job's threads, so a playlist downloading
+    entries in parallel can report more stage time than wall time.
+    """
+
+    # queue: waiting for a worker or a post-processing worker; route: URL routing and info cache lookup;
+    # extract: yt-dlp extraction and format selection; download: network
+    # transfers; postprocess: FFmpeg and other post-processors; finalize:
+    # recording the result files (hashing, result store)
+    STAGES = ('queue', 'route', 'extract', 'download', 'postprocess', 'finalize')
+
+    def __init__(self):
+        self.stages = dict.fromkeys(self.STAGES, 0.0)
+        self.streams = []
+        self.postprocessors = {}
+        self.bytes_received = 0
+        self.bytes_written = 0
+        self.cpu_seconds = 0.0
+        self.child_cpu_seconds = 0.0
+        self._postprocess_started = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        """Add time to a stage"""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_cpu(self, seconds):
+        """Add CPU time used by one of the job's threads"""
+        with self._lock:
+            self.cpu_seconds += seconds
+
+    def add_child_cpu(self, seconds):
+        """Add CPU time used by child processes (ffmpeg) the job's steps ran"""
+        with self._lock:
+            self.child_cpu_seconds += seconds
+
+    def add_written(self, size):
+        """Add bytes of final output"""
+        with self._lock:
+            self.bytes_written += size
+
+    def progress(self, d):
+        """Record a finished stream from a yt-dlp progress hook dict"""
+        # Files already on disk finish without an elapsed time; nothing was transferred
+        if d.get('status') != 'finished' or not d.get('elapsed'):
+            return
+        size = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        info = d.get('info_dict') or {}
+        with self._lock:
+            self.streams.append({
+                'filename': os.path.basename(d.get('filename') or ''),
+                'format_id': info.get('format_id'),
+                'bytes': size,
+                'seconds': round(d['elapsed'], 3),
+            })
+            self.stages['download'] += d['elapsed']
+            self.bytes_received += size
+
+    def postprocessor(self, d):
+        """Time a post-processor from a yt-dlp post-processor hook dict"""
+        key = (threading.get_ident(), d.get('postprocessor') or 'unknown')
+        now = time.monotonic()
+        with self._lock:
+            if d.get('status') == 'started':
+                self._postprocess_started[key] = now
+            elif d.get('status') == 'finished' and key in self._postprocess_started:
+                seconds = now - self._postprocess_started.pop(key)
+                self.postprocessors[key[1]] = self.postprocessors.get(key[1], 0.0) + seconds
+                self.stages['postprocess'] += seconds
+
+    def to_dict(self, total=None):
+        """
+        Return a JSON-serializable snapshot
+
+        Args:
+            total: Wall-clock seconds from submission to now or to the end of the job
+
+        Returns:
+            dict: Stage seconds, streams, post-processor seconds, bytes and CPU seconds
+                (cpu_seconds includes child_cpu_seconds)
+        """
+        with self._lock:
+            return {
+                'total_seconds': round(total, 3) if total is not None else None,
+                'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                'streams': list(self.streams),
+                'postprocessors': {name: round(seconds, 3) for name, seconds in self.postprocessors.items()},
+                'bytes_received': self.bytes_received,
+                'bytes_written': self.bytes_written,
+                'cpu_seconds': round(self.cpu_seconds + self.child_cpu_seconds, 3),
+                'child_cpu_seconds': round(self.child_cpu_seconds, 3),
+            }
+
+
+def stage_percentiles(jobs):
+    """
+    Summarize stage times over finished jobs
+
+    Args:
+        jobs: Job objects
+
+    Returns:
+        dict: For each stage (and total), p50, p95 and max seconds
+    """
+    samples = {}
+    for job in jobs:
+        if not job.done:
+            continue
+        accounting = job.accounting.to_dict(job.finished_at - job.created_at)
+        for name, seconds in accounting['stages'].items():
+            samples.setdefault(name, []).append(seconds)
+        samples.setdefault('total', []).append(accounting['total_seconds'])
+
+    summary = {}
+    for name, values in samples.items():
+        values.sort()
+        summary[name] = {
+            'p50': values[int(0.50 * (len(values) - 1))],
+            'p95': values[int(0.95 * (len(values) - 1))],
+            'max': values[-1],
+        }
+    return summary
+
+
+class Job:
+    """A single download job and its observable state"""
+
+    def __init__(self, func, args=None, kwargs=None, description=None, key=None, job_id=None, client=None,
+                 cost=0.0, lane='heavy'):
+        """
+        Initialize a job
+
+        Args:
+            func: Callable doing the work, returns a dict merged into the job result
+            args: Positional arguments for func
+            kwargs: Keyword arguments for func
+            description: Free-form dict describing the request (url, platform, option)
+            key: Identity of the request; identical in-flight requests share the job
+            job_id: Identifier to reuse, for a job resumed from the job store
+            client: Identity of the client that submitted the job, for its history
+            cost: Estimated seconds the job runs; shorter jobs are run first
+            lane: Queue lane, 'light' or 'heavy'
+        """
+        self.id = job_id or uuid.uuid4().hex
+        self.func = func
+        self.args = args or ()
+        self.kwargs = kwargs or {}
+        self.description = description or {}
+        self.key = key
+        self.client = client
+        self.cost = cost
+        self.lane = lane
+        self.resumed = False
+        self.requests = 1
+        self.state = 'queued'
+        self.progress = {}
+        self.result = {}
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self.events = deque(maxlen=MAX_JOB_EVENTS)
+        self._seq = 0
+        self.accounting = JobAccounting()
+        self.store = None
+        self.manager = None
+        self.slot = None
+        self._slot_kind = None
+        self._holders = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _publish(self, event, data=None):
+        """Append a discrete event and wake waiters (caller holds the lock)"""
+        self._seq += 1
+        self.events.append((self._seq, event, data or {}))
+        self._touch()
+
+    def _touch(self):
+        """Mark the job as changed and wake waiters (caller holds the lock)"""
+        self.version += 1
+        self._changed.notify_all()
+
+    def update_progress(self, d):
+        """
+        Update progress from a yt-dlp progress hook dict
+
+        Args:
+            d: Progress dictionary passed to yt-dlp progress hooks
+        """
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+
+        # A yt-dlp run is extracting until its first transfer starts
+        _close_extract(time.monotonic() - (d.get('elapsed') or 0))
+        self.accounting.progress(d)
+
+        with self._lock:
+            self.progress = {
+                'status': d.get('status'),
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'percent': round(downloaded * 100.0 / total, 1) if total else None,
+                'speed': d.get('speed'),
+                'eta': d.get('eta'),
+                'filename': os.path.basename(d.get('filename') or ''),
+            }
+            self._touch()
+
+        if self.store is not None:
+            self.store.progress(self, d)
+
+    def postprocessor_event(self, d):
+        """
+        Record a post-processing step from a yt-dlp post-processor hook dict
+
+        Args:
+            d: Dictionary passed to yt-dlp post-processor hooks
+        """
+        info = d.get('info_dict') or {}
+        _close_extract(time.monotonic())
+        self.accounting.postprocessor(d)
+        with self._lock:
+            self._publish('postprocess', {
+                'postprocessor': d.get('postprocessor'),
+                'status': d.get('status'),
+                'filename': os.path.basename(info.get('filepath') or ''),
+            })
+
+    def events_since(self, seq):
+        """
+        Get the discrete events published after a sequence number
+
+        Args:
+            seq: Last sequence number the caller has seen (0 for all)
+
+        Returns:
+            list: (seq, event, data) tuples in publication order
+        """
+        with self._lock:
+            return [event for event in self.events if event[0] > seq]
+
+    def wait_for_change(self, version, timeout):
+        """
+        Block until the job changes after the given version
+
+        Args:
+            version: Last version the caller has seen
+            timeout: Maximum seconds to wait
+
+        Returns:
+            int: The current version (unchanged if the wait timed out)
+        """
+        with self._lock:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def run(self):
+        """Execute the job in the calling thread"""
+        with self._lock:
+            self.state = 'running'
+            self.started_at = time.time()
+            self._publish('state', {'state': self.state})
+        JOBS.labels('queued').dec()
+        JOBS.labels('running').inc()
+        self.accounting.add_stage('queue', self.started_at - self.created_at)
+        JOB_QUEUE_SECONDS.labels(self.lane).observe(self.started_at - self.created_at)
+
+        _local.job = self
+        cpu_start = time.thread_time()
+        try:
+            result = self.func(*self.args, **self.kwargs) or {}
+            with self._lock:
+                self.result = result
+                self.state = 'finished'
+        except Exception as e:
+            print(f"Job {self.id} failed: {str(e)}")
+            with self._lock:
+                self.error = str(e)
+                self.state = 'failed'
+        finally:
+            _local.job = None
+            self.accounting.add_cpu(time.thread_time() - cpu_start)
+            with self._lock:
+                self.finished_at = time.time()
+                self._publish('state', {'state': self.state})
+            JOBS.labels('running').dec()
+            JOBS_COMPLETED.labels(self.state).inc()
+
+    @property
+    def done(self):
+        """True once the job has finished or failed"""
+        return self.state in ('finished', 'failed')
+
+    def to_dict(self):
+        """Return a JSON-serializable snapshot of the job"""
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'state': self.state,
+                'progress': dict(self.progress),
+                'requests': self.requests,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'accounting': self.accounting.to_dict((self.finished_at or time.time()) - self.created_at),
+            }
+            data.update(self.description)
+            data.update(self.result)
+            if self.error:
+                data['error'] = self.error
+            return data
+
+
+class RemoteJob:
+    """A queued or running job held by another worker, as found in the job store"""
+
+    def __init__(self, job_id, state):
+        self.id = job_id
+        self.state = state
+
+
+class JobManager:
+    """Bounded worker pool plus an in-memory registry of recent jobs
+
+    Queued jobs run shortest estimated job first, with aging: every second
+    a job waits takes aging_rate seconds off its estimated cost, so a long
+    playlist is overtaken by small jobs for a while but not forever. Light
+    jobs have workers of their own on top of max_workers.
+
+    A worker slot is held while a job downloads; a job waiting on CPU-bound
+    post-processing (see off_worker) lends its slot to the next queued job
+    and waits for the next free slot to continue, so no more than
+    max_workers jobs ever download at once.
+
+    Jobs submitted with the same key while one is queued or running are
+    coalesced into that job (single-flight), so a burst of identical
+    requests downloads once. With a job store the same holds across
+    workers, and any worker can report any job.
+    """
+
+    def __init__(self, max_workers=2, max_queued=32, max_history=500, store=None, light_workers=1, aging_rate=1.0):
+        """
+        Initialize job manager
+
+        Args:
+            max_workers: Number of jobs that run concurrently, of any lane
+            max_queued: Maximum number of jobs waiting or running before submissions are rejected
+            max_history: Number of jobs kept in memory for status lookups
+            store: JobStore shared with the other workers (None keeps jobs in this process only)
+            light_workers: Additional workers that run only light jobs
+            aging_rate: Seconds of estimated cost forgiven per second a job waits (0 for pure shortest-first)
+        """
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_history = max_history
+        self.store = store
+        self.light_workers = light_workers
+        self.aging_rate = aging_rate
+        self._jobs = OrderedDict()
+        self._inflight = {}
+        self._active = 0
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._queues = {lane: [] for lane in LANES}
+        self._order = itertools.count()
+        self._slots = {'light': light_workers, 'heavy': max_workers}
+        self._busy = {'light': 0, 'heavy': 0}
+        self._rejoining = {'light': 0, 'heavy': 0}
+        self._recovery_pid = None
+
+    def submit(self, func, *args, description=None, key=None, client=None, cost=0.0, lane='heavy', **kwargs):
+        """
+        Queue a job for background execution
+
+        Args:
+            func: Callable doing the work
+            description: Dict describing the request, included in status responses
+            key: Request identity; if a job with this key is in flight it is returned instead
+            client: Identity of the requesting client, for its job history
+            cost: Estimated seconds the job runs, for shortest-first ordering
+            lane: 'light' for jobs that should never wait behind heavy ones, else 'heavy'
+
+        Returns:
+            tuple: (job, created) where created is False when an in-flight job
+                was reused; a job in flight in another worker is returned as a RemoteJob
+
+        Raises:
+            QueueFullError: If max_queued jobs are already pending
+        """
+        with self._lock:
+            existing = self._inflight.get(key) if key is not None else None
+            if existing is not None:
+                existing.requests += 1
+            else:
+                if self._active >= self.max_queued:
+                    JOBS_REJECTED.inc()
+                    raise QueueFullError('Download queue is full, please try again later')
+
+                job = Job(func, args, kwargs, description, key, client=client, cost=cost, lane=lane)
+                self._register(job)
+
+        if existing is not None:
+            if self.store is not None:
+                self._store_call(self.store.add_request, existing.id)
+            return existing, False
+
+        if self.store is not None:
+            try:
+                other_id = self.store.record(job, func.__name__)
+            except Exception as e:
+                print(f"Job store write error: {str(e)}")
+                other_id = None
+            if other_id is not None:
+                # Another worker is already running this download
+                with self._lock:
+                    self._unregister(job)
+                snapshot = self._store_call(self.store.get, other_id)
+                return RemoteJob(other_id, snapshot['state'] if snapshot else 'queued'), False
+        self._start(job)
+        return job, True
+
+    def _register(self, job):
+        """Add a job to the registry and take a queue slot (caller holds the lock)"""
+        self._active += 1
+        self._jobs[job.id] = job
+        if job.key is not None:
+            self._inflight[job.key] = job
+        self._prune()
+
+    def _unregister(self, job):
+        """Remove a job that never started and free its queue slot (caller holds the lock)"""
+        self._active -= 1
+        self._jobs.pop(job.id, None)
+        if job.key is not None and self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+
+    def _start(self, job):
+        """Queue a registered job for the workers of its lane"""
+        job.store = self.store
+        job.manager = self
+        JOBS.labels('queued').inc()
+        # Waiting lowers a job's effective cost by aging_rate per second; all
+        # queued jobs age alike, so keying on submission time fixes the order.
+        # Resumed jobs form a tier ahead of every new job
+        tier = 0 if job.resumed else 1
+        priority = 0.0 if job.resumed else job.cost + self.aging_rate * job.created_at
+        with self._lock:
+            heapq.heappush(self._queues[job.lane], (tier, priority, next(self._order), job))
+            self._dispatch()
+
+    def _free(self, kind):
+        """Count the slots of a kind not held or promised to a rejoining job (caller holds the lock)"""
+        return self._slots[kind] - self._busy[kind] - self._rejoining[kind]
+
+    def _dispatch(self):
+        """Start queued jobs while worker slots are free (caller holds the lock)"""
+        # Jobs waiting to take a slot back get freed slots before any queued job
+        if any(self._rejoining.values()):
+            self._slot_freed.notify_all()
+        while True:
+            # Light slots run only light jobs; heavy slots run the most urgent job of either lane
+            if self._free('light') > 0 and self._queues['light']:
+                kind, job = 'light', self._next(('light',))
+            elif self._free('heavy') > 0 and any(self._queues.values()):
+                kind, job = 'heavy', self._next(LANES)
+            else:
+                return
+            self._busy[kind] += 1
+            job.slot = job._slot_kind = kind
+            job._holders = 1
+            threading.Thread(target=self._run, args=(job,), name=f'unidownload-job-{job.id[:8]}',
+                             daemon=True).start()
+
+    def _next(self, lanes):
+        """Pop the queued job with the lowest priority key among lanes (caller holds the lock)"""
+        queues = [self._queues[lane] for lane in lanes if self._queues[lane]]
+        return heapq.heappop(min(queues, key=lambda queue: queue[0][:3]))[3]
+
+    def _leave(self, job):
+        """One of a job's threads stops downloading; the last one frees the job's slot"""
+        with self._lock:
+            job._holders -= 1
+            if job._holders == 0 and job.slot is not None:
+                self._busy[job.slot] -= 1
+                job.slot = None
+                self._dispatch()
+
+    def _rejoin(self, job):
+        """One of a job's threads starts downloading; the job waits to take back a slot if it lent its own"""
+        with self._lock:
+            job._holders += 1
+            if job.slot is not None or job.done:
+                return
+            kind = job._slot_kind
+            self._rejoining[kind] += 1
+            try:
+                # Another thread of the job may take the slot back first
+                while job.slot is None and self._busy[kind] >= self._slots[kind]:
+                    self._slot_freed.wait()
+            finally:
+                self._rejoining[kind] -= 1
+            if job.slot is None:
+                job.slot = kind
+                self._busy[kind] += 1
+
+    def _run(self, job):
+        """Run a job and release its queue slot"""
+        try:
+            if self.store is not None:
+                self._store_call(self.store.started, job.id)
+            job.run()
+        finally:
+            if self.store is not None:
+                self._store_call(
+                    self.store.finished, job.id, job.state, job.error,
+                    result=job.result,
+                    accounting=job.accounting.to_dict(job.finished_at - job.created_at),
+                    progress=job.progress
+                )
+            with self._lock:
+                self._active -= 1
+                if job.key is not None and self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+                if job.slot is not None:
+                    self._busy[job.slot] -= 1
+                    job.slot = None
+                self._dispatch()
+
+    def _store_call(self, method, *args, **kwargs):
+        """Call a job store method; a store failure never fails the job"""
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            print(f"Job store error: {str(e)}")
+
+    def start_recovery(self, tasks, interval=None):
+        """
+        Keep this process's job leases alive and resume jobs orphaned by dead workers
+
+        Call once in each worker process after it starts (calls after the
+        first in the same process do nothing). Jobs are resumed under their
+        original IDs; yt-dlp continues their downloads from the .part files.
+
+        Args:
+            tasks: Dict mapping stored task names to their functions
+            interval: Seconds between lease renewals and orphan sweeps (default: a third of the lease)
+        """
+        if self.store is None or self._recovery_pid == os.getpid():
+            return
+        self._recovery_pid = os.getpid()
+        interval = interval or self.store.lease_seconds / 3.0
+
+        def maintain():
+            last_prune = 0
+            while True:
+                with self._lock:
+                    held = [job.id for job in self._jobs.values() if not job.done]
+                self._store_call(self.store.renew, held)
+                for entry in self._store_call(self.store.claim_orphans) or []:
+                    self._resume(entry, tasks)
+                if time.time() - last_prune > 3600:
+                    self._store_call(self.store.prune)
+                    last_prune = time.time()
+                time.sleep(interval)
+
+        threading.Thread(target=maintain, name='unidownload-job-store', daemon=True).start()
+
+    def _resume(self, entry, tasks):
+        """Queue a job claimed from the job store, bypassing the queue limit"""
+        func = tasks.get(entry['task'])
+        if func is None:
+            self._store_call(self.store.finished, entry['job_id'], 'failed', f"Unknown task {entry['task']}")
+            return
+
+        if entry['part_bytes']:
+            print(f"Resuming job {entry['job_id']} from {entry['part_bytes']} bytes of {entry['part_path']}")
+        else:
+            print(f"Resuming job {entry['job_id']}")
+
+        # A resumed job has waited already and may be partly done: it goes
+        # ahead of every new job (claim_orphans returns the oldest first)
+        job = Job(func, entry['args'], entry['kwargs'], entry['description'], entry['key'],
+                  job_id=entry['job_id'], client=entry['client'], cost=0.0)
+        job.resumed = True
+        with self._lock:
+            if job.key is not None and job.key in self._inflight:
+                # The same download was requested again meanwhile; that job covers it
+                self._store_call(self.store.finished, job.id, 'failed', 'Superseded by a newer job', False)
+                return
+            self._register(job)
+        self._start(job)
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond max_history (caller holds the lock)"""
+        excess = len(self._jobs) - self.max_history
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].done:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def get(self, job_id):
+        """
+        Look up a job held by this process
+
+        Args:
+            job_id: Job identifier returned by submit
+
+        Returns:
+            Job: The job, or None if this process does not hold it
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        """
+        Get a job's status snapshot, from memory if this process holds the job or else from the store
+
+        Args:
+            job_id: Job identifier returned by submit
+
+        Returns:
+            dict: Snapshot as returned by Job.to_dict, or None if the job is unknown
+        """
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store is None:
+            return None
+        return self._store_call(self.store.get, job_id)
+
+    def history(self, client, limit=50):
+        """
+        Get the most recent jobs a client submitted, from any worker when there is a store
+
+        Args:
+            client: Client identity passed to submit
+            limit: Maximum number of jobs
+
+        Returns:
+            list: Status snapshots, newest first (none for a None client)
+        """
+        if client is None:
+            return []
+        if self.store is not None:
+            return self._store_call(self.store.history, client, limit) or []
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.client == client]
+        return [job.to_dict() for job in jobs[::-1][:limit]]
+
+    def recent(self, limit=50):
+        """
+        Get the most recently submitted jobs held by this process
+
+        Args:
+            limit: Maximum number of jobs
+
+        Returns:
+            list: Jobs, newest first
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return jobs[::-1][:limit]
+
+    def stats(self):
+        """Return queue occupancy counters"""
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.state == 'running')
+            queued = {lane: len(queue) for lane, queue in self._queues.items()}
+            busy = dict(self._busy)
+        return {
+            'running': running,
+            'queued': sum(queued.values()),
+            'queued_by_lane': queued,
+            'busy_slots': busy,
+            'max_workers': self.max_workers,
+            'light_workers': self.light_workers,
+        }
@@ -0,0 +1,169 @@
+"""
+Metrics Module
+Prometheus metrics for extraction, downloads, post-processing, jobs and caches
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) so
+every worker writes its samples to shared files and /api/metrics reports
+the sum over all workers, whichever one answers the scrape.
+"""
+
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+
+EXTRACTION_SECONDS = Histogram(
+    'unidownload_extraction_seconds',
+    'Time spent in yt-dlp per call, by platform and operation (extract = info only, download = full run)',
+    ['platform', 'operation'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+
+DOWNLOAD_BYTES = Counter(
+    'unidownload_download_bytes_total',
+    'Bytes downloaded from media servers, by platform',
+    ['platform']
+)
+
+DOWNLOAD_THROUGHPUT = Histogram(
+    'unidownload_download_throughput_bytes_per_second',
+    'Average transfer rate of each downloaded file, by platform',
+    ['platform'],
+    buckets=(64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2)
+)
+
+POSTPROCESS_SECONDS = Histogram(
+    'unidownload_postprocess_seconds',
+    'Time spent in each yt-dlp post-processor (FFmpeg merge, audio extraction, ...)',
+    ['postprocessor'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+
+POSTPROCESS_QUEUE = Gauge(
+    'unidownload_postprocess_queue',
+    'FFmpeg post-processing steps waiting for a post-processing worker',
+    multiprocess_mode='livesum'
+)
+
+POSTPROCESS_ACTIVE = Gauge(
+    'unidownload_postprocess_active',
+    'FFmpeg post-processing steps running',
+    multiprocess_mode='livesum'
+)
+
+POSTPROCESS_QUEUE_SECONDS = Histogram(
+    'unidownload_postprocess_queue_seconds',
+    'Time FFmpeg post-processing steps waited for a post-processing worker',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+
+BANDWIDTH_WAIT_SECONDS = Counter(
+    'unidownload_bandwidth_wait_seconds_total',
+    'Time downloads were held back by the bandwidth scheduler, by download option',
+    ['option']
+)
+
+JOBS = Gauge(
+    'unidownload_jobs',
+    'Download jobs currently queued or running',
+    ['state'],
+    multiprocess_mode='livesum'
+)
+
+JOBS_COMPLETED = Counter(
+    'unidownload_jobs_completed_total',
+    'Download jobs that ended, by final state',
+    ['state']
+)
+
+JOB_QUEUE_SECONDS = Histogram(
+    'unidownload_job_queue_seconds',
+    'Time download jobs waited for a worker, by queue lane (light, heavy)',
+    ['lane'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+)
+
+JOBS_REJECTED = Counter(
+    'unidownload_jobs_rejected_total',
+    'Download requests rejected because the job queue was full'
+)
+
+CACHE_REQUESTS = Counter(
+    'unidownload_cache_requests_total',
+    'Cache lookups by cache (info, result) and result (hit, miss)',
+    ['cache', 'result']
+)
+
+
+def registry():
+    """
+    Registry to expose, merging every worker's samples in multiprocess mode
+
+    Returns:
+        CollectorRegistry: Registry for generate_latest
+    """
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    merged = CollectorRegistry()
+    multiprocess.MultiProcessCollector(merged)
+    return merged
+
+
+def exposition():
+    """
+    Render all metrics in the Prometheus text format
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+
+def worker_exit(pid):
+    """
+    Drop a dead worker's live gauges (call from gunicorn's child_exit)
+
+    Args:
+        pid: Process ID of the worker that exited
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+class DownloadMeter:
+    """Records bytes, transfer rate and post-processing time of one yt-dlp run from its hooks"""
+
+    def __init__(self, platform):
+        self.platform = platform
+        self._started = {}
+
+    def attach(self, ydl):
+        """
+        Register the meter's hooks on a YoutubeDL instance
+
+        Args:
+            ydl: yt_dlp.YoutubeDL instance
+        """
+        ydl.add_progress_hook(self.progress_hook)
+        ydl.add_postprocessor_hook(self.postprocessor_hook)
+
+    def progress_hook(self, d):
+        """Count each file's bytes and rate once its download finishes"""
+        # Files found already on disk finish without an elapsed time; skip them
+        if d.get('status') != 'finished' or not d.get('elapsed'):
+            return
+        size = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        if size:
+            DOWNLOAD_BYTES.labels(self.platform).inc(size)
+            DOWNLOAD_THROUGHPUT.labels(self.platform).observe(size / d['elapsed'])
+
+    def postprocessor_hook(self, d):
+        """Time each post-processor from its started to its finished event"""
+        name = d.get('postprocessor') or 'unknown'
+        if d.get('status') == 'started':
+            self._started[name] = time.monotonic()
+        elif d.get('status') == 'finished' and name in self._started:
+            POSTPROCESS_SECONDS.labels(name).observe(time.monotonic() - self._started.pop(name))
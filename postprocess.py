@@ -0,0 +1,202 @@
+"""
+Post-processing Module
+Runs yt-dlp's FFmpeg post-processors (merges, audio extraction, fixups) in a pool of their own
+
+yt-dlp runs post-processors inline, in the thread that downloaded the
+files. Pooled YoutubeDL instances hand every FFmpeg post-processor to this
+pool instead: steps queue for a pool worker, each ffmpeg is limited to a
+few threads, and while a job waits its download slot goes to the next
+queued job. Downloads keep the network busy while merges use the CPU, and
+many jobs finishing together no longer start more ffmpeg processes than
+there are cores.
+"""
+
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction import extraction_counter
+from jobs import current_job, job_context, off_worker
+from metrics import POSTPROCESS_ACTIVE, POSTPROCESS_QUEUE, POSTPROCESS_QUEUE_SECONDS
+
+
+def children_cpu():
+    """Return the CPU seconds of this process's exited and waited-for child processes"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class PostprocessPool:
+    """Bounded worker pool for CPU-bound FFmpeg post-processing"""
+
+    def __init__(self, max_workers=None, ffmpeg_threads=None):
+        """
+        Initialize post-processing pool
+
+        Args:
+            max_workers: Post-processing steps that run at once (default: the core count)
+            ffmpeg_threads: Threads each ffmpeg may use (default: cores divided by max_workers)
+        """
+        self._executor = None
+        self._pid = None
+        self._children_seen = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.configure(max_workers, ffmpeg_threads)
+
+    def configure(self, max_workers=None, ffmpeg_threads=None):
+        """
+        Set the pool size and the per-ffmpeg thread limit
+
+        Takes effect for steps submitted after the call; a running pool is
+        replaced once its queued steps finish.
+
+        Args:
+            max_workers: Post-processing steps that run at once (default: the core count)
+            ffmpeg_threads: Threads each ffmpeg may use (default: cores divided by max_workers)
+        """
+        cores = os.cpu_count() or 1
+        self.max_workers = max(1, max_workers or cores)
+        self.ffmpeg_threads = max(1, ffmpeg_threads or cores // self.max_workers)
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _pool(self):
+        """Return this process's executor, created on first use (and again after fork)"""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='unidownload-postprocess')
+                self._pid = os.getpid()
+                # A forked process starts without any waited-for children
+                self._children_seen = 0.0
+            return self._executor
+
+    def _claim_children_cpu(self, start):
+        """
+        Take the child-process CPU reaped since a step started
+
+        RUSAGE_CHILDREN is one total for the whole process, so each reading
+        claims only what no other step has claimed yet. A step's ffmpeg is
+        reaped right before the step ends, so overlapping steps each get
+        their own ffmpeg's CPU and none is counted twice.
+
+        Args:
+            start: children_cpu() when the step started
+
+        Returns:
+            float: CPU seconds to attribute to the step
+        """
+        now = children_cpu()
+        with self._lock:
+            seconds = max(0.0, now - max(start, self._children_seen))
+            self._children_seen = max(self._children_seen, now)
+        return seconds
+
+    def ffmpeg_args(self):
+        """
+        Build the yt-dlp postprocessor_args entry that limits ffmpeg's threads
+
+        Returns:
+            dict: Arguments yt-dlp passes to ffmpeg for every post-processor's output
+        """
+        return {'ffmpeg': ['-threads', str(self.ffmpeg_threads)]}
+
+    def run(self, func, *args):
+        """
+        Run a post-processing step on a pool worker and wait for its result
+
+        The calling job's download slot is lent out while the step waits
+        and runs. Steps started from a pool worker run inline.
+
+        Args:
+            func: Callable doing the step
+            *args: Arguments for func
+
+        Returns:
+            object: What func returned (its exception is raised here)
+        """
+        if getattr(self._local, 'worker', False):
+            return func(*args)
+
+        job = current_job()
+        queued_at = time.monotonic()
+
+        def step():
+            waited = time.monotonic() - queued_at
+            POSTPROCESS_QUEUE.dec()
+            POSTPROCESS_QUEUE_SECONDS.observe(waited)
+            POSTPROCESS_ACTIVE.inc()
+            self._local.worker = True
+            children_start = children_cpu()
+            try:
+                if job is not None:
+                    job.accounting.add_stage('queue', waited)
+                with job_context(job, holds_slot=False):
+                    return func(*args)
+            finally:
+                self._local.worker = False
+                children_seconds = self._claim_children_cpu(children_start)
+                if job is not None:
+                    job.accounting.add_child_cpu(children_seconds)
+                POSTPROCESS_ACTIVE.dec()
+
+        POSTPROCESS_QUEUE.inc()
+        with off_worker():
+            return self._pool().submit(step).result()
+
+    def stats(self):
+        """Return the pool size and thread limit"""
+        return {'max_workers': self.max_workers, 'ffmpeg_threads': self.ffmpeg_threads}
+
+
+def youtube_dl_class():
+    """
+    Return the YoutubeDL subclass used by ydl_pool
+
+    It runs FFmpeg post-processors in the pool and counts every extraction
+    in extraction_counter.
+
+    Built on first use so importing this module does not import yt-dlp.
+
+    Returns:
+        type: yt_dlp.YoutubeDL subclass
+    """
+    global _youtube_dl_class
+    if _youtube_dl_class is None:
+        import yt_dlp
+        from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+        class PooledPostprocessYoutubeDL(yt_dlp.YoutubeDL):
+            """YoutubeDL whose FFmpeg post-processors run in postprocess_pool and whose extractions are counted"""
+
+            def __init__(self, params=None, *args, **kwargs):
+                params = dict(params or {})
+                # A configured entry (or the legacy list form) wins over the default limit
+                if isinstance(params.get('postprocessor_args', {}), dict):
+                    params['postprocessor_args'] = {
+                        **postprocess_pool.ffmpeg_args(), **params.get('postprocessor_args', {})
+                    }
+                super().__init__(params, *args, **kwargs)
+
+            def extract_info(self, url, *args, **kwargs):
+                # process_ie_result resolves url entries through here too
+                extraction_counter.increment()
+                return super().extract_info(url, *args, **kwargs)
+
+            def run_pp(self, pp, infodict):
+                if isinstance(pp, FFmpegPostProcessor):
+                    return postprocess_pool.run(super().run_pp, pp, infodict)
+                return super().run_pp(pp, infodict)
+
+        _youtube_dl_class = PooledPostprocessYoutubeDL
+    return _youtube_dl_class
+
+
+_youtube_dl_class = None
+
+postprocess_pool = PostprocessPool()
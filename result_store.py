@@ -0,0 +1,246 @@
+"""
+Result Store Module
+Remembers finished downloads so repeated requests reuse the files already on disk
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import CACHE_REQUESTS
+
+
+def result_key(platform, media_id, option, quality=None, container=None):
+    """
+    Build the store key for a download request
+
+    Args:
+        platform: Platform name
+        media_id: Canonical media ID
+        option: Download option (video, audio, thumbnail, ...)
+        quality: Quality height or format selector (None for best)
+        container: Output container/extension
+
+    Returns:
+        str: Store key
+    """
+    return '|'.join(str(part) for part in (platform, media_id, option, quality or 'best', container or ''))
+
+
+def file_etag(path):
+    """
+    Compute a strong ETag from a file's contents
+
+    Args:
+        path: File path
+
+    Returns:
+        str: Unquoted entity tag
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+class ResultStore:
+    """Disk-quota-bounded LRU index of downloaded files, shared through SQLite"""
+
+    def __init__(self, db_path, quota_bytes=2 * 1024 ** 3):
+        """
+        Initialize result store
+
+        Args:
+            db_path: SQLite file holding the index
+            quota_bytes: Total size of stored files before least recently used entries are evicted
+        """
+        self.db_path = db_path
+        self.quota_bytes = quota_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS result_files ('
+            'path TEXT PRIMARY KEY, key TEXT NOT NULL, size INTEGER NOT NULL, '
+            'mtime_ns INTEGER, etag TEXT)'
+        )
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(result_files)')}
+        for column, kind in (('mtime_ns', 'INTEGER'), ('etag', 'TEXT')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE result_files ADD COLUMN {column} {kind}')
+        conn.execute('CREATE INDEX IF NOT EXISTS result_files_key ON result_files (key)')
+        conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)')
+
+    def _connect(self):
+        """Return this thread's SQLite connection (reopened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Close the calling thread's SQLite connection, e.g. before the process forks"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def get(self, key):
+        """
+        Look up stored files for a request
+
+        Args:
+            key: Key from result_key
+
+        Returns:
+            list: File paths, or None if nothing usable is stored
+        """
+        conn = self._connect()
+        paths = [row[0] for row in conn.execute('SELECT path FROM result_files WHERE key = ?', (key,))]
+
+        if paths and all(os.path.exists(path) for path in paths):
+            conn.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            with self._lock:
+                self.hits += 1
+            CACHE_REQUESTS.labels('result', 'hit').inc()
+            return paths
+
+        if paths:
+            # Files were removed behind our back; forget the entry
+            self._delete_entry(conn, key, remove_files=False)
+        with self._lock:
+            self.misses += 1
+        CACHE_REQUESTS.labels('result', 'miss').inc()
+        return None
+
+    def put(self, key, paths):
+        """
+        Record the files produced for a request and enforce the disk quota
+
+        Each file's ETag is computed here, once, while the download is still
+        in its job worker, so serving the file never has to hash it. Paths
+        are stored resolved (os.path.realpath), so a file is found however
+        its path was spelled.
+
+        Args:
+            key: Key from result_key
+            paths: File paths written by the download
+        """
+        files = []
+        for path in paths:
+            path = os.path.realpath(path)
+            try:
+                stat = os.stat(path)
+                files.append((path, stat.st_size, stat.st_mtime_ns, file_etag(path)))
+            except OSError:
+                continue
+        if not files:
+            return
+
+        now = time.time()
+        stored = {path for path, _, _, _ in files}
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+
+            # A path owned by another entry was overwritten by this download
+            for path in stored:
+                row = conn.execute('SELECT key FROM result_files WHERE path = ?', (path,)).fetchone()
+                if row and row[0] != key:
+                    self._delete_entry(conn, row[0], remove_files=True, keep=stored)
+
+            conn.execute('DELETE FROM result_files WHERE key = ?', (key,))
+            conn.executemany(
+                'INSERT OR REPLACE INTO result_files (path, key, size, mtime_ns, etag) VALUES (?, ?, ?, ?, ?)',
+                [(path, key, size, mtime_ns, etag) for path, size, mtime_ns, etag in files]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO results (key, size, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, sum(size for _, size, _, _ in files), now, now)
+            )
+            self._evict(conn, protect=key)
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            conn.execute('ROLLBACK')
+            print(f"Result store write error: {str(e)}")
+
+    def etag(self, path, stat=None):
+        """
+        Get the ETag recorded for a stored file
+
+        Args:
+            path: File path (relative, absolute or through symlinks)
+            stat: os.stat result for the file (looked up when omitted)
+
+        Returns:
+            str: Unquoted entity tag, or None if the file is unknown or changed since it was recorded
+        """
+        row = self._connect().execute(
+            'SELECT size, mtime_ns, etag FROM result_files WHERE path = ?', (os.path.realpath(path),)
+        ).fetchone()
+        if not row or not row[2]:
+            return None
+        stat = stat or os.stat(path)
+        if (stat.st_size, stat.st_mtime_ns) != (row[0], row[1]):
+            return None
+        return row[2]
+
+    def _evict(self, conn, protect):
+        """Evict least recently used entries until the store fits its quota"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.quota_bytes:
+            return
+
+        rows = conn.execute(
+            'SELECT key, size FROM results WHERE key != ? ORDER BY accessed_at', (protect,)
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.quota_bytes:
+                break
+            self._delete_entry(conn, key, remove_files=True)
+            total -= size
+
+    def _delete_entry(self, conn, key, remove_files, keep=()):
+        """Remove an entry, optionally deleting its files from disk"""
+        if remove_files:
+            for (path,) in conn.execute('SELECT path FROM result_files WHERE key = ?', (key,)).fetchall():
+                if path in keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        conn.execute('DELETE FROM result_files WHERE key = ?', (key,))
+        conn.execute('DELETE FROM results WHERE key = ?', (key,))
+
+    def stats(self):
+        """Return entry count, stored bytes, quota and hit/miss counters"""
+        entries, size = self._connect().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results'
+        ).fetchone()
+        with self._lock:
+            return {
+                'entries': entries,
+                'bytes': size,
+                'quota_bytes': self.quota_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -3,38 +3,202 @@ Flask API Server for UniDownload
 Provides REST API endpoints for downloading media from various platforms
 """
 
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file as werkzeug_send_file
+from urllib.parse import quote
 from flask_cors import CORS
 import os
 import re
 import glob
+import hmac
 import json
+import threading
+import time
 from datetime import datetime
 from youtube import YouTubeDownloader
 from instagram import InstagramDownloader
 from facebook import FacebookDownloader
+from bandwidth import bandwidth_scheduler, parse_rate
+from extraction import AUDIO_FORMATS
+from job_cost import estimate_cost, job_lane
+from jobs import JobManager, QueueFullError, job_stage, record_written, stage_percentiles
+from job_store import JobStore
+from postprocess import postprocess_pool
+from info_cache import InfoCache, media_id
+from result_store import ResultStore, result_key
+from ydl_pool import preload as preload_ydl
+from url_router import route as route_url
+import metrics
 
 app = Flask(__name__)
 CORS(app)
 
+DOWNLOAD_ROOT = 'downloads'
+
+# Read size when a file body is sent without os.sendfile
+FILE_CHUNK_SIZE = 1024 * 1024
+
+# Opt-in file delivery offload to a front proxy: 'nginx' answers with an
+# X-Accel-Redirect to the internal location FILE_OFFLOAD_PREFIX (which must
+# alias DOWNLOAD_ROOT), 'sendfile' with an X-Sendfile path (Apache, lighttpd)
+FILE_OFFLOAD = os.environ.get('FILE_OFFLOAD', '').lower()
+FILE_OFFLOAD_PREFIX = os.environ.get('FILE_OFFLOAD_PREFIX', '/internal-downloads/')
+
 # Initialize downloaders
 youtube_dl = YouTubeDownloader()
 instagram_dl = InstagramDownloader()
 facebook_dl = FacebookDownloader()
 
+# Extracted info dicts shared between /api/detect and /api/download
+info_cache = InfoCache(
+    db_path=os.environ.get('INFO_CACHE_PATH', os.path.join('cache', 'info_cache.sqlite3')),
+    ttl=int(os.environ.get('INFO_CACHE_TTL', 600))
+)
+
+# Finished downloads reused by identical requests
+result_store = ResultStore(
+    db_path=os.environ.get('RESULT_CACHE_PATH', os.path.join('cache', 'results.sqlite3')),
+    quota_bytes=int(os.environ.get('RESULT_CACHE_QUOTA_MB', 2048)) * 1024 * 1024
+)
+
+# Download options each platform supports
+PLATFORM_OPTIONS = {
+    'youtube': ['video', 'audio', 'playlist', 'subtitles', 'thumbnail'],
+    'instagram': ['post', 'audio'],
+    'facebook': ['post', 'audio'],
+}
+
+# Output container produced by each download option (audio is keyed by its
+# audio_format instead)
+OPTION_CONTAINERS = {
+    'video': 'mp4',
+    'subtitles': 'srt',
+}
+
+# Playlists change over time, so their results are never reused
+UNCACHED_OPTIONS = {'playlist'}
+
+# Playlist entries downloaded at once within one playlist job
+PLAYLIST_WORKERS = int(os.environ.get('PLAYLIST_WORKERS', 3))
+
+# Event stream pacing: at most EVENTS_PER_SECOND pushes per client, plus a
+# keep-alive comment when a job is quiet so proxies keep the connection open
+EVENTS_PER_SECOND = float(os.environ.get('EVENTS_PER_SECOND', 4))
+EVENTS_KEEPALIVE = 15
+
+# Passthrough streams served at once; each holds a server thread (and an
+# ffmpeg process when streams are merged) for the length of the transfer
+STREAM_SLOTS = int(os.environ.get('STREAM_SLOTS', 8))
+stream_slots = threading.BoundedSemaphore(STREAM_SLOTS)
+
+# Per-job stage timings of this worker's recent jobs at /api/debug/jobs;
+# off by default because it lists other clients' URLs
+JOB_DEBUG = os.environ.get('JOB_DEBUG', '') == '1'
+
+# Jobs shared by all workers: any worker answers status queries, identical
+# downloads coalesce across workers, and jobs of a worker that dies are
+# resumed by another (set JOB_STORE_PATH empty to keep jobs per process)
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', os.path.join('cache', 'jobs.sqlite3'))
+job_store = JobStore(
+    JOB_STORE_PATH,
+    lease_seconds=int(os.environ.get('JOB_LEASE_SECONDS', 30)),
+    history_seconds=int(os.environ.get('JOB_HISTORY_SECONDS', 86400))
+) if JOB_STORE_PATH else None
+
+# Longest client identity accepted from the X-Client-ID header
+CLIENT_ID_MAX_LENGTH = 64
+
+# Background worker pool for downloads; queued jobs run shortest estimated
+# job first, and thumbnail and subtitle jobs also have workers of their own
+job_manager = JobManager(
+    max_workers=int(os.environ.get('DOWNLOAD_WORKERS', 2)),
+    max_queued=int(os.environ.get('DOWNLOAD_QUEUE_SIZE', 32)),
+    store=job_store,
+    light_workers=int(os.environ.get('LIGHT_WORKERS', 1)),
+    aging_rate=float(os.environ.get('JOB_AGING_RATE', 1.0))
+)
+
+# Download bandwidth caps in bytes per second ('50M', '512K'; unset for no
+# cap), shared by all workers and adjustable at /api/admin/bandwidth
+bandwidth_scheduler.configure(
+    global_limit=parse_rate(os.environ.get('BANDWIDTH_LIMIT')),
+    job_limit=parse_rate(os.environ.get('JOB_BANDWIDTH_LIMIT')),
+    state_path=os.environ.get('BANDWIDTH_STATE_PATH', os.path.join('cache', 'bandwidth.sqlite3')) or None
+)
+
+# FFmpeg post-processing (merges, audio extraction) runs in a pool of its
+# own; by default start_background divides the cores between the server's
+# worker processes, and each process's share between its ffmpeg runs (0
+# keeps these defaults)
+POSTPROCESS_WORKERS = int(os.environ.get('POSTPROCESS_WORKERS', 0))
+FFMPEG_THREADS = int(os.environ.get('FFMPEG_THREADS', 0))
+postprocess_pool.configure(POSTPROCESS_WORKERS, FFMPEG_THREADS)
+
+# Bearer token for the /api/admin endpoints (unset disables them)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+
+def warm_up():
+    """
+    Load yt-dlp and the modules requests need ahead of the first request
 
-def detect_platform(url):
-    """Detect platform from URL"""
-    url = url.lower()
+    Called once in the gunicorn master when the app is preloaded (see
+    gunicorn.conf.py), so forked workers share these pages copy-on-write
+    instead of each importing them on first use.
+    """
+    preload_ydl()
+    import streaming  # noqa: F401
     
-    if 'youtube.com' in url or 'youtu.be' in url:
-        return 'youtube'
-    elif 'instagram.com' in url:
-        return 'instagram'
-    elif 'facebook.com' in url or 'fb.watch' in url:
-        return 'facebook'
-    else:
-        return 'unknown'
+    # SQLite connections must not be inherited across fork
+    info_cache.close()
+    result_store.close()
+    if job_store is not None:
+        job_store.close()
+    bandwidth_scheduler.close()
+
+
+def start_background(processes=1):
+    """
+    Start this worker's background maintenance: job leases and job recovery
+
+    Called in every worker after it starts (gunicorn's post_worker_init, or
+    before the development server runs), never in a preloading master.
+    
+    Args:
+        processes: Number of server worker processes sharing the machine's cores
+    """
+    # Split the cores between the processes' post-processing pools
+    cores = os.cpu_count() or 1
+    workers = POSTPROCESS_WORKERS or max(1, cores // processes)
+    postprocess_pool.configure(workers, FFMPEG_THREADS or max(1, cores // (workers * processes)))
+    job_manager.start_recovery({'run_download': run_download})
+
+
+def get_media_info(platform, url):
+    """
+    Get the info dict for a URL, extracting only on a cache miss
+
+    Args:
+        platform: Platform name (youtube, instagram, facebook)
+        url: Media URL
+
+    Returns:
+        dict: Media information, or None if extraction failed
+    """
+    info = info_cache.get(platform, url)
+    if info is not None:
+        return info
+    
+    if platform == 'youtube':
+        info = youtube_dl.get_video_info(url)
+    elif platform == 'instagram':
+        info = instagram_dl.get_media_info(url)
+    elif platform == 'facebook':
+        info = facebook_dl.get_video_info(url)
+    
+    info_cache.put(platform, url, info)
+    return info
 
 
 @app.route('/api/detect', methods=['POST'])
@@ -47,15 +211,16 @@ def detect():
         if not url:
             return jsonify({'error': 'URL is required'}), 400
         
-        platform = detect_platform(url)
-        
-        if platform == 'unknown':
-            return jsonify({'error': 'Unsupported platform'}), 400
+        # Classified without network; unsupported URLs never reach yt-dlp
+        route = route_url(url)
+        if route is None:
+            return jsonify({'error': 'Unsupported or invalid URL'}), 400
+        platform = route.platform
         
         # Get media info based on platform
         if platform == 'youtube':
             try:
-                info = youtube_dl.get_video_info(url)
+                info = get_media_info('youtube', url)
                 if not info:
                     return jsonify({'error': 'Failed to fetch video information'}), 400
                 
@@ -76,7 +241,7 @@ def detect():
                     'thumbnail': info.get('thumbnail', ''),
                     'formats': formatted_formats,
                     'has_subtitles': bool(info.get('subtitles')),
-                    'options': ['video', 'audio', 'playlist', 'subtitles', 'thumbnail']
+                    'options': PLATFORM_OPTIONS['youtube']
                 }
             except Exception as e:
                 print(f"YouTube error: {str(e)}")
@@ -86,7 +251,7 @@ def detect():
             
         elif platform == 'instagram':
             try:
-                info = instagram_dl.get_media_info(url)
+                info = get_media_info('instagram', url)
                 if not info:
                     return jsonify({'error': 'Failed to fetch media information'}), 400
                 
@@ -98,7 +263,7 @@ def detect():
                     'uploader': info.get('uploader', 'Unknown'),
                     'thumbnail': info.get('thumbnail', ''),
                     'media_type': media_type,
-                    'options': ['post', 'audio']
+                    'options': PLATFORM_OPTIONS['instagram']
                 }
             except Exception as e:
                 print(f"Instagram error: {str(e)}")
@@ -106,11 +271,11 @@ def detect():
             
         elif platform == 'facebook':
             try:
-                info = facebook_dl.get_video_info(url)
+                info = get_media_info('facebook', url)
                 if not info:
                     return jsonify({'error': 'Failed to fetch content information'}), 400
                 
-                content_type = facebook_dl.detect_content_type(url)
+                content_type = facebook_dl.detect_content_type(url, info)
                 
                 response = {
                     'platform': 'facebook',
@@ -119,7 +284,7 @@ def detect():
                     'duration': info.get('duration', 0),
                     'thumbnail': info.get('thumbnail', ''),
                     'content_type': content_type,
-                    'options': ['post', 'audio']
+                    'options': PLATFORM_OPTIONS['facebook']
                 }
             except Exception as e:
                 print(f"Facebook error: {str(e)}")
@@ -134,105 +299,625 @@ def detect():
         return jsonify({'error': str(e)}), 500
 
 
+def file_entry(file_path):
+    """
+    Describe a downloaded file for API responses
+
+    Args:
+        file_path: Path of a file inside the downloads folder
+
+    Returns:
+        dict: File name and web-accessible URL
+    """
+    relative = os.path.relpath(os.path.realpath(file_path), os.path.realpath(DOWNLOAD_ROOT))
+    return {
+        'filename': os.path.basename(file_path),
+        'url': '/api/files/' + quote(relative.replace('\\', '/'))
+    }
+
+
+def client_id():
+    """
+    Identify the client of the current request for its job history
+
+    The web UI sends a random X-Client-ID kept in the browser. The peer
+    address is never used instead: behind a proxy or NAT it is shared by
+    many users, who would see each other's jobs.
+
+    Returns:
+        str: Client identity, or None if the request sent no X-Client-ID
+    """
+    client = request.headers.get('X-Client-ID', '').strip()
+    return client[:CLIENT_ID_MAX_LENGTH] if client else None
+
+
+def download_key(url, platform, option, format_id=None, audio_format=None):
+    """
+    Build the identity of a download request
+
+    Used both to coalesce identical in-flight jobs and as the result store key.
+
+    Args:
+        url: Media URL
+        platform: Platform name
+        option: Download option
+        format_id: Quality height for YouTube video downloads (ignored for other options)
+        audio_format: Audio output of audio downloads ('original' or 'mp3')
+
+    Returns:
+        str: Request key
+    """
+    container = audio_format if option == 'audio' else OPTION_CONTAINERS.get(option)
+    # Only video downloads pass the quality on to yt-dlp; for the other
+    # options it would split identical downloads into separate jobs
+    quality = format_id if option == 'video' else None
+    return result_key(platform, media_id(platform, url), option, quality, container)
+
+
+def run_download(url, platform, option, format_id=None, audio_format='original'):
+    """
+    Download media with specified options (runs inside a job worker)
+
+    Args:
+        url: Media URL
+        platform: Platform name (youtube, instagram, facebook)
+        option: Download option (video, audio, playlist, subtitles, thumbnail, post)
+        format_id: Quality height for YouTube video downloads
+        audio_format: 'original' keeps the source audio codec, 'mp3' re-encodes (audio option only)
+
+    Returns:
+        dict: Result message and list of downloaded files
+    """
+    # Reuse the info extracted by /api/detect when it is still cached
+    with job_stage('route'):
+        info = info_cache.get(platform, url)
+    
+    # Process download based on platform and option
+    if platform == 'youtube':
+        if option == 'audio':
+            result = youtube_dl.download_audio(url, info=info, audio_format=audio_format)
+            message = 'Audio downloaded successfully'
+        elif option == 'subtitles':
+            result = youtube_dl.download_subtitles_only(url, info=info)
+            message = 'Subtitles downloaded successfully'
+        elif option == 'thumbnail':
+            result = youtube_dl.download_thumbnail(url, info=info)
+            message = 'Thumbnail downloaded successfully'
+        elif option == 'playlist':
+            result = youtube_dl.download_playlist(url, info=info, confirm=False, max_workers=PLAYLIST_WORKERS)
+            message = 'Playlist downloaded successfully'
+        else:  # video
+            if format_id:
+                # format_id is actually the quality height
+                result = youtube_dl.download_video(url, quality_height=int(format_id), info=info)
+            else:
+                result = youtube_dl.download_video(url, info=info)
+            message = 'Video downloaded successfully'
+    
+    elif platform == 'instagram':
+        if option == 'audio':
+            result = instagram_dl.download_audio(url, info=info, audio_format=audio_format)
+            message = 'Audio downloaded successfully'
+        else:  # post
+            result = instagram_dl.download_post(url, info=info)
+            message = 'Post downloaded successfully'
+    
+    elif platform == 'facebook':
+        if option == 'audio':
+            result = facebook_dl.download_audio(url, info=info, audio_format=audio_format)
+            message = 'Audio downloaded successfully'
+        else:  # post
+            result = facebook_dl.download_post(url, info=info)
+            message = 'Post downloaded successfully'
+    
+    if result['error']:
+        raise RuntimeError(result['error'])
+    
+    with job_stage('finalize'):
+        record_written(result['files'])
+        if option not in UNCACHED_OPTIONS:
+            result_store.put(download_key(url, platform, option, format_id, audio_format), result['files'])
+        
+        response = {
+            'success': True,
+            'message': message,
+            'files': [file_entry(path) for path in result['files']]
+        }
+        
+        # Per-entry report of parallel playlist downloads
+        if result.get('entries'):
+            response['entries'] = [{
+                'url': item['url'],
+                'success': item['success'],
+                'error': item['error'],
+                'files': [file_entry(path) for path in item['files']]
+            } for item in result['entries']]
+    
+    return response
+
+
 @app.route('/api/download', methods=['POST'])
 def download():
-    """Download media with specified options"""
+    """Queue a download job and return its ID immediately (or cached files)"""
     try:
         data = request.json
         url = data.get('url', '')
         platform = data.get('platform', '')
         option = data.get('option', '')
         format_id = data.get('format_id', None)
+        audio_format = data.get('audio_format') or 'original'
         
         if not url or not platform:
             return jsonify({'error': 'URL and platform are required'}), 400
         
-        # Get list of files before download
-        before_files = set()
-        for root, dirs, files in os.walk('downloads'):
-            for file in files:
-                before_files.add(os.path.join(root, file))
+        if platform not in PLATFORM_OPTIONS:
+            return jsonify({'error': 'Unsupported platform'}), 400
         
-        # Process download based on platform and option
-        if platform == 'youtube':
-            if option == 'audio':
-                youtube_dl.download_audio(url)
-                message = 'Audio downloaded successfully'
-            elif option == 'subtitles':
-                youtube_dl.download_subtitles_only(url)
-                message = 'Subtitles downloaded successfully'
-            elif option == 'thumbnail':
-                youtube_dl.download_thumbnail(url)
-                message = 'Thumbnail downloaded successfully'
-            elif option == 'playlist':
-                youtube_dl.download_playlist(url)
-                message = 'Playlist downloaded successfully'
-            else:  # video
-                if format_id:
-                    # format_id is actually the quality height
-                    youtube_dl.download_video(url, quality_height=int(format_id))
-                else:
-                    youtube_dl.download_video(url)
-                message = 'Video downloaded successfully'
+        # Without an option the platform's main download runs (video or post)
+        option = option or PLATFORM_OPTIONS[platform][0]
+        if option not in PLATFORM_OPTIONS[platform]:
+            return jsonify({'error': f"option must be one of {', '.join(PLATFORM_OPTIONS[platform])}"}), 400
         
-        elif platform == 'instagram':
-            if option == 'audio':
-                instagram_dl.download_audio(url)
-                message = 'Audio downloaded successfully'
-            else:  # post
-                instagram_dl.download_post(url)
-                message = 'Post downloaded successfully'
+        route_start = time.monotonic()
+        route = route_url(url)
+        if route is None or route.platform != platform:
+            return jsonify({'error': 'Unsupported or invalid URL'}), 400
         
-        elif platform == 'facebook':
-            if option == 'audio':
-                facebook_dl.download_audio(url)
-                message = 'Audio downloaded successfully'
-            else:  # post
-                facebook_dl.download_post(url)
-                message = 'Post downloaded successfully'
+        if format_id:
+            try:
+                int(format_id)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'format_id must be a quality height'}), 400
         
-        # Get list of files after download
-        after_files = set()
-        for root, dirs, files in os.walk('downloads'):
-            for file in files:
-                after_files.add(os.path.join(root, file))
+        if audio_format not in AUDIO_FORMATS:
+            return jsonify({'error': f"audio_format must be one of {', '.join(AUDIO_FORMATS)}"}), 400
         
-        # Find newly downloaded files
-        new_files = after_files - before_files
-        download_urls = []
+        # Audio is the only option with a choice of output
+        description = {'url': url, 'platform': platform, 'option': option}
+        if option == 'audio':
+            description['audio_format'] = audio_format
+        else:
+            audio_format = None
         
-        for file_path in new_files:
-            # Convert to web-accessible path
-            web_path = file_path.replace('\\', '/').replace('downloads/', '/api/files/')
-            filename = os.path.basename(file_path)
-            download_urls.append({
-                'filename': filename,
-                'url': web_path
+        # Serve an identical earlier download straight from disk
+        key = download_key(url, platform, option, format_id, audio_format)
+        route_seconds = time.monotonic() - route_start
+        cached_files = result_store.get(key) if option not in UNCACHED_OPTIONS else None
+        if cached_files:
+            return jsonify({
+                'success': True,
+                'state': 'finished',
+                'cached': True,
+                'message': 'Download ready',
+                'files': [file_entry(path) for path in cached_files]
             })
         
+        # Rank the job by the size of the media when /api/detect cached its info
+        route_start = time.monotonic()
+        cost = estimate_cost(option, info_cache.profile(platform, url), int(format_id) if format_id else None,
+                             audio_format)
+        route_seconds += time.monotonic() - route_start
+        
+        # Identical requests already in flight attach to the running job
+        job, created = job_manager.submit(
+            run_download, url, platform, option, format_id, audio_format or 'original',
+            description=description,
+            key=key,
+            client=client_id(),
+            cost=cost,
+            lane=job_lane(option)
+        )
+        if created:
+            job.accounting.add_stage('route', route_seconds)
+        
         return jsonify({
-            'success': True, 
-            'message': message,
-            'files': download_urls
-        })
+            'success': True,
+            'job_id': job.id,
+            'state': job.state,
+            'coalesced': not created,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
         
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/jobs', methods=['GET'])
+def job_history():
+    """List the calling client's recent download jobs, newest first"""
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    
+    # Jobs submitted without an X-Client-ID belong to no one's history
+    client = client_id()
+    if client is None:
+        return jsonify({'jobs': []})
+    return jsonify({'jobs': job_manager.history(client, limit)})
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report state, progress and result files of a download job, whichever worker runs it"""
+    snapshot = job_manager.status(job_id)
+    if snapshot is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(snapshot)
+
+
+@app.route('/api/debug/jobs', methods=['GET'])
+def debug_jobs():
+    """Stage timings and resource use of recent jobs, with per-stage percentiles"""
+    if not JOB_DEBUG:
+        return jsonify({'error': 'Not found'}), 404
+    
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    
+    jobs = job_manager.recent(limit)
+    return jsonify({
+        'pid': os.getpid(),
+        'postprocess': postprocess_pool.stats(),
+        'stages': stage_percentiles(jobs),
+        'jobs': [{
+            'job_id': job.id,
+            'state': job.state,
+            'url': job.description.get('url'),
+            'platform': job.description.get('platform'),
+            'option': job.description.get('option'),
+            'lane': job.lane,
+            'estimated_cost': round(job.cost, 3),
+            'accounting': job.accounting.to_dict((job.finished_at or time.time()) - job.created_at)
+        } for job in jobs]
+    })
+
+
+def sse_message(event, data, event_id=None):
+    """
+    Format one server-sent event
+
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+        event_id: Value for the id field, echoed back by browsers as Last-Event-ID
+
+    Returns:
+        str: Event block terminated by a blank line
+    """
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def job_events(job, last_seq=0):
+    """
+    Generate the server-sent events for a job until it ends
+
+    Discrete events (state changes, post-processing steps) are always sent;
+    byte progress is coalesced into the latest snapshot, and pushes are spaced
+    so a client receives at most EVENTS_PER_SECOND updates per second.
+
+    Args:
+        job: Job to follow
+        last_seq: Sequence number of the last event the client already has
+
+    Yields:
+        str: Server-sent event blocks
+    """
+    interval = 1.0 / EVENTS_PER_SECOND if EVENTS_PER_SECOND > 0 else 0
+    version = None
+    progress = None
+
+    while True:
+        pushed_at = time.time()
+        for seq, event, data in job.events_since(last_seq):
+            last_seq = seq
+            yield sse_message(event, data, seq)
+
+        snapshot = job.to_dict()
+        if snapshot['progress'] and snapshot['progress'] != progress:
+            progress = snapshot['progress']
+            yield sse_message('progress', {'state': snapshot['state'], 'progress': progress})
+
+        if job.finished_at is not None:
+            yield sse_message('done', snapshot)
+            return
+
+        # Pace before waiting so bursts of hook calls collapse into one push
+        remaining = interval - (time.time() - pushed_at)
+        if remaining > 0:
+            time.sleep(remaining)
+
+        current = job.version
+        if current == version:
+            current = job.wait_for_change(version, EVENTS_KEEPALIVE)
+            if current == version:
+                yield ': keep-alive\n\n'
+        version = current
+
+
+def stored_job_events(job_id):
+    """
+    Generate the server-sent events for a job held by another worker
+
+    The job is followed through the job store, so the stream carries state
+    changes, progress (as often as the store is updated) and the final
+    snapshot; post-processing steps are only streamed by the job's worker.
+
+    Args:
+        job_id: Job to follow
+
+    Yields:
+        str: Server-sent event blocks
+    """
+    interval = 1.0 / EVENTS_PER_SECOND if EVENTS_PER_SECOND > 0 else 0.25
+    state = None
+    progress = None
+    sent_at = time.time()
+
+    while True:
+        snapshot = job_manager.status(job_id)
+        if snapshot is None:
+            return
+
+        if snapshot['state'] != state:
+            state = snapshot['state']
+            sent_at = time.time()
+            yield sse_message('state', {'state': state})
+
+        if snapshot['progress'] and snapshot['progress'] != progress:
+            progress = snapshot['progress']
+            sent_at = time.time()
+            yield sse_message('progress', {'state': state, 'progress': progress})
+
+        if state in ('finished', 'failed'):
+            yield sse_message('done', snapshot)
+            return
+
+        if time.time() - sent_at >= EVENTS_KEEPALIVE:
+            sent_at = time.time()
+            yield ': keep-alive\n\n'
+        time.sleep(interval)
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_event_stream(job_id):
+    """Stream a download job's progress and post-processing events (SSE)"""
+    job = job_manager.get(job_id)
+    if job is not None:
+        try:
+            last_seq = int(request.headers.get('Last-Event-ID', 0))
+        except ValueError:
+            last_seq = 0
+        events = job_events(job, last_seq)
+    elif job_manager.status(job_id) is not None:
+        # Held by another worker: follow it through the job store
+        events = stored_job_events(job_id)
+    else:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/stream', methods=['GET'])
+def stream():
+    """Stream media straight from the source to the client without saving it"""
+    url = request.args.get('url', '').strip()
+    option = request.args.get('option', 'video')
+    quality = request.args.get('quality')
+    
+    if not url:
+        return jsonify({'error': 'URL is required'}), 400
+    if option not in ('video', 'audio'):
+        return jsonify({'error': 'Only video and audio can be streamed'}), 400
+    
+    # Only URLs of a supported platform are fetched, whatever platform the
+    # client names
+    route = route_url(url)
+    platform = request.args.get('platform') or (route.platform if route else None)
+    if route is None or route.platform != platform:
+        return jsonify({'error': 'Unsupported or invalid URL'}), 400
+
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many active streams, please try again later'}), 503
+    
+    from streaming import StreamError, prepare_stream
+    
+    try:
+        info = get_media_info(platform, url)
+        if not info:
+            stream_slots.release()
+            return jsonify({'error': 'Failed to fetch media information'}), 500
+        
+        media = prepare_stream(platform, info, option, int(quality) if quality else None)
+        chunks = media.open()
+    except (StreamError, ValueError) as e:
+        stream_slots.release()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        stream_slots.release()
+        return jsonify({'error': str(e)}), 502
+    
+    headers = {'Content-Disposition': f'attachment; filename="{media.filename}"'}
+    if media.content_length:
+        headers['Content-Length'] = media.content_length
+    
+    response = Response(chunks, mimetype=media.mimetype, headers=headers)
+    # Runs even if the client disconnects before the body is read
+    response.call_on_close(media.close)
+    response.call_on_close(stream_slots.release)
+    return response
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
     return jsonify({'status': 'ok', 'message': 'UniDownload API is running'})
 
 
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics, summed over all gunicorn workers"""
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type)
+
+
+def admin_authorized():
+    """Check the request's bearer token against ADMIN_TOKEN"""
+    expected = f'Bearer {ADMIN_TOKEN}'
+    return hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode())
+
+
+@app.route('/api/admin/bandwidth', methods=['GET', 'PUT', 'DELETE'])
+def admin_bandwidth():
+    """Show (GET), change (PUT) or reset (DELETE) the download bandwidth limits of all workers"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if request.method == 'PUT':
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'JSON object required'}), 400
+        weights = data.get('weights')
+        if weights is not None and not isinstance(weights, dict):
+            return jsonify({'error': 'weights must be an object'}), 400
+        try:
+            bandwidth_scheduler.update(
+                global_limit=data.get('global_limit'),
+                job_limit=data.get('job_limit'),
+                weights=weights
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    elif request.method == 'DELETE':
+        bandwidth_scheduler.reset()
+    
+    return jsonify(bandwidth_scheduler.status())
+
+
+def stat_etag(stat):
+    """
+    Build an ETag from file metadata, for files the result store does not know
+
+    Args:
+        stat: os.stat result
+
+    Returns:
+        str: Unquoted entity tag
+    """
+    return f'{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}'
+
+
+def zero_copy_range(response, path):
+    """
+    Send a 206 response body with os.sendfile instead of a Python read loop
+
+    Gunicorn sends wsgi.file_wrapper bodies with os.sendfile from the file's
+    current offset and stops at Content-Length, so a wrapper around the file
+    seeked to the range start sends exactly the requested bytes. Other servers
+    keep Werkzeug's range iterator.
+
+    Args:
+        response: Partial-content response built by send_file
+        path: Path of the file being served
+
+    Returns:
+        Response: The response with its body replaced when possible
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is None or not request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        return response
+    
+    start = response.content_range.start
+    response.response.close()
+    f = open(path, 'rb')
+    f.seek(start)
+    response.response = file_wrapper(f, FILE_CHUNK_SIZE)
+    return response
+
+
+def resolve_download(subpath, filename):
+    """
+    Resolve a requested file to a readable file inside the downloads folder
+
+    Args:
+        subpath: Folder below DOWNLOAD_ROOT ('' for the root)
+        filename: File name
+
+    Returns:
+        str: Absolute path, or None if the file is missing or not servable
+    """
+    path = safe_join(DOWNLOAD_ROOT, subpath, filename)
+    if path is None:
+        return None
+    
+    # Symlinks must not lead out of the downloads folder
+    root = os.path.realpath(DOWNLOAD_ROOT)
+    real = os.path.realpath(path)
+    if os.path.commonpath([root, real]) != root:
+        return None
+    if not os.path.isfile(real) or not os.access(real, os.R_OK):
+        return None
+    return os.path.abspath(path)
+
+
+def offload_response(path):
+    """
+    Hand the transfer of a file to the front proxy
+
+    Args:
+        path: Absolute path returned by resolve_download
+
+    Returns:
+        Response: Headers-only response carrying X-Accel-Redirect or X-Sendfile
+    """
+    # The proxy answers ranges and revalidation itself and sets the length
+    response = werkzeug_send_file(path, request.environ, as_attachment=True,
+                                  use_x_sendfile=True, conditional=False, etag=False)
+    del response.headers['Content-Length']
+    
+    if FILE_OFFLOAD == 'nginx':
+        relative = os.path.relpath(path, os.path.abspath(DOWNLOAD_ROOT)).replace(os.sep, '/')
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = FILE_OFFLOAD_PREFIX.rstrip('/') + '/' + quote(relative)
+    return response
+
+
+@app.route('/api/files/<filename>', defaults={'subpath': ''})
 @app.route('/api/files/<path:subpath>/<filename>')
 def serve_file(subpath, filename):
-    """Serve downloaded files"""
+    """Serve downloaded files with byte ranges and ETag revalidation"""
+    path = resolve_download(subpath, filename)
+    if path is None:
+        return jsonify({'error': 'File not found'}), 404
+    
     try:
-        directory = os.path.join('downloads', subpath)
-        return send_from_directory(directory, filename, as_attachment=True)
-    except Exception as e:
+        if FILE_OFFLOAD in ('nginx', 'sendfile'):
+            return offload_response(path)
+        
+        stat = os.stat(path)
+        etag = result_store.etag(path, stat) or stat_etag(stat)
+        
+        # conditional=True answers If-None-Match / If-Modified-Since with 304,
+        # Range with 206 (honouring If-Range) and unsatisfiable ranges with 416
+        response = send_file(path, as_attachment=True, etag=etag,
+                             conditional=True, last_modified=stat.st_mtime)
+        if response.status_code == 206:
+            response = zero_copy_range(response, path)
+        return response
+    except OSError as e:
         return jsonify({'error': str(e)}), 404
 
 
@@ -255,10 +940,17 @@ if __name__ == '__main__':
     print(f"Server starting on port {port}")
     print("API Documentation:")
     print("  POST /api/detect  - Detect platform and get media info")
-    print("  POST /api/download - Download media")
+    print("  POST /api/download - Queue a download job")
+    print("  GET  /api/jobs/<id> - Job state, progress and files")
+    print("  GET  /api/jobs/<id>/events - Live job events (SSE)")
+    print("  GET  /api/stream  - Stream media without saving it")
     print("  GET  /api/health  - Health check")
     print("=" * 60)
     
     # Use debug mode only in development
     debug_mode = os.environ.get('FLASK_ENV') != 'production'
+    
+    # With the reloader, only the child process that serves requests resumes jobs
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background()
     app.run(debug=debug_mode, host='0.0.0.0', port=port)
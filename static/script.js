@@ -1,5 +1,12 @@
 // API Base URL - use relative path for production
 const API_BASE = '/api';
+const JOB_POLL_INTERVAL = 1000;
+
+// Random identity kept by this browser so the server can list its job history
+// (crypto.randomUUID only exists on HTTPS and localhost pages)
+const CLIENT_ID = localStorage.getItem('unidownloadClientId') ||
+    (window.crypto && crypto.randomUUID ? crypto.randomUUID() : Math.random().toString(36).slice(2) + Date.now().toString(36));
+localStorage.setItem('unidownloadClientId', CLIENT_ID);
 
 // Global state
 let currentMediaData = null;
@@ -141,7 +148,7 @@ function displayYouTubeOptions(data) {
     // Add click handlers for other options
     optionsSection.querySelectorAll('.option-btn[data-option]').forEach(btn => {
         if (!btn.dataset.formatId) {
-            btn.onclick = () => handleDownload('youtube', btn.dataset.option);
+            btn.onclick = () => handleDownload('youtube', btn.dataset.option, null, btn.dataset.audioFormat);
         }
     });
 
@@ -154,7 +161,7 @@ function displayInstagramOptions(data) {
     
     // Add click handlers
     optionsSection.querySelectorAll('.option-btn').forEach(btn => {
-        btn.onclick = () => handleDownload('instagram', btn.dataset.option);
+        btn.onclick = () => handleDownload('instagram', btn.dataset.option, null, btn.dataset.audioFormat);
     });
 
     optionsSection.classList.remove('hidden');
@@ -166,14 +173,14 @@ function displayFacebookOptions(data) {
     
     // Add click handlers
     optionsSection.querySelectorAll('.option-btn').forEach(btn => {
-        btn.onclick = () => handleDownload('facebook', btn.dataset.option);
+        btn.onclick = () => handleDownload('facebook', btn.dataset.option, null, btn.dataset.audioFormat);
     });
 
     optionsSection.classList.remove('hidden');
 }
 
 // Handle Download
-async function handleDownload(platform, option, formatId = null) {
+async function handleDownload(platform, option, formatId = null, audioFormat = null) {
     const downloadData = {
         url: currentUrl,
         platform: platform,
@@ -184,6 +191,11 @@ async function handleDownload(platform, option, formatId = null) {
         downloadData.format_id = formatId;
     }
 
+    // Audio keeps its original codec unless MP3 was picked
+    if (audioFormat) {
+        downloadData.audio_format = audioFormat;
+    }
+
     // Add to downloads list
     const downloadId = Date.now();
     addDownloadItem(downloadId, option, 'Downloading...');
@@ -193,6 +205,7 @@ async function handleDownload(platform, option, formatId = null) {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'X-Client-ID': CLIENT_ID,
             },
             body: JSON.stringify(downloadData)
         });
@@ -203,8 +216,11 @@ async function handleDownload(platform, option, formatId = null) {
             throw new Error(data.error || 'Download failed');
         }
 
-        updateDownloadItem(downloadId, 'success', data.message, data.files);
-        showStatus(data.message, 'success');
+        // Cached results come back finished, everything else is polled
+        const job = data.job_id ? await waitForJob(data.job_id, downloadId) : data;
+
+        updateDownloadItem(downloadId, 'success', job.message, job.files);
+        showStatus(job.message, 'success');
 
     } catch (error) {
         updateDownloadItem(downloadId, 'error', error.message);
@@ -212,6 +228,87 @@ async function handleDownload(platform, option, formatId = null) {
     }
 }
 
+// Follow a download job until it finishes, via its event stream when available
+function waitForJob(jobId, downloadId) {
+    if (!window.EventSource) {
+        return pollJob(jobId, downloadId);
+    }
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE}/jobs/${jobId}/events`);
+        let ended = false;
+
+        source.addEventListener('progress', event => {
+            updateDownloadProgress(downloadId, JSON.parse(event.data));
+        });
+
+        source.addEventListener('postprocess', () => {
+            updateDownloadProgress(downloadId, { state: 'running', progress: { status: 'finished' } });
+        });
+
+        source.addEventListener('done', event => {
+            ended = true;
+            source.close();
+            const job = JSON.parse(event.data);
+            if (job.state === 'finished') {
+                resolve(job);
+            } else {
+                reject(new Error(job.error || 'Download failed'));
+            }
+        });
+
+        // Fall back to polling if the stream cannot be opened or drops
+        source.onerror = () => {
+            if (ended) return;
+            ended = true;
+            source.close();
+            pollJob(jobId, downloadId).then(resolve, reject);
+        };
+    });
+}
+
+// Poll job status until it finishes
+async function pollJob(jobId, downloadId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+
+        const response = await fetch(`${API_BASE}/jobs/${jobId}`);
+        const job = await response.json();
+
+        if (!response.ok) {
+            throw new Error(job.error || 'Failed to fetch download status');
+        }
+
+        if (job.state === 'finished') {
+            return job;
+        }
+        if (job.state === 'failed') {
+            throw new Error(job.error || 'Download failed');
+        }
+
+        updateDownloadProgress(downloadId, job);
+    }
+}
+
+// Show job progress on a download item
+function updateDownloadProgress(id, job) {
+    const item = document.getElementById(`download-${id}`);
+    if (!item) return;
+
+    const messageEl = item.querySelector('.message');
+    const progress = job.progress || {};
+
+    if (job.state === 'queued') {
+        messageEl.textContent = 'Queued...';
+    } else if (progress.status === 'finished') {
+        messageEl.textContent = 'Processing...';
+    } else if (progress.percent !== null && progress.percent !== undefined) {
+        messageEl.textContent = `Downloading... ${progress.percent}%`;
+    } else {
+        messageEl.textContent = 'Downloading...';
+    }
+}
+
 // Add Download Item
 function addDownloadItem(id, option, message) {
     downloadProgress.classList.remove('hidden');
@@ -0,0 +1,247 @@
+"""
+Streaming Module
+Pipes media bytes from the source straight to an HTTP client without writing to disk
+"""
+
+import os
+import shutil
+import subprocess
+
+import yt_dlp
+from yt_dlp.networking import Request
+from yt_dlp.utils import sanitize_filename
+
+from ydl_pool import ydl_pool
+
+
+# Bytes read from the source (or ffmpeg) per chunk; the generators pull one
+# chunk at a time, so this bounds the memory held per stream
+CHUNK_SIZE = 64 * 1024
+
+# Protocols whose single URL can be fetched as one HTTP response
+DIRECT_PROTOCOLS = ('http', 'https')
+
+# Mime types for the containers a stream can be sent as
+MIME_TYPES = {
+    'mp4': 'video/mp4',
+    'webm': 'video/webm',
+    'mkv': 'video/x-matroska',
+    'm4a': 'audio/mp4',
+    'mp3': 'audio/mpeg',
+    'opus': 'audio/ogg',
+    'ogg': 'audio/ogg',
+}
+
+
+class StreamError(Exception):
+    """Raised when a request cannot be served as a stream"""
+
+
+def format_spec(option, quality_height=None):
+    """
+    Build the yt-dlp format selector for a streamed download
+
+    Progressive (single-file, audio+video) formats are preferred because they
+    can be passed through without ffmpeg.
+
+    Args:
+        option: 'video' or 'audio'
+        quality_height: Maximum video height (None for best)
+
+    Returns:
+        str: Format selector
+    """
+    if option == 'audio':
+        return 'bestaudio[ext=m4a]/bestaudio/best'
+    height = f'[height<={quality_height}]' if quality_height else ''
+    return f'best{height}[vcodec!=none][acodec!=none]/bestvideo{height}+bestaudio/best{height}'
+
+
+def stream_options(platform, option, quality_height=None):
+    """
+    Build YoutubeDL options for selecting a streamable format
+
+    Args:
+        platform: Platform name
+        option: 'video' or 'audio'
+        quality_height: Maximum video height (None for best)
+
+    Returns:
+        dict: YoutubeDL options
+    """
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'format': format_spec(option, quality_height),
+        'nocheckcertificate': True,
+    }
+    if platform == 'youtube':
+        # Same client the downloaders use, its formats are plain HTTPS
+        ydl_opts['extractor_args'] = {
+            'youtube': {
+                'player_client': ['android'],
+                'skip': ['hls', 'dash', 'translated_subs']
+            }
+        }
+
+    # Use cookies if available
+    if os.path.exists('cookies.txt'):
+        ydl_opts['cookiefile'] = 'cookies.txt'
+    return ydl_opts
+
+
+class MediaStream:
+    """A selected format ready to be sent, either directly or through ffmpeg"""
+
+    def __init__(self, ydl, info):
+        """
+        Initialize media stream
+
+        Args:
+            ydl: yt_dlp.YoutubeDL instance used for selection (and direct fetches)
+            info: Info dict after format selection
+        """
+        self.ydl = ydl
+        self.info = info
+        self.formats = info.get('requested_formats') or [info]
+        self.direct = (
+            len(self.formats) == 1
+            and self.formats[0].get('protocol', 'https') in DIRECT_PROTOCOLS
+        )
+        if self.direct:
+            self.ext = self.formats[0].get('ext') or 'mp4'
+        else:
+            # Merged output is sent as fragmented MP4, or Matroska for codecs MP4 cannot hold
+            self.ext = 'mp4' if all(f.get('ext') in ('mp4', 'm4a') for f in self.formats) else 'mkv'
+        # Byte length reported by the source once a direct stream is opened
+        self.content_length = None
+        self._response = None
+        self._process = None
+        self._closed = False
+
+    @property
+    def filename(self):
+        """Download name offered to the client"""
+        title = sanitize_filename(self.info.get('title') or self.info.get('id') or 'media', restricted=True)
+        return f'{title}.{self.ext}'
+
+    @property
+    def mimetype(self):
+        """Content type of the streamed bytes"""
+        return MIME_TYPES.get(self.ext, 'application/octet-stream')
+
+    def open(self):
+        """
+        Start fetching and return a chunk iterator
+
+        The source is opened before this returns, so connection errors surface
+        before any response headers are sent.
+
+        Returns:
+            iterator: Yields byte chunks of at most CHUNK_SIZE
+        """
+        try:
+            if self.direct:
+                return self._direct_chunks()
+            return self._ffmpeg_chunks()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Stop the transfer and hand the YoutubeDL instance back to the pool (idempotent)"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._response is not None:
+            self._response.close()
+        if self._process is not None:
+            # Client went away or stream ended; don't leave ffmpeg running
+            self._process.stdout.close()
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+        ydl_pool.release(self.ydl)
+
+    def _direct_chunks(self):
+        """Open a progressive format and relay its body"""
+        fmt = self.formats[0]
+        response = self._response = self.ydl.urlopen(Request(fmt['url'], headers=fmt.get('http_headers') or {}))
+        if not response.headers.get('Content-Encoding'):
+            self.content_length = response.headers.get('Content-Length')
+
+        def chunks():
+            try:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                self.close()
+
+        return chunks()
+
+    def _ffmpeg_chunks(self):
+        """Merge or remux the selected formats with ffmpeg, reading its stdout"""
+        ffmpeg = shutil.which('ffmpeg')
+        if not ffmpeg:
+            raise StreamError('FFmpeg is required to stream this format')
+
+        args = [ffmpeg, '-hide_banner', '-loglevel', 'error']
+        for fmt in self.formats:
+            headers = ''.join(f'{k}: {v}\r\n' for k, v in (fmt.get('http_headers') or {}).items())
+            if headers:
+                args += ['-headers', headers]
+            args += ['-i', fmt['url']]
+        for index in range(len(self.formats)):
+            args += ['-map', f'{index}']
+        args += ['-c', 'copy']
+        if self.ext == 'mp4':
+            # Non-seekable output needs a fragmented MP4 with the index up front
+            args += ['-movflags', 'frag_keyframe+empty_moov+default_base_moof', '-f', 'mp4']
+        else:
+            args += ['-f', 'matroska']
+        args.append('pipe:1')
+
+        process = self._process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, bufsize=CHUNK_SIZE)
+
+        def chunks():
+            try:
+                while True:
+                    chunk = process.stdout.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                self.close()
+
+        return chunks()
+
+
+def prepare_stream(platform, info, option='video', quality_height=None):
+    """
+    Select the format to stream from an extracted info dict
+
+    Args:
+        platform: Platform name
+        info: Info dict from extraction (e.g. the info cache)
+        option: 'video' or 'audio'
+        quality_height: Maximum video height (None for best)
+
+    Returns:
+        MediaStream: The selected stream
+
+    Raises:
+        StreamError: If the media has no single streamable item
+    """
+    if info.get('_type') in ('playlist', 'multi_video'):
+        raise StreamError('Playlists and multi-item posts cannot be streamed')
+
+    ydl = ydl_pool.acquire(stream_options(platform, option, quality_height))
+    try:
+        selected = ydl.process_ie_result(info, download=False)
+    except yt_dlp.utils.DownloadError as e:
+        ydl_pool.release(ydl)
+        raise StreamError(str(e))
+    return MediaStream(ydl, selected)
@@ -0,0 +1,69 @@
+"""
+Shared test fixtures
+
+Run from the project root:
+    python -m pytest -q
+"""
+
+import functools
+import os
+import sys
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """
+    Serve a directory of small media files over HTTP on localhost
+
+    Yields:
+        tuple: (base URL, directory served)
+    """
+    root = tmp_path / 'origin'
+    root.mkdir()
+    for name in ('a.mp4', 'b.mp4'):
+        (root / name).write_bytes(os.urandom(4096))
+
+    handler = functools.partial(_QuietHandler, directory=str(root))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}', root
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope='session')
+def server_module(tmp_path_factory):
+    """
+    Import the server with its downloads folder and caches in a scratch directory
+
+    Yields:
+        module: The server module
+    """
+    workdir = tmp_path_factory.mktemp('server')
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import server
+        yield server
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture
+def client(server_module):
+    """Flask test client of the server app"""
+    return server_module.app.test_client()
@@ -0,0 +1,96 @@
+"""Tests for the bandwidth scheduler"""
+
+import pytest
+
+import bandwidth
+from bandwidth import BURST_SECONDS, BandwidthScheduler, Flow, TokenBucket, fair_shares, parse_rate
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(bandwidth.time, 'monotonic', clock)
+    return clock
+
+
+def test_parse_rate():
+    assert parse_rate('512K') == 512 * 1024
+    assert parse_rate('1.5MB') == int(1.5 * 1024 ** 2)
+    assert parse_rate(2048) == 2048
+    assert parse_rate(None) == parse_rate('') == 0
+    for value in ('fast', '-1M', True, float('inf')):
+        with pytest.raises(ValueError):
+            parse_rate(value)
+
+
+def test_fair_shares_split_by_weight():
+    assert fair_shares(900, {'a': 1, 'b': 2}, {}) == {'a': 300, 'b': 600}
+
+
+def test_fair_shares_give_the_unused_share_of_capped_flows_to_the_others():
+    shares = fair_shares(1000, {'a': 1, 'b': 1, 'c': 2}, {'a': 100, 'b': 0})
+    assert shares['a'] == 100
+    assert shares['b'] == pytest.approx(300)
+    assert shares['c'] == pytest.approx(600)
+
+
+def test_fair_shares_refill_in_rounds():
+    # Capping b frees enough for c to hit its cap too; a takes the rest
+    shares = fair_shares(1000, {'a': 1, 'b': 1, 'c': 1}, {'b': 100, 'c': 400})
+    assert shares == {'b': 100, 'c': 400, 'a': 500}
+
+
+def test_token_bucket_saves_a_burst_and_makes_takers_pay_back_debt(clock):
+    bucket = TokenBucket(1000)
+    assert bucket.tokens == 1000 * BURST_SECONDS
+
+    assert bucket.take(500, clock.now) == 0.0
+    assert bucket.take(250, clock.now) == pytest.approx(0.25)
+    clock.now += 0.1
+    assert bucket.wait_time(clock.now) == pytest.approx(0.15)
+    clock.now += 0.15
+    assert bucket.wait_time(clock.now) == 0.0
+
+    # An idle bucket saves no more than BURST_SECONDS of allowance
+    clock.now += 60
+    bucket.take(0, clock.now)
+    assert bucket.tokens == pytest.approx(1000 * BURST_SECONDS)
+
+
+def test_token_bucket_rate_change_keeps_debt(clock):
+    bucket = TokenBucket(1000)
+    bucket.take(1500, clock.now)
+    bucket.set_rate(500, clock.now)
+    assert bucket.wait_time(clock.now) == pytest.approx(2.0)
+
+    bucket.set_rate(0, clock.now)
+    assert bucket.take(10 ** 9, clock.now) == 0.0
+
+
+def test_origin_limited_job_leaves_its_share_to_the_others(clock):
+    scheduler = BandwidthScheduler()
+    scheduler.configure(global_limit=1_000_000)
+    fast, slow = Flow('fast', 'video', 1), Flow('slow', 'video', 1)
+    scheduler._flows = {'fast': fast, 'slow': slow}
+
+    scheduler._rebalance(clock.now)
+    assert fast.share == slow.share == 500_000
+
+    # Over one interval the fast job waited for its bucket; the slow one
+    # received a fifth of its share without ever waiting
+    clock.now += 1.0
+    fast.received_since, fast.throttled = 500_000, True
+    slow.received_since = 100_000
+    scheduler._rebalance(clock.now)
+
+    assert slow.share == pytest.approx(125_000)
+    assert fast.share == pytest.approx(875_000)
+    assert fast.bucket.rate == fast.share
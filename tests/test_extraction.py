@@ -0,0 +1,72 @@
+"""Tests for the extract-once accounting in extraction"""
+
+import pytest
+from yt_dlp.extractor.common import InfoExtractor
+
+import extraction
+from extraction import extraction_counter
+from ydl_pool import ydl_pool
+
+
+class StubIE(InfoExtractor):
+    """Resolves stub://video/<name> to a file on the test origin, counting its runs"""
+    IE_NAME = 'stub'
+    _VALID_URL = r'stub://video/(?P<id>\w+)'
+    origin = None
+    calls = 0
+
+    def _real_extract(self, url):
+        StubIE.calls += 1
+        video_id = self._match_id(url)
+        return {
+            'id': video_id,
+            'title': video_id,
+            'formats': [{'format_id': 'mp4', 'url': f'{self.origin}/{video_id}.mp4', 'ext': 'mp4'}],
+        }
+
+
+class StubPlaylistIE(InfoExtractor):
+    """Resolves stub://playlist to two unresolved stub video entries"""
+    IE_NAME = 'stubplaylist'
+    _VALID_URL = r'stub://playlist'
+
+    def _real_extract(self, url):
+        entries = [self.url_result(f'stub://video/{name}', StubIE) for name in ('a', 'b')]
+        return self.playlist_result(entries, 'playlist', 'playlist')
+
+
+@pytest.fixture
+def ydl(tmp_path, origin):
+    """Pooled YoutubeDL on which only the stub extractors claim URLs"""
+    StubIE.origin = origin[0]
+    StubIE.calls = 0
+    extraction_counter.reset()
+    with ydl_pool.checkout({
+        'quiet': True,
+        'no_warnings': True,
+        'allowed_extractors': ['stub'],
+        'outtmpl': str(tmp_path / 'out' / '%(id)s.%(ext)s'),
+    }) as ydl:
+        for ie in (StubIE(), StubPlaylistIE()):
+            ydl.add_info_extractor(ie)
+        yield ydl
+
+
+def test_download_with_prefetched_info_extracts_once(ydl):
+    info = extraction.extract_info(ydl, 'stub://video/a')
+    result = extraction.download(ydl, 'stub://video/a', info)
+
+    assert result['files']
+    assert StubIE.calls == 1
+    assert extraction_counter.count == 1
+
+
+def test_raw_playlist_extracts_each_entry_once(ydl):
+    playlist = extraction.extract_info(ydl, 'stub://playlist', process=False)
+    playlist['entries'] = list(playlist['entries'])
+    result = extraction.download(ydl, 'stub://playlist', playlist)
+
+    assert len(result['files']) == 2
+    assert StubIE.calls == 2
+    # The playlist page once, then each entry once
+    assert extraction_counter.count == 3
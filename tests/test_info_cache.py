@@ -0,0 +1,58 @@
+"""Tests for the info cache"""
+
+import sqlite3
+
+import pytest
+
+from info_cache import InfoCache
+from job_cost import estimate_cost
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+INFO = {
+    'id': 'dQw4w9WgXcQ',
+    'title': 'Video',
+    'duration': 212,
+    'description': 'x' * 10000,
+    'formats': [
+        {'format_id': '140', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'filesize': 3_400_000,
+         'url': 'https://example.com/140', 'http_headers': {'User-Agent': 'test'}},
+        {'format_id': '136', 'vcodec': 'avc1', 'acodec': 'none', 'height': 720, 'filesize': 20_000_000},
+        {'format_id': '137', 'vcodec': 'avc1', 'acodec': 'none', 'height': 1080, 'filesize': 45_000_000},
+    ],
+}
+
+
+@pytest.mark.parametrize('option, height, audio_format', [
+    ('video', None, None), ('video', 720, None), ('audio', None, 'mp3'), ('audio', None, 'original'),
+])
+def test_cost_profile_estimates_like_the_full_info(tmp_path, option, height, audio_format):
+    cache = InfoCache(str(tmp_path / 'cache.db'))
+    cache.put('youtube', URL, INFO)
+
+    profile = cache.profile('youtube', URL)
+    assert 'description' not in profile
+    assert estimate_cost(option, profile, height, audio_format) == estimate_cost(option, INFO, height, audio_format)
+
+    # Another worker reads it from the shared tier
+    shared = InfoCache(str(tmp_path / 'cache.db')).profile('youtube', URL)
+    assert shared == profile
+
+
+def test_profile_of_an_uncached_url_is_none(tmp_path):
+    assert InfoCache(str(tmp_path / 'cache.db')).profile('youtube', URL) is None
+
+
+def test_cache_file_without_profiles_gets_the_column(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE info_cache (key TEXT PRIMARY KEY, info TEXT NOT NULL, '
+                 'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+    conn.execute("INSERT INTO info_cache VALUES ('youtube:dQw4w9WgXcQ', '{}', 9e12, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = InfoCache(path)
+    assert cache.profile('youtube', URL) is None
+    cache.put('youtube', URL, INFO)
+    assert InfoCache(path).profile('youtube', URL) == cache.profile('youtube', URL)
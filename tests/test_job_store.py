@@ -0,0 +1,48 @@
+"""Tests for the job journal and the job store built on it"""
+
+import time
+
+import job_journal
+from job_store import JobStore
+from jobs import Job
+
+
+def _job(key, client=None):
+    return Job(print, ('https://example.com/v',), {}, {'url': 'https://example.com/v'}, key, client=client)
+
+
+def test_store_extends_a_journal_table(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    journal = job_journal.JobJournal(path)
+    journal.record(_job('a'), 'run_download')
+
+    store = JobStore(path)
+    job = _job('b', client='browser-1')
+    assert store.record(job, 'run_download') is None
+    store.finished(job.id, 'finished', result={'files': []})
+
+    assert [entry['job_id'] for entry in store.history('browser-1')] == [job.id]
+
+
+def test_expired_jobs_are_claimed_with_their_client(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'), lease_seconds=-1)
+    job = _job('a', client='browser-1')
+    store.record(job, 'run_download')
+
+    claimed = store.claim_orphans()
+
+    assert [(entry['job_id'], entry['client'], entry['args']) for entry in claimed] == \
+        [(job.id, 'browser-1', ['https://example.com/v'])]
+
+
+def test_jobs_interrupted_too_often_are_abandoned(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'), lease_seconds=-1)
+    job = _job('a')
+    store.record(job, 'run_download')
+    for _ in range(job_journal.MAX_ATTEMPTS):
+        store.started(job.id)
+
+    assert store.claim_orphans() == []
+    snapshot = store.get(job.id)
+    assert snapshot['state'] == 'failed'
+    assert snapshot['finished_at'] <= time.time()
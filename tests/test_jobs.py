@@ -0,0 +1,259 @@
+"""Tests for JobManager queue ordering and worker slots"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import batch
+import jobs
+from jobs import JobManager, QueueFullError, off_worker
+
+
+def wait_done(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    version = job.version
+    while not job.done and time.monotonic() < deadline:
+        version = job.wait_for_change(version, 0.1)
+    return job.done
+
+
+def test_resumed_job_runs_before_earlier_queued_jobs():
+    manager = JobManager(max_workers=1, light_workers=0)
+    release = threading.Event()
+    order = []
+
+    def record(name):
+        order.append(name)
+
+    manager.submit(release.wait, cost=0.0)
+    queued = [manager.submit(record, f'new-{i}', cost=0.1)[0] for i in range(3)]
+    # Long enough for the queued jobs' aging to outweigh their cost
+    time.sleep(0.2)
+    manager._resume({
+        'job_id': 'resumed', 'task': 'record', 'args': ['resumed'], 'kwargs': {},
+        'description': {}, 'key': None, 'client': None, 'part_path': None, 'part_bytes': 0,
+    }, {'record': record})
+    resumed = manager.get('resumed')
+
+    release.set()
+    for job in [*queued, resumed]:
+        assert wait_done(job)
+
+    assert order == ['resumed', 'new-0', 'new-1', 'new-2']
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_lent_slot_is_taken_back_only_when_free():
+    manager = JobManager(max_workers=1, light_workers=0)
+    other_started = threading.Event()
+    release_other = threading.Event()
+    order = []
+
+    def lender():
+        with off_worker():
+            assert other_started.wait(5)
+            order.append('rejoining')
+        order.append('rejoined')
+
+    def other():
+        other_started.set()
+        release_other.wait(5)
+        order.append('other done')
+
+    first = manager.submit(lender)[0]
+    second = manager.submit(other)[0]
+
+    assert wait_for(lambda: 'rejoining' in order)
+    time.sleep(0.1)
+    # The lender waits for the slot instead of running a second job at once
+    assert order == ['rejoining']
+    assert manager._busy['heavy'] == 1
+
+    release_other.set()
+    assert wait_done(first) and wait_done(second)
+    assert order == ['rejoining', 'other done', 'rejoined']
+    assert manager._busy['heavy'] == 0
+
+
+def test_batch_lends_its_slot_while_every_item_post_processes():
+    manager = JobManager(max_workers=1, light_workers=0)
+    postprocessing = threading.Barrier(3)
+    release = threading.Event()
+    started = threading.Event()
+
+    def item(name):
+        with off_worker():
+            postprocessing.wait(5)
+            release.wait(5)
+        return {'files': [name]}
+
+    def playlist():
+        results = batch.run_batch(['a', 'b'], item, max_workers=2, per_host=2, on_progress=None)
+        return {'files': [path for result in results for path in result['files']]}
+
+    first = manager.submit(playlist)[0]
+    second = manager.submit(started.set)[0]
+
+    postprocessing.wait(5)
+    assert started.wait(5)
+    release.set()
+    assert wait_done(first) and wait_done(second)
+    assert first.result['files'] == ['a', 'b']
+    assert manager._busy['heavy'] == 0
+
+
+def test_batch_keeps_its_slot_while_an_item_downloads():
+    manager = JobManager(max_workers=1, light_workers=0)
+    downloading = threading.Event()
+    release = threading.Event()
+
+    def item(name):
+        if name == 'a':
+            downloading.set()
+            release.wait(5)
+        return {'files': [name]}
+
+    def playlist():
+        batch.run_batch(['a', 'b'], item, max_workers=1, on_progress=None)
+
+    first = manager.submit(playlist)[0]
+    second = manager.submit(lambda: None)[0]
+
+    assert downloading.wait(5)
+    time.sleep(0.1)
+    assert second.state == 'queued'
+    release.set()
+    assert wait_done(first) and wait_done(second)
+
+
+def test_no_more_than_max_workers_jobs_run_at_once():
+    manager = JobManager(max_workers=2, light_workers=0)
+    release = threading.Event()
+    lock = threading.Lock()
+    running = {'now': 0, 'peak': 0}
+
+    def task():
+        with lock:
+            running['now'] += 1
+            running['peak'] = max(running['peak'], running['now'])
+        release.wait(5)
+        with lock:
+            running['now'] -= 1
+
+    jobs = [manager.submit(task)[0] for _ in range(5)]
+    assert wait_for(lambda: running['now'] == 2)
+    time.sleep(0.1)
+    assert [job.state for job in jobs].count('queued') == 3
+
+    release.set()
+    assert all(wait_done(job) for job in jobs)
+    assert running['peak'] == 2
+    assert all(job.state == 'finished' for job in jobs)
+
+
+def test_submissions_past_max_queued_are_rejected():
+    manager = JobManager(max_workers=1, max_queued=2, light_workers=0)
+    release = threading.Event()
+    jobs = [manager.submit(release.wait, 5)[0] for _ in range(2)]
+
+    with pytest.raises(QueueFullError):
+        manager.submit(release.wait, 5)
+
+    release.set()
+    assert all(wait_done(job) for job in jobs)
+    # Finished jobs free their queue slots
+    assert wait_for(lambda: manager._active == 0)
+    assert wait_done(manager.submit(lambda: None)[0])
+
+
+def test_identical_submissions_share_one_job_and_one_slot():
+    manager = JobManager(max_workers=2, light_workers=0)
+    release = threading.Event()
+    calls = []
+
+    def task():
+        calls.append(1)
+        release.wait(5)
+
+    job, created = manager.submit(task, key='video')
+    assert created
+    for _ in range(3):
+        same, created = manager.submit(task, key='video')
+        assert same is job and not created
+    other = manager.submit(release.wait, 5, key='other')[0]
+
+    assert job.requests == 4
+    assert manager._active == 2
+    assert wait_for(lambda: manager._busy['heavy'] == 2)
+
+    release.set()
+    assert wait_done(job) and wait_done(other)
+    assert calls == [1]
+    assert wait_for(lambda: manager._active == 0)
+
+    # A finished job is not reused
+    again, created = manager.submit(task, key='video')
+    assert created and again is not job
+    assert wait_done(again)
+
+
+@pytest.fixture
+def wall_clock(monkeypatch):
+    """Stand in for time.time in the jobs module, so submission times are exact"""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(jobs, 'time', SimpleNamespace(
+        time=lambda: clock.now, monotonic=time.monotonic, thread_time=time.thread_time, sleep=time.sleep))
+    return clock
+
+
+def run_in_order(manager, submissions, clock):
+    """Submit (name, cost, submitted_at) jobs behind a blocking job and return the order they ran in"""
+    release = threading.Event()
+    order = []
+    blocker = manager.submit(release.wait, 5)[0]
+    assert wait_for(lambda: blocker.state == 'running')
+    queued = []
+    for name, cost, submitted_at in submissions:
+        clock.now = submitted_at
+        queued.append(manager.submit(order.append, name, cost=cost)[0])
+    release.set()
+    assert all(wait_done(job) for job in queued)
+    return order
+
+
+def test_shortest_job_runs_first_without_aging(wall_clock):
+    manager = JobManager(max_workers=1, light_workers=0, aging_rate=0)
+    order = run_in_order(manager, [('long', 30, 1000), ('short', 1, 1010), ('medium', 5, 1020)], wall_clock)
+    assert order == ['short', 'medium', 'long']
+
+
+def test_aging_lets_a_long_wait_outweigh_a_higher_cost(wall_clock):
+    manager = JobManager(max_workers=1, light_workers=0, aging_rate=1.0)
+    # Effective cost is cost plus submission time: medium 1009, short 1021,
+    # long 1025. The short job overtakes long, but not medium, whose 20 s
+    # longer wait outweighs its 8 s higher cost
+    order = run_in_order(manager, [
+        ('long', 25, 1000), ('medium', 9, 1000), ('short', 1, 1020),
+    ], wall_clock)
+    assert order == ['medium', 'short', 'long']
+
+
+def test_light_jobs_do_not_wait_behind_heavy_ones():
+    manager = JobManager(max_workers=1, light_workers=1)
+    release = threading.Event()
+    heavy = manager.submit(release.wait, 5, lane='heavy')[0]
+    queued_heavy = manager.submit(lambda: None, lane='heavy')[0]
+    light = manager.submit(lambda: None, lane='light')[0]
+
+    assert wait_done(light)
+    assert queued_heavy.state == 'queued'
+    release.set()
+    assert wait_done(heavy) and wait_done(queued_heavy)
@@ -0,0 +1,30 @@
+"""Tests for the post-processing pool"""
+
+import subprocess
+import sys
+
+from jobs import JobManager
+from postprocess import PostprocessPool
+from test_jobs import wait_done
+
+# Child process that uses about 0.3 s of CPU
+BURN = [sys.executable, '-c', 'import time\nend = time.process_time() + 0.3\nwhile time.process_time() < end: pass']
+
+
+def test_child_process_cpu_is_charged_to_its_job():
+    pool = PostprocessPool(max_workers=2)
+    manager = JobManager(max_workers=2, light_workers=0)
+
+    def task():
+        pool.run(subprocess.run, BURN)
+
+    jobs = [manager.submit(task)[0] for _ in range(2)]
+    for job in jobs:
+        assert wait_done(job, timeout=20)
+
+    children = [job.accounting.to_dict()['child_cpu_seconds'] for job in jobs]
+    # Overlapping steps each get their own child's CPU, and none is counted twice
+    assert all(0.25 <= seconds < 0.55 for seconds in children)
+    for job in jobs:
+        accounting = job.accounting.to_dict()
+        assert accounting['cpu_seconds'] >= accounting['child_cpu_seconds']
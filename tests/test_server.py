@@ -0,0 +1,199 @@
+"""Tests for the server's request validation and file serving"""
+
+import os
+
+import pytest
+
+from result_store import file_etag
+
+
+@pytest.mark.parametrize('query', [
+    {'url': 'http://169.254.169.254/latest/meta-data/', 'platform': 'youtube'},
+    {'url': 'http://127.0.0.1:8080/admin', 'platform': 'instagram'},
+    {'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'platform': 'instagram'},
+    {'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'platform': 'vimeo'},
+    {'url': 'http://169.254.169.254/latest/meta-data/'},
+])
+def test_stream_rejects_urls_outside_the_platform(client, server_module, monkeypatch, query):
+    def fetched(*args):
+        raise AssertionError('URL was fetched')
+    monkeypatch.setattr(server_module, 'get_media_info', fetched)
+
+    response = client.get('/api/stream', query_string=query)
+
+    assert response.status_code == 400
+
+
+def test_served_etag_is_the_stored_hash(client, server_module):
+    path = f'{server_module.DOWNLOAD_ROOT}/etag-test.bin'
+    with open(path, 'wb') as f:
+        f.write(b'stored once' * 1000)
+    server_module.result_store.put('test|etag|video|best|mp4', [path])
+
+    response = client.get('/api/files/etag-test.bin')
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{file_etag(path)}"'
+
+
+@pytest.fixture
+def offloaded_file(server_module):
+    """A file in a subfolder of the downloads folder, with a name that needs quoting"""
+    directory = os.path.join(server_module.DOWNLOAD_ROOT, 'clips')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'My clip #1.mp4')
+    with open(path, 'wb') as f:
+        f.write(b'x' * 4096)
+    return path
+
+
+@pytest.mark.parametrize('prefix', ['/internal-downloads/', '/protected'])
+def test_nginx_offload_maps_the_path_under_the_prefix(client, server_module, monkeypatch, offloaded_file, prefix):
+    monkeypatch.setattr(server_module, 'FILE_OFFLOAD', 'nginx')
+    monkeypatch.setattr(server_module, 'FILE_OFFLOAD_PREFIX', prefix)
+
+    response = client.get('/api/files/clips/My%20clip%20%231.mp4')
+
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == prefix.rstrip('/') + '/clips/My%20clip%20%231.mp4'
+    assert 'X-Sendfile' not in response.headers
+    assert response.data == b''
+
+
+def test_sendfile_offload_sends_the_absolute_path(client, server_module, monkeypatch, offloaded_file):
+    monkeypatch.setattr(server_module, 'FILE_OFFLOAD', 'sendfile')
+
+    response = client.get('/api/files/clips/My%20clip%20%231.mp4')
+
+    assert response.status_code == 200
+    assert response.headers['X-Sendfile'] == os.path.abspath(offloaded_file)
+    assert 'X-Accel-Redirect' not in response.headers
+    assert response.data == b''
+
+
+@pytest.mark.parametrize('mode, header', [('nginx', 'X-Accel-Redirect'), ('sendfile', 'X-Sendfile')])
+@pytest.mark.parametrize('request_headers', [
+    {'Range': 'bytes=0-99'},
+    {'Range': 'bytes=100000-'},
+    {'If-None-Match': '"anything"'},
+    {'If-Modified-Since': 'Thu, 01 Jan 2099 00:00:00 GMT'},
+])
+def test_offload_leaves_ranges_and_revalidation_to_the_proxy(client, server_module, monkeypatch, offloaded_file,
+                                                             mode, header, request_headers):
+    # The proxy sees the original request headers and answers 206, 304 or
+    # 416 itself; the API must hand every such request over unchanged
+    monkeypatch.setattr(server_module, 'FILE_OFFLOAD', mode)
+
+    response = client.get('/api/files/clips/My%20clip%20%231.mp4', headers=request_headers)
+
+    assert response.status_code == 200
+    assert header in response.headers
+    assert 'Content-Range' not in response.headers
+    # The length describes the empty body, not the file the proxy sends
+    assert response.headers.get('Content-Length', '0') == '0'
+    assert response.data == b''
+
+
+@pytest.mark.parametrize('mode', ['nginx', 'sendfile'])
+def test_offload_does_not_hand_over_missing_files(client, server_module, monkeypatch, mode):
+    monkeypatch.setattr(server_module, 'FILE_OFFLOAD', mode)
+
+    response = client.get('/api/files/clips/missing.mp4')
+
+    assert response.status_code == 404
+    assert 'X-Accel-Redirect' not in response.headers and 'X-Sendfile' not in response.headers
+
+
+def test_job_history_needs_a_client_id(client, server_module, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(server_module.job_manager, 'history', lambda client, limit: submitted.append(client) or [])
+
+    response = client.get('/api/jobs', environ_base={'REMOTE_ADDR': '10.0.0.1'})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'jobs': []}
+    assert submitted == []
+
+    client.get('/api/jobs', headers={'X-Client-ID': 'browser-1'})
+    assert submitted == ['browser-1']
+
+
+class PacedClock:
+    """Fake time for job_events: sleeping advances the clock and runs what happens meanwhile"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+        self.meanwhile = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        while self.meanwhile:
+            self.meanwhile.pop(0)()
+
+
+def downloading(job, downloaded):
+    job.update_progress({'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': 100})
+
+
+def test_job_events_coalesce_progress_and_pace_pushes(server_module, monkeypatch):
+    from jobs import Job
+
+    clock = PacedClock()
+    monkeypatch.setattr(server_module, 'time', clock)
+    monkeypatch.setattr(server_module, 'EVENTS_PER_SECOND', 4)
+    job = Job(lambda: None, (), {}, {}, None)
+    for downloaded in range(1, 6):
+        downloading(job, downloaded)
+    events = server_module.job_events(job)
+
+    # Hook calls made before the first push collapse into the latest snapshot
+    first = next(events)
+    assert first.startswith('event: progress') and '"downloaded_bytes": 5' in first
+
+    # A burst of hook calls during the pause is one push, a full interval later
+    clock.meanwhile.append(lambda: [downloading(job, downloaded) for downloaded in range(6, 26)])
+    second = next(events)
+    assert clock.sleeps == [0.25]
+    assert second.startswith('event: progress') and '"downloaded_bytes": 25' in second
+
+    def finish():
+        with job._lock:
+            job.state = 'finished'
+            job.finished_at = job.created_at
+            job._publish('state', {'state': 'finished'})
+    clock.meanwhile.append(finish)
+    rest = list(events)
+
+    assert clock.sleeps == [0.25, 0.25]
+    names = [line for message in rest for line in message.split('\n') if line.startswith('event: ')]
+    assert names == ['event: state', 'event: done']
+
+
+def test_file_entry_url_serves_names_with_url_characters(client, server_module):
+    name = 'Clip #1? 100% [abc-720p].mp4'
+    path = os.path.join(server_module.DOWNLOAD_ROOT, name)
+    with open(path, 'wb') as f:
+        f.write(b'clip')
+
+    entry = server_module.file_entry(path)
+    response = client.get(entry['url'])
+
+    assert entry['filename'] == name
+    assert response.status_code == 200
+    assert response.data == b'clip'
+
+
+def test_download_key_uses_the_quality_only_for_video(server_module):
+    url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    key = server_module.download_key
+
+    for option in ('audio', 'thumbnail', 'subtitles'):
+        assert key(url, 'youtube', option, '720', 'mp3' if option == 'audio' else None) == \
+            key(url, 'youtube', option, None, 'mp3' if option == 'audio' else None)
+    assert key(url, 'youtube', 'video', '720') != key(url, 'youtube', 'video', '1080')
+    assert key(url, 'youtube', 'video', '720') != key(url, 'youtube', 'video')
@@ -0,0 +1,47 @@
+"""Tests for the YoutubeDL instance pool"""
+
+import http.cookiejar
+
+from ydl_pool import YoutubeDLPool
+
+OPTIONS = {'quiet': True, 'no_warnings': True}
+
+
+def test_released_instance_comes_back_without_the_last_users_state():
+    pool = YoutubeDLPool()
+
+    def hook(d):
+        pass
+
+    with pool.checkout(OPTIONS) as ydl:
+        progress_hooks = list(ydl._progress_hooks)
+        ydl.add_progress_hook(hook)
+        ydl.add_postprocessor_hook(hook)
+        ydl.add_post_hook(hook)
+        ydl._download_retcode = 1
+        ydl._num_downloads = 3
+
+    with pool.checkout(OPTIONS) as again:
+        assert again is ydl
+        assert again._progress_hooks == progress_hooks
+        assert hook not in again._postprocessor_hooks
+        assert hook not in again._post_hooks
+        assert again._download_retcode == 0
+        assert again._num_downloads == 0
+    assert pool.stats() == {'created': 1, 'reused': 1, 'idle': 1}
+
+
+def test_release_saves_cookies_and_keeps_the_instance(tmp_path):
+    pool = YoutubeDLPool()
+    cookiefile = tmp_path / 'cookies.txt'
+    options = dict(OPTIONS, cookiefile=str(cookiefile))
+
+    with pool.checkout(options) as ydl:
+        ydl.cookiejar.set_cookie(http.cookiejar.Cookie(
+            0, 'session', 'abc123', None, False, '.example.com', True, True, '/', True,
+            True, 4102444800, False, None, None, {}))
+
+    assert 'session\tabc123' in cookiefile.read_text()
+    # The saved file's new modification time still finds the instance
+    with pool.checkout(options) as again:
+        assert again is ydl
@@ -0,0 +1,26 @@
+"""Tests for YouTubeDownloader output paths"""
+
+import yt_dlp
+
+import extraction
+from youtube import YouTubeDownloader
+
+
+def test_output_template_names_the_variant(tmp_path):
+    assert extraction.output_template(str(tmp_path), '%(title)s', '%(id)s', '720p') == \
+        str(tmp_path / '%(title)s [%(id)s-720p].%(ext)s')
+    assert extraction.output_template(str(tmp_path), '%(title)s', None) == str(tmp_path / '%(title)s.%(ext)s')
+
+
+def test_video_variants_get_their_own_files(origin, tmp_path):
+    base, _ = origin
+    url = f'{base}/a.mp4'
+    downloader = YouTubeDownloader(str(tmp_path / 'downloads'))
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    best = downloader.download_video(url, info=info)
+    chosen = downloader.download_video(url, format_id=info['format_id'], info=info)
+
+    assert best['files'] and chosen['files']
+    assert best['files'] != chosen['files']
@@ -0,0 +1,159 @@
+"""
+URL Router Module
+Classifies supported media URLs into (platform, kind, media ID) with one compiled regex and no I/O
+"""
+
+import re
+from collections import namedtuple
+
+
+# Kinds whose IDs name the media itself rather than a page about it
+SHARED_ID_KINDS = {'video', 'short', 'post', 'reel', 'tv'}
+
+
+class Route(namedtuple('Route', 'platform kind media_id playlist_id')):
+    """A classified URL: platform, kind of page, the platform's media ID and
+    the playlist a YouTube video was opened in (None for none)"""
+
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """Canonical ID used for cache and dedup keys
+
+        Kinds that are different views of the same media (a YouTube watch page
+        and its Short, an Instagram post and its reel) share the bare ID. A
+        video opened in a playlist (watch?v=X&list=Y) is extracted by yt-dlp
+        as the whole playlist, so its key names the playlist too.
+        """
+        if self.kind in SHARED_ID_KINDS:
+            key = self.media_id
+        else:
+            key = f'{self.kind}:{self.media_id}'
+        if self.playlist_id:
+            key = f'{key}&list={self.playlist_id}'
+        return key
+
+
+# Scheme and an optional well-known subdomain in front of every host
+_PREFIX = r'(?:https?://)?(?:(?:www|m|mobile|music|web|mbasic)\.)?'
+
+# Supported hosts, each followed by an optional port. Paths must follow
+# directly, so look-alike hosts (notyoutube.com, youtube.com.evil,
+# youtube.com@evil) never match.
+_HOSTS = {
+    'youtu.be': r'youtu\.be',
+    'youtube.com': r'youtube(?:-nocookie)?\.com',
+    'instagram.com': r'instagr(?:am\.com|\.am)',
+    'fb.watch': r'fb\.watch',
+    'facebook.com': r'(?:facebook|fb)\.com',
+}
+
+_END = r'(?=[/?&#]|$)'
+
+# Playlist a YouTube video URL was opened in
+_LIST_PARAM = re.compile(r'[?&]list=([0-9A-Za-z_-]+)')
+_QS = r'/?\?(?:[^#]*?&)?'
+
+# (platform, kind, host, path pattern capturing the media ID as (?P<id>...))
+_SHAPES = [
+    ('youtube', 'video', 'youtu.be', r'/(?P<id>[0-9A-Za-z_-]{11})' + _END),
+    ('youtube', 'video', 'youtube.com', r'/watch' + _QS + r'v=(?P<id>[0-9A-Za-z_-]{11})' + _END),
+    ('youtube', 'video', 'youtube.com', r'/(?:embed|v|live|e)/(?P<id>[0-9A-Za-z_-]{11})' + _END),
+    ('youtube', 'short', 'youtube.com', r'/shorts/(?P<id>[0-9A-Za-z_-]{11})' + _END),
+    ('youtube', 'playlist', 'youtube.com', r'/playlist' + _QS + r'list=(?P<id>[0-9A-Za-z_-]+)' + _END),
+
+    ('instagram', 'post', 'instagram.com', r'/(?:[A-Za-z0-9_.]+/)?p/(?P<id>[0-9A-Za-z_-]+)' + _END),
+    ('instagram', 'reel', 'instagram.com', r'/(?:[A-Za-z0-9_.]+/)?reels?/(?P<id>[0-9A-Za-z_-]+)' + _END),
+    ('instagram', 'tv', 'instagram.com', r'/(?:[A-Za-z0-9_.]+/)?tv/(?P<id>[0-9A-Za-z_-]+)' + _END),
+    ('instagram', 'highlight', 'instagram.com', r'/stories/highlights/(?P<id>\d+)' + _END),
+    ('instagram', 'story', 'instagram.com', r'/stories/[A-Za-z0-9_.]+/(?P<id>\d+)' + _END),
+    ('instagram', 'stories', 'instagram.com', r'/stories/(?P<id>[A-Za-z0-9_.]+)/?(?=[?#]|$)'),
+
+    ('facebook', 'share', 'fb.watch', r'/(?P<id>[0-9A-Za-z_-]+)' + _END),
+    ('facebook', 'video', 'facebook.com', r'/(?:[^/?#]+/)?videos/(?:[^/?#]+/)?(?P<id>\d+)' + _END),
+    ('facebook', 'video', 'facebook.com', r'/(?:watch|video\.php)' + _QS + r'v=(?P<id>\d+)' + _END),
+    ('facebook', 'reel', 'facebook.com', r'/reel/(?P<id>\d+)' + _END),
+    ('facebook', 'photo', 'facebook.com', r'/photo(?:\.php)?' + _QS + r'fbid=(?P<id>\d+)' + _END),
+    ('facebook', 'photo', 'facebook.com', r'/[^/?#]+/photos/(?:[^/?#]+/)?(?P<id>\d+)' + _END),
+    ('facebook', 'post', 'facebook.com', r'/(?:story|permalink)\.php' + _QS + r'story_fbid=(?P<id>[0-9A-Za-z]+)' + _END),
+    ('facebook', 'post', 'facebook.com', r'/[^/?#]+/posts/(?P<id>[0-9A-Za-z]+)' + _END),
+    ('facebook', 'share', 'facebook.com', r'/share/[vrp]/(?P<id>[0-9A-Za-z_-]+)' + _END),
+]
+
+
+def _compile(shapes):
+    """
+    Join all shapes into one anchored regex, factored by host
+
+    Each shape's ID group gets a unique name, so match.lastgroup identifies
+    the shape. Matching is case-sensitive for speed; route() retries with a
+    lower-cased host when a URL does not match.
+    """
+    paths = {}
+    routes = {}
+    for index, (platform, kind, host, path) in enumerate(shapes):
+        name = f's{index}'
+        routes[name] = (platform, kind)
+        paths.setdefault(host, []).append(path.replace('(?P<id>', f'(?P<{name}>'))
+    hosts = [_HOSTS[host] + r'(?::\d+)?(?:' + '|'.join(branches) + ')' for host, branches in paths.items()]
+    return re.compile(_PREFIX + '(?:' + '|'.join(hosts) + ')'), routes
+
+
+_PATTERN, _ROUTES = _compile(_SHAPES)
+
+
+def _lower_host(url):
+    """Lower-case the scheme and host of a URL, leaving the case-sensitive path alone"""
+    start = url.find('://')
+    start = start + 3 if start >= 0 else 0
+    end = len(url)
+    for char in '/?#':
+        position = url.find(char, start)
+        if 0 <= position < end:
+            end = position
+    return url[:end].lower() + url[end:]
+
+
+def route(url):
+    """
+    Classify a media URL
+
+    Args:
+        url: URL as entered by the user (scheme optional)
+
+    Returns:
+        Route: (platform, kind, media_id), or None if the URL is not a supported shape
+    """
+    url = url.strip()
+    match = _PATTERN.match(url)
+    if match is None:
+        lowered = _lower_host(url)
+        if lowered == url:
+            return None
+        match = _PATTERN.match(lowered)
+        if match is None:
+            return None
+
+    name = match.lastgroup
+    platform, kind = _ROUTES[name]
+    playlist_id = None
+    if kind == 'video' and platform == 'youtube' and 'list=' in url:
+        found = _LIST_PARAM.search(url.split('#', 1)[0])
+        playlist_id = found.group(1) if found else None
+    # tuple.__new__ skips namedtuple's Python-level constructor
+    return tuple.__new__(Route, (platform, kind, match.group(name), playlist_id))
+
+
+def platform_of(url):
+    """
+    Get the platform of a media URL
+
+    Args:
+        url: Media URL
+
+    Returns:
+        str: Platform name, or 'unknown' if the URL is not a supported shape
+    """
+    result = route(url)
+    return result.platform if result else 'unknown'
@@ -0,0 +1,232 @@
+"""
+YoutubeDL Pool Module
+Reuses initialised yt_dlp.YoutubeDL instances across requests with the same options
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Extractors the downloaders rely on, loaded by preload
+PRELOAD_EXTRACTORS = ('Youtube', 'YoutubeTab', 'Instagram', 'Facebook', 'Generic')
+
+
+def preload():
+    """
+    Import yt-dlp and load its extractor registry and the extractors in use
+
+    yt-dlp is otherwise imported on the first acquire. Calling this in the
+    gunicorn master before workers fork lets them share the loaded modules.
+    """
+    import yt_dlp
+
+    ydl = yt_dlp.YoutubeDL({'quiet': True})
+    for key in PRELOAD_EXTRACTORS:
+        ydl.get_info_extractor(key)
+    ydl.close()
+
+
+def option_signature(ydl_opts):
+    """
+    Build a hashable signature of a YoutubeDL options dict
+
+    Nested dicts and lists are frozen; a cookie file is keyed by its path and
+    modification time so instances are rebuilt when the file is replaced.
+
+    Args:
+        ydl_opts: YoutubeDL options
+
+    Returns:
+        tuple: Signature usable as a dict key
+    """
+    def freeze(value):
+        if isinstance(value, dict):
+            return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+        if isinstance(value, (list, tuple, set)):
+            return tuple(freeze(v) for v in value)
+        return value
+
+    signature = freeze(ydl_opts)
+    cookiefile = ydl_opts.get('cookiefile')
+    if cookiefile:
+        signature += cookie_stamp(cookiefile)
+    return signature
+
+
+def cookie_stamp(cookiefile):
+    """
+    Build the signature entry of a cookie file
+
+    Args:
+        cookiefile: Path of the cookie file
+
+    Returns:
+        tuple: Entry with the file's modification time (empty if the file does not exist)
+    """
+    try:
+        return (('cookiefile_mtime', os.stat(cookiefile).st_mtime_ns),)
+    except OSError:
+        return ()
+
+
+class YoutubeDLPool:
+    """Idle YoutubeDL instances grouped by option signature, checked out by one thread at a time"""
+
+    def __init__(self, max_idle=4, max_signatures=32):
+        """
+        Initialize pool
+
+        Args:
+            max_idle: Idle instances kept per option signature
+            max_signatures: Option signatures kept before the least recently used is dropped
+        """
+        self.max_idle = max_idle
+        self.max_signatures = max_signatures
+        self.created = 0
+        self.reused = 0
+        self._idle = OrderedDict()
+        self._baselines = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self, ydl_opts):
+        """
+        Check out an instance for the given options, creating one if none is idle
+
+        Args:
+            ydl_opts: YoutubeDL options
+
+        Returns:
+            yt_dlp.YoutubeDL: Instance owned by the caller until release
+        """
+        signature = option_signature(ydl_opts)
+        with self._lock:
+            self._check_fork()
+            idle = self._idle.get(signature)
+            if idle:
+                self._idle.move_to_end(signature)
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+
+        # Built outside the lock; instance setup is the cost being pooled.
+        # Instances run their FFmpeg post-processors in the post-processing pool
+        from postprocess import youtube_dl_class
+        ydl = youtube_dl_class()(ydl_opts)
+        with self._lock:
+            self._baselines[id(ydl)] = (signature, self._hook_state(ydl))
+        return ydl
+
+    def release(self, ydl, reuse=True):
+        """
+        Return an instance to the pool
+
+        Hooks added while it was checked out are removed and the download
+        counters reset, so per-download collectors, a failed download's
+        return code and autonumber do not leak into the next user. Cookies
+        the sites set are saved to the cookie file, as closing would.
+
+        Args:
+            ydl: Instance from acquire
+            reuse: False to close the instance instead of keeping it
+        """
+        cookiefile = ydl.params.get('cookiefile')
+        if reuse and cookiefile:
+            ydl.save_cookies()
+
+        evicted = []
+        with self._lock:
+            entry = self._baselines.get(id(ydl))
+            keep = reuse and entry is not None and os.getpid() == self._pid
+            if keep:
+                signature, hooks = entry
+                if cookiefile:
+                    # Saving changed the file's modification time; file it under the new one
+                    signature = tuple(item for item in signature if item[:1] != ('cookiefile_mtime',))
+                    signature += cookie_stamp(cookiefile)
+                    self._baselines[id(ydl)] = (signature, hooks)
+                self._restore_hooks(ydl, hooks)
+                ydl._download_retcode = 0
+                ydl._num_downloads = 0
+                idle = self._idle.setdefault(signature, [])
+                self._idle.move_to_end(signature)
+                if len(idle) < self.max_idle:
+                    idle.append(ydl)
+                    evicted = self._evict()
+                else:
+                    keep = False
+            if not keep:
+                self._baselines.pop(id(ydl), None)
+
+        if not keep:
+            evicted.append(ydl)
+        for instance in evicted:
+            instance.close()
+
+    @contextmanager
+    def checkout(self, ydl_opts):
+        """
+        Use a pooled instance for the duration of a with block
+
+        Args:
+            ydl_opts: YoutubeDL options
+
+        Yields:
+            yt_dlp.YoutubeDL: Instance for the given options
+        """
+        ydl = self.acquire(ydl_opts)
+        try:
+            yield ydl
+        finally:
+            self.release(ydl)
+
+    def _hook_state(self, ydl):
+        """Snapshot the hook lists an instance was created with"""
+        return {
+            'progress': list(ydl._progress_hooks),
+            'postprocessor': list(ydl._postprocessor_hooks),
+            'post': list(ydl._post_hooks),
+            'pps': {id(pp): list(pp._progress_hooks) for pps in ydl._pps.values() for pp in pps},
+        }
+
+    def _restore_hooks(self, ydl, hooks):
+        """Reset an instance's hook lists to its creation snapshot"""
+        ydl._progress_hooks[:] = hooks['progress']
+        ydl._postprocessor_hooks[:] = hooks['postprocessor']
+        ydl._post_hooks[:] = hooks['post']
+        for pps in ydl._pps.values():
+            for pp in pps:
+                if id(pp) in hooks['pps']:
+                    pp._progress_hooks[:] = hooks['pps'][id(pp)]
+
+    def _evict(self):
+        """Drop least recently used signatures beyond max_signatures (caller holds the lock)"""
+        evicted = []
+        while len(self._idle) > self.max_signatures:
+            _, idle = self._idle.popitem(last=False)
+            for ydl in idle:
+                self._baselines.pop(id(ydl), None)
+            evicted.extend(idle)
+        return evicted
+
+    def _check_fork(self):
+        """Forget instances inherited from a parent process (caller holds the lock)"""
+        if os.getpid() != self._pid:
+            # Their connections belong to the parent; drop without closing
+            self._idle.clear()
+            self._baselines.clear()
+            self._pid = os.getpid()
+
+    def stats(self):
+        """Return created/reused counters and idle instance count"""
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'idle': sum(len(idle) for idle in self._idle.values()),
+            }
+
+
+ydl_pool = YoutubeDLPool()
@@ -4,8 +4,12 @@ Handles downloading videos and audio from YouTube using yt-dlp
 """
 
 import os
-import yt_dlp
 import json
+import batch
+import extraction
+from bandwidth import bandwidth_scheduler
+from jobs import report_progress
+from ydl_pool import ydl_pool
 
 
 class YouTubeDownloader:
@@ -79,8 +83,8 @@ class YouTubeDownloader:
             ydl_opts['cookiefile'] = 'cookies.txt'
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                info = extraction.extract_info(ydl, url)
                 return info
         except Exception as e:
             print(f"Error fetching video info: {str(e)}")
@@ -168,7 +172,7 @@ class YouTubeDownloader:
         
         return video_formats
     
-    def download_video(self, url, quality_height=None, output_format="mp4", download_subs=False, download_thumb=False, format_id=None):
+    def download_video(self, url, quality_height=None, output_format="mp4", download_subs=False, download_thumb=False, format_id=None, info=None):
         """
         Download video with specified quality (includes audio)
         
@@ -179,8 +183,18 @@ class YouTubeDownloader:
             download_subs: Download subtitles/captions
             download_thumb: Download thumbnail
             format_id: Specific format ID to download
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
-        output_template = os.path.join(self.download_path, '%(title)s.%(ext)s')
+        if format_id:
+            variant = f'f{format_id}'
+        elif quality_height:
+            variant = f'{quality_height}p'
+        else:
+            variant = 'best'
+        output_template = extraction.output_template(self.download_path, '%(title)s', '%(id)s', variant)
         
         # Format selection
         if format_id:
@@ -227,9 +241,11 @@ class YouTubeDownloader:
             if download_thumb:
                 print("+ Downloading thumbnail")
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Video downloaded successfully!")
+            return result
         except Exception as e:
             error_msg = str(e)
             print(f"\n✗ Error downloading video: {error_msg}")
@@ -242,8 +258,9 @@ class YouTubeDownloader:
                 print("  Option 2: Download from https://www.gyan.dev/ffmpeg/builds/")
                 print("            Extract and add to PATH")
                 print("\nAfter installing, restart your terminal and try again.")
+            return extraction.failed_result(e)
     
-    def download_playlist(self, url, quality_height=None, output_format="mp4", download_subs=False):
+    def download_playlist(self, url, quality_height=None, output_format="mp4", download_subs=False, info=None, confirm=True, max_workers=1):
         """
         Download entire playlist
         
@@ -252,6 +269,13 @@ class YouTubeDownloader:
             quality_height: Desired quality height
             output_format: Output format (mp4, webm, mkv)
             download_subs: Download subtitles
+            info: Playlist info dict from a previous extraction (skips re-extraction)
+            confirm: Ask for confirmation before downloading
+            max_workers: Entries downloaded at once (1 downloads them in order in a single run)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error);
+                  parallel runs add a per-entry report (entries)
         """
         output_template = os.path.join(self.download_path, '%(playlist)s', '%(playlist_index)s - %(title)s.%(ext)s')
         
@@ -288,50 +312,129 @@ class YouTubeDownloader:
         
         try:
             print(f"\nDownloading playlist...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                if not info:
+                    # Only the playlist page is extracted here; each entry is
+                    # resolved once while downloading
+                    info = extraction.extract_info(ydl, url, process=False)
+                    info['entries'] = list(info.get('entries') or [])
                 playlist_title = info.get('title', 'Unknown Playlist')
                 video_count = len(info.get('entries', []))
                 
                 print(f"Playlist: {playlist_title}")
                 print(f"Videos: {video_count}")
                 
-                confirm = input("\nContinue with download? (y/n): ").strip().lower()
-                if confirm == 'y':
-                    ydl.download([url])
+                if not confirm or input("\nContinue with download? (y/n): ").strip().lower() == 'y':
+                    if max_workers > 1:
+                        result = self._download_playlist_entries(ydl_opts, info, max_workers)
+                    else:
+                        result = extraction.download(ydl, url, info)
                     print("\n✓ Playlist downloaded successfully!")
+                    return result
                 else:
                     print("Download cancelled.")
+                    return extraction.failed_result('Download cancelled')
         except Exception as e:
             print(f"\n✗ Error downloading playlist: {str(e)}")
+            return extraction.failed_result(e)
+    
+    def _download_playlist_entries(self, ydl_opts, info, max_workers):
+        """
+        Download playlist entries concurrently, one YoutubeDL run per entry
+        
+        Args:
+            ydl_opts: Options for every entry (same output template and ignoreerrors behaviour)
+            info: Playlist info dict with its entries list
+            max_workers: Entries downloaded at once
+            
+        Returns:
+            dict: Download result with all files and a per-entry report (entries)
+        """
+        entries = list(info.get('entries') or [])
+        # Playlist fields yt-dlp would add itself, so %(playlist)s and
+        # %(playlist_index)s (zero-padded) expand the same way
+        playlist_info = {
+            'playlist': info.get('title') or info.get('id'),
+            'playlist_id': info.get('id'),
+            'playlist_title': info.get('title'),
+            'playlist_uploader': info.get('uploader'),
+            'playlist_count': info.get('playlist_count') or len(entries),
+            'n_entries': len(entries),
+            '__last_playlist_index': len(entries),
+        }
+        
+        def entry_url(index):
+            entry = entries[index - 1] or {}
+            return entry.get('webpage_url') or entry.get('url')
+        
+        def download_entry(index):
+            entry = entries[index - 1]
+            if not entry:
+                return extraction.failed_result('Entry unavailable')
+            
+            extra_info = dict(playlist_info, playlist_index=index, playlist_autonumber=index)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, entry_url(index), entry, extra_info)
+            
+            # ignoreerrors reports failures without raising
+            if not result['files']:
+                result['error'] = 'Entry could not be downloaded'
+            return result
+        
+        print(f"Downloading {len(entries)} entries, {max_workers} at a time...")
+        results = batch.run_batch(
+            list(range(1, len(entries) + 1)),
+            download_entry,
+            max_workers=max_workers,
+            per_host=max_workers,
+            url_of=entry_url
+        )
+        batch.print_summary(results, label='Playlist entries')
+        
+        return {
+            'info': info,
+            'files': [path for item in results for path in item['files']],
+            'error': None,
+            'entries': results,
+        }
     
-    def batch_download(self, urls, quality_height=None, output_format="mp4"):
+    def batch_download(self, urls, quality_height=None, output_format="mp4", max_workers=batch.DEFAULT_MAX_WORKERS, per_host=batch.DEFAULT_PER_HOST):
         """
-        Download multiple videos from a list of URLs
+        Download multiple videos from a list of URLs in parallel
         
         Args:
             urls: List of YouTube video URLs
             quality_height: Desired quality height
             output_format: Output format (mp4, webm, mkv)
+            max_workers: Maximum downloads running at once
+            per_host: Maximum downloads running at once against the same host
+            
+        Returns:
+            list: Per-URL results (url, success, files, error) in input order
         """
-        print(f"\nBatch downloading {len(urls)} video(s)...")
+        print(f"\nBatch downloading {len(urls)} video(s), {max_workers} at a time...")
         
-        for idx, url in enumerate(urls, 1):
-            print(f"\n[{idx}/{len(urls)}] Processing: {url}")
-            try:
-                self.download_video(url, quality_height, output_format)
-            except Exception as e:
-                print(f"Failed to download {url}: {str(e)}")
-                continue
+        results = batch.run_batch(
+            urls,
+            lambda url: self.download_video(url, quality_height, output_format),
+            max_workers=max_workers,
+            per_host=per_host
+        )
         
-        print("\n✓ Batch download completed!")
+        batch.print_summary(results)
+        return results
     
-    def download_thumbnail(self, url):
+    def download_thumbnail(self, url, info=None):
         """
         Download only the thumbnail
         
         Args:
             url: YouTube video URL
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, '%(title)s.%(ext)s')
         
@@ -343,18 +446,25 @@ class YouTubeDownloader:
         
         try:
             print(f"\nDownloading thumbnail...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Thumbnail downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading thumbnail: {str(e)}")
+            return extraction.failed_result(e)
     
-    def download_subtitles_only(self, url):
+    def download_subtitles_only(self, url, info=None):
         """
         Download only subtitles/captions
         
         Args:
             url: YouTube video URL
+            info: Info dict from a previous extraction (skips re-extraction)
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
         output_template = os.path.join(self.download_path, '%(title)s.%(ext)s')
         
@@ -369,29 +479,33 @@ class YouTubeDownloader:
         
         try:
             print(f"\nDownloading English subtitles...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Subtitles downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading subtitles: {str(e)}")
+            return extraction.failed_result(e)
     
-    def download_audio(self, url):
+    def download_audio(self, url, info=None, audio_format='original'):
         """
         Download audio only from YouTube video
         
         Args:
             url: YouTube video URL
+            info: Info dict from a previous extraction (skips re-extraction)
+            audio_format: 'original' keeps the source codec (no re-encode), 'mp3' converts to MP3
+            
+        Returns:
+            dict: Download result with final file paths (files) and error message (error)
         """
-        output_template = os.path.join(self.download_path, '%(title)s.%(ext)s')
+        output_template = extraction.output_template(self.download_path, '%(title)s', '%(id)s', audio_format)
         
         ydl_opts = {
             'format': 'bestaudio/best',
             'outtmpl': output_template,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
+            'postprocessors': [extraction.audio_postprocessor(audio_format)],
             'progress_hooks': [self._download_progress_hook],
             # Use ONLY Android client
             'extractor_args': {
@@ -409,14 +523,18 @@ class YouTubeDownloader:
         
         try:
             print(f"\nDownloading audio...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                result = extraction.download(ydl, url, info)
             print("\n✓ Audio downloaded successfully!")
+            return result
         except Exception as e:
             print(f"\n✗ Error downloading audio: {str(e)}")
+            return extraction.failed_result(e)
     
     def _download_progress_hook(self, d):
         """Progress hook for download updates"""
+        report_progress(d)
         if d['status'] == 'downloading':
             percent = d.get('_percent_str', 'N/A')
             speed = d.get('_speed_str', 'N/A')
@@ -450,7 +568,7 @@ class YouTubeDownloader:
         print("Download Options:")
         print("=" * 60)
         print("V. Download Video (choose quality)")
-        print("A. Download Audio Only (MP3)")
+        print("A. Download Audio Only (original codec or MP3)")
         print("T. Download Thumbnail Only")
         print("S. Download Subtitles Only")
         print("B. Back to main menu")
@@ -485,20 +603,21 @@ class YouTubeDownloader:
                     download_subs = input("Download subtitles? (y/n, default: n): ").strip().lower() == 'y'
                     download_thumb = input("Download thumbnail? (y/n, default: n): ").strip().lower() == 'y'
                     
-                    self.download_video(url, selected_format['height'], output_format, download_subs, download_thumb)
+                    self.download_video(url, selected_format['height'], output_format, download_subs, download_thumb, info=info)
                 else:
                     print("Invalid choice.")
             except ValueError:
                 print("Invalid input. Please enter a number.")
         
         elif choice == "A":
-            self.download_audio(url)
+            to_mp3 = input("Convert to MP3? (y/n, default: n keeps the original codec): ").strip().lower() == 'y'
+            self.download_audio(url, info=info, audio_format='mp3' if to_mp3 else 'original')
         
         elif choice == "T":
-            self.download_thumbnail(url)
+            self.download_thumbnail(url, info=info)
         
         elif choice == "S":
-            self.download_subtitles_only(url)
+            self.download_subtitles_only(url, info=info)
         
         elif choice == "B":
             return
@@ -542,12 +661,14 @@ class YouTubeDownloader:
             output_format = format_map.get(format_choice, "mp4")
             
             download_subs = input("Download subtitles for all videos? (y/n, default: n): ").strip().lower() == 'y'
+            max_workers = batch.ask_parallel_downloads()
             
-            self.download_playlist(url, quality, output_format, download_subs)
+            self.download_playlist(url, quality, output_format, download_subs, max_workers=max_workers)
         
         elif choice == "2":
             # Download playlist as audio
-            self._download_playlist_audio(url)
+            to_mp3 = input("Convert to MP3? (y/n, default: n keeps the original codec): ").strip().lower() == 'y'
+            self._download_playlist_audio(url, max_workers=batch.ask_parallel_downloads(), audio_format='mp3' if to_mp3 else 'original')
         
         elif choice == "3":
             return
@@ -555,18 +676,14 @@ class YouTubeDownloader:
         else:
             print("Invalid choice.")
     
-    def _download_playlist_audio(self, url):
+    def _download_playlist_audio(self, url, info=None, confirm=True, max_workers=1, audio_format='original'):
         """Download playlist as audio only"""
-        output_template = os.path.join(self.download_path, '%(playlist)s', '%(playlist_index)s - %(title)s.%(ext)s')
+        output_template = extraction.output_template(os.path.join(self.download_path, '%(playlist)s'), '%(playlist_index)s - %(title)s', audio_format)
         
         ydl_opts = {
             'format': 'bestaudio/best',
             'outtmpl': output_template,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
+            'postprocessors': [extraction.audio_postprocessor(audio_format)],
             'progress_hooks': [self._download_progress_hook],
             'ignoreerrors': True,
             # Use ONLY Android client
@@ -585,22 +702,32 @@ class YouTubeDownloader:
         
         try:
             print(f"\nDownloading playlist as audio...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            bandwidth_scheduler.limit(ydl_opts)
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                if not info:
+                    # Only the playlist page is extracted here; each entry is
+                    # resolved once while downloading
+                    info = extraction.extract_info(ydl, url, process=False)
+                    info['entries'] = list(info.get('entries') or [])
                 playlist_title = info.get('title', 'Unknown Playlist')
                 video_count = len(info.get('entries', []))
                 
                 print(f"Playlist: {playlist_title}")
                 print(f"Videos: {video_count}")
                 
-                confirm = input("\nContinue with download? (y/n): ").strip().lower()
-                if confirm == 'y':
-                    ydl.download([url])
+                if not confirm or input("\nContinue with download? (y/n): ").strip().lower() == 'y':
+                    if max_workers > 1:
+                        result = self._download_playlist_entries(ydl_opts, info, max_workers)
+                    else:
+                        result = extraction.download(ydl, url, info)
                     print("\n✓ Playlist audio downloaded successfully!")
+                    return result
                 else:
                     print("Download cancelled.")
+                    return extraction.failed_result('Download cancelled')
         except Exception as e:
             print(f"\n✗ Error downloading playlist: {str(e)}")
+            return extraction.failed_result(e)
     
     def handle_batch_download(self):
         """Handle batch download from user input"""
@@ -644,5 +771,7 @@ class YouTubeDownloader:
         format_map = {"1": "mp4", "2": "webm", "3": "mkv", "": "mp4"}
         output_format = format_map.get(format_choice, "mp4")
         
-        self.batch_download(urls, quality, output_format)
+        max_workers = batch.ask_parallel_downloads()
+        
+        self.batch_download(urls, quality, output_format, max_workers=max_workers)
 